@@ -1,38 +1,61 @@
-from flask import Blueprint, jsonify, request
-from database import db, Patient, PatientRequest, MonitoringSession, SystemAnalytics, get_patient_request_patterns
+from flask import Blueprint, Response, jsonify, request, send_from_directory, stream_with_context
+import os
+from database import db, Patient, PatientRequest, MonitoringSession, SystemAnalytics, HourlyRequestRollup, get_patient_request_patterns
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, case
+from columnar_export import columnar_export_available, export_requests, read_watermark, COLUMNAR_EXPORT_DIR, FILE_EXTENSIONS
+from exports import EXPORT_FORMATS, stream_export
+from response_sketches import merged_sketch, response_time_summary, sketch_rows, DDSketch, SCOPES
+from rollups import REQUEST_TYPE_COLUMNS, hour_bucket
+from time_windows import day_window, daily_windows, days_window, local_today, shift_window, DEFAULT_TIMEZONE, SHIFTS
 
 analytics_bp = Blueprint('analytics', __name__)
 
+def uses_daily_rollups(tz=None, shift=None):
+    """Daily rollups are kept per hospital-local day; shifts and other timezones query requests directly"""
+    return not shift and (not tz or tz == DEFAULT_TIMEZONE)
+
 @analytics_bp.route('/api/analytics/dashboard', methods=['GET'])
 def get_dashboard_analytics():
     """Get real-time dashboard analytics"""
     try:
-        today = datetime.utcnow().date()
+        # Today (hospital-local) or a single shift, as a half-open [start, end) range
+        tz = request.args.get('tz')
+        shift = request.args.get('shift')
+        if shift and shift != 'current' and shift not in SHIFTS:
+            return jsonify({'status': 'error', 'message': f'Unknown shift: {shift}'}), 400
+        start, end = shift_window(shift, tz=tz) if shift else day_window(tz=tz)
+        in_window = (PatientRequest.timestamp >= start, PatientRequest.timestamp < end)
         
         # Current statistics
         total_patients = Patient.query.filter_by(is_active=True).count()
         active_monitoring = MonitoringSession.query.filter(MonitoringSession.session_end.is_(None)).count()
         
-        # Today's requests
-        today_requests = PatientRequest.query.filter(
-            func.date(PatientRequest.timestamp) == today
-        ).count()
-        
-        # Emergency requests today
-        emergency_requests = PatientRequest.query.filter(
-            func.date(PatientRequest.timestamp) == today,
-            PatientRequest.request_type == 5
-        ).count()
-        
-        # Request type breakdown for today
-        request_breakdown = db.session.query(
-            PatientRequest.request_type,
-            func.count(PatientRequest.id).label('count')
-        ).filter(
-            func.date(PatientRequest.timestamp) == today
-        ).group_by(PatientRequest.request_type).all()
+        if uses_daily_rollups(tz, shift):
+            # Today's counters from the daily rollup row
+            today = SystemAnalytics.query.filter_by(date=local_today()).first()
+            today_requests = today.total_requests if today else 0
+            emergency_requests = today.emergency_requests if today else 0
+            request_breakdown = [
+                (req_type, getattr(today, column))
+                for req_type, column in REQUEST_TYPE_COLUMNS.items()
+                if today and getattr(today, column)
+            ]
+        else:
+            # Today's requests
+            today_requests = PatientRequest.query.filter(*in_window).count()
+            
+            # Emergency requests today
+            emergency_requests = PatientRequest.query.filter(
+                *in_window,
+                PatientRequest.request_type == 5
+            ).count()
+            
+            # Request type breakdown for today
+            request_breakdown = db.session.query(
+                PatientRequest.request_type,
+                func.count(PatientRequest.id).label('count')
+            ).filter(*in_window).group_by(PatientRequest.request_type).all()
         
         request_types = {
             1: 'Nurse Calls',
@@ -70,7 +93,8 @@ def get_dashboard_analytics():
                 'today_requests': today_requests,
                 'emergency_requests': emergency_requests,
                 'request_breakdown': breakdown_data,
-                'recent_requests': recent_data
+                'recent_requests': recent_data,
+                'window': {'start': start.isoformat(), 'end': end.isoformat(), 'shift': shift}
             }
         })
         
@@ -102,19 +126,8 @@ def get_patient_analytics(patient_id):
         
         hourly_data = {str(int(hour)): count for hour, count in hourly_requests}
         
-        # Get response time statistics
-        response_times = db.session.query(
-            PatientRequest.timestamp,
-            PatientRequest.response_time
-        ).filter(
-            PatientRequest.patient_id == patient_id,
-            PatientRequest.response_time.isnot(None)
-        ).all()
-        
-        avg_response_time = 0
-        if response_times:
-            total_time = sum([(resp.response_time - resp.timestamp).total_seconds() / 60 for resp in response_times])
-            avg_response_time = total_time / len(response_times)
+        # Response time percentiles merged from the patient's daily sketches
+        response_times = response_time_summary('patient', patient_id, days)
         
         return jsonify({
             'status': 'success',
@@ -122,7 +135,8 @@ def get_patient_analytics(patient_id):
                 'patient_info': patient.to_dict(),
                 'patterns': patterns,
                 'hourly_distribution': hourly_data,
-                'avg_response_time': round(avg_response_time, 2),
+                'avg_response_time': response_times['mean'] or 0,
+                'response_times': response_times,
                 'analysis_period': f'{days} days'
             }
         })
@@ -135,32 +149,46 @@ def get_system_trends():
     """Get system-wide trends and patterns"""
     try:
         days = request.args.get('days', 30, type=int)
-        end_date = datetime.utcnow().date()
-        start_date = end_date - timedelta(days=days)
-        
-        # Daily request trends
-        daily_trends = db.session.query(
-            func.date(PatientRequest.timestamp).label('date'),
-            func.count(PatientRequest.id).label('total_requests'),
-            func.sum(func.case([(PatientRequest.request_type == 5, 1)], else_=0)).label('emergency_requests')
-        ).filter(
-            func.date(PatientRequest.timestamp) >= start_date
-        ).group_by(func.date(PatientRequest.timestamp)).all()
+        tz = request.args.get('tz')
         
         trend_data = []
-        for trend in daily_trends:
-            trend_data.append({
-                'date': trend.date.isoformat(),
-                'total_requests': trend.total_requests,
-                'emergency_requests': trend.emergency_requests or 0
-            })
+        if uses_daily_rollups(tz):
+            # Daily request trends from the daily rollup rows
+            today = local_today()
+            rollups = SystemAnalytics.query.filter(
+                SystemAnalytics.date >= today - timedelta(days=days - 1),
+                SystemAnalytics.date <= today,
+                SystemAnalytics.total_requests > 0
+            ).order_by(SystemAnalytics.date).all()
+            trend_data = [{
+                'date': rollup.date.isoformat(),
+                'total_requests': rollup.total_requests,
+                'emergency_requests': rollup.emergency_requests or 0
+            } for rollup in rollups]
+        else:
+            # Daily request trends for another timezone - one index range per
+            # local day, so day boundaries follow that timezone rather than UTC
+            for day, day_start, day_end in daily_windows(days, tz):
+                total, emergencies = db.session.query(
+                    func.count(PatientRequest.id),
+                    func.sum(case((PatientRequest.request_type == 5, 1), else_=0))
+                ).filter(
+                    PatientRequest.timestamp >= day_start,
+                    PatientRequest.timestamp < day_end
+                ).one()
+                if total:
+                    trend_data.append({
+                        'date': day.isoformat(),
+                        'total_requests': total,
+                        'emergency_requests': emergencies or 0
+                    })
         
         # Most active patients
         active_patients = db.session.query(
             PatientRequest.patient_id,
             func.count(PatientRequest.id).label('request_count')
         ).filter(
-            PatientRequest.timestamp >= datetime.utcnow() - timedelta(days=days)
+            PatientRequest.timestamp >= days_window(days, tz)[0]
         ).group_by(PatientRequest.patient_id).order_by(
             func.count(PatientRequest.id).desc()
         ).limit(5).all()
@@ -186,44 +214,122 @@ def get_system_trends():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@analytics_bp.route('/api/analytics/hourly', methods=['GET'])
+def get_hourly_rollups():
+    """Get hourly request rollups for the last N hours (UTC hour buckets)"""
+    try:
+        hours = min(request.args.get('hours', 24, type=int), 24 * 31)
+        since = hour_bucket(datetime.utcnow()) - timedelta(hours=hours - 1)
+        
+        rollups = HourlyRequestRollup.query.filter(
+            HourlyRequestRollup.bucket_start >= since
+        ).order_by(HourlyRequestRollup.bucket_start).all()
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'hourly': [rollup.to_dict() for rollup in rollups],
+                'analysis_period': f'{hours} hours'
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@analytics_bp.route('/api/analytics/response_times', methods=['GET'])
+def get_response_time_percentiles():
+    """Get response time p50/p90/p99 for the hospital, a patient, a department or a shift"""
+    try:
+        days = request.args.get('days', 7, type=int)
+        scope = request.args.get('scope', 'all')
+        if scope not in SCOPES:
+            return jsonify({'status': 'error', 'message': f'Unknown scope: {scope}'}), 400
+        scope_key = request.args.get('key', 'all') if scope != 'all' else 'all'
+        
+        # One sketch row per day; the period summary is their merge
+        rows = sketch_rows(scope, scope_key, days)
+        daily = [dict(DDSketch.from_row(row).summary(), date=row.date.isoformat()) for row in rows]
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'scope': scope,
+                'key': scope_key,
+                'summary': merged_sketch(rows).summary(),
+                'daily': daily,
+                'analysis_period': f'{days} days'
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @analytics_bp.route('/api/analytics/export', methods=['GET'])
 def export_analytics_data():
-    """Export analytics data for reporting"""
+    """Export analytics data for reporting (streamed as json, ndjson/jsonl or csv)"""
     try:
         days = request.args.get('days', 30, type=int)
         format_type = request.args.get('format', 'json')
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({'status': 'error', 'message': f'Unknown format: {format_type}'}), 400
         
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
+        period = f'{start_date.date()} to {end_date.date()}'
         
-        # Get all requests in the period
-        requests = PatientRequest.query.filter(
-            PatientRequest.timestamp >= start_date
-        ).all()
+        # Rows are fetched and serialized in batches while the response is sent
+        body = stream_export(format_type, start_date, end_date, period)
+        response = Response(stream_with_context(body), mimetype=EXPORT_FORMATS[format_type])
+        if format_type != 'json':
+            filename = f'bedsidebot_requests_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{format_type}'
+            response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
         
-        export_data = []
-        for req in requests:
-            patient = Patient.query.filter_by(patient_id=req.patient_id).first()
-            export_data.append({
-                'timestamp': req.timestamp.isoformat(),
-                'patient_id': req.patient_id,
-                'patient_name': patient.full_name if patient else 'Unknown',
-                'room_number': req.room_number,
-                'bed_number': req.bed_number,
-                'request_type': req.request_type,
-                'request_method': req.request_method,
-                'request_message': req.request_message,
-                'status': req.status,
-                'urgency_level': req.urgency_level,
-                'response_time_minutes': ((req.response_time - req.timestamp).total_seconds() / 60) if req.response_time else None
-            })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@analytics_bp.route('/api/analytics/export/columnar', methods=['POST'])
+def run_columnar_export():
+    """Rebuild the partitioned Parquet/Arrow export for days with new or recently changed requests"""
+    if not columnar_export_available():
+        return jsonify({'status': 'error', 'message': 'Columnar export is unavailable: the pyarrow package is not installed'}), 503
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        file_format = data.get('format', 'parquet')
+        if file_format not in FILE_EXTENSIONS:
+            return jsonify({'status': 'error', 'message': f'Unknown format: {file_format}'}), 400
         
-        return jsonify({
-            'status': 'success',
-            'data': export_data,
-            'total_records': len(export_data),
-            'period': f'{start_date.date()} to {end_date.date()}'
-        })
+        since_id = data.get('since_id')
+        if since_id is not None:
+            try:
+                since_id = int(since_id)
+            except (TypeError, ValueError):
+                return jsonify({'status': 'error', 'message': 'since_id must be an integer request id'}), 400
         
+        summary = export_requests(
+            file_format=file_format,
+            full=bool(data.get('full', False)),
+            since_id=since_id,
+            compression=data.get('compression', 'zstd')
+        )
+        return jsonify({'status': 'success', 'data': summary})
+        
+    except RuntimeError as e:
+        # Another export holds the directory lock
+        return jsonify({'status': 'error', 'message': str(e)}), 409
     except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@analytics_bp.route('/api/analytics/export/columnar', methods=['GET'])
+def get_columnar_export():
+    """Watermark and files of the last columnar export"""
+    try:
+        return jsonify({'status': 'success', 'data': read_watermark(COLUMNAR_EXPORT_DIR)})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@analytics_bp.route('/api/analytics/export/columnar/files/<path:filename>', methods=['GET'])
+def download_columnar_export(filename):
+    """Download one exported partition file"""
+    return send_from_directory(os.path.abspath(COLUMNAR_EXPORT_DIR), filename, as_attachment=True)
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, Response, request, jsonify, send_from_directory, redirect
+from flask import Flask, render_template, Response, request, jsonify, send_from_directory, redirect, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -8,11 +8,21 @@ import os
 import tensorflow as tf
 from datetime import datetime, date
 from dotenv import load_dotenv
+from sqlalchemy import func
 # from security import security, require_auth, validate_patient_data, sanitize_patient_data, log_security_event
-from database import db, init_database, Hospital, Staff, Patient, PatientRequest, MonitoringSession, Caregiver, SystemAnalytics, get_patient_request_patterns
+from database import db, init_database, Hospital, Staff, Patient, PatientRequest, MonitoringSession, Caregiver, SystemAnalytics
 from analytics_routes import analytics_bp
 # Use instant notifications - works immediately for any user
 from instant_notifications import notify_caregivers_instant as notify_caregivers
+from notification_queue import NotificationDispatcher
+from provider_health import provider_registry
+from event_broker import create_broker, format_sse
+from session_registry import create_session_registry
+from gesture_events import GestureStabilizer, new_gesture_state, parse_batch
+from rollups import record_request_created
+from request_responses import respond_to_requests, MAX_BULK_REQUESTS, TRANSITIONS
+from patient_reports import build_report, get_patient_report, render_report, STYLESHEET_URL
+from ward_reports import generate_ward_report, ward_report_filename, OUTPUT_FORMATS as WARD_REPORT_FORMATS
 
 # Load environment variables
 load_dotenv()
@@ -45,17 +55,21 @@ registration_data = {
     'caregivers': []
 }
 
-# Latest request storage
-latest_request = None
-selected_button = None
-detected_button = None
-previous_button = None
+# Per-bed monitoring sessions (patient info, active features, selected button, latest request)
+sessions = create_session_registry()
 
-# Patient information
-patient_info = {"name": "", "bed_number": ""}
+# Real-time events for ICU dashboards (every open dashboard sees every request)
+event_broker = create_broker()
+SSE_HEARTBEAT_SECONDS = 15
+LONG_POLL_MAX_SECONDS = 30
 
-# Active features
-active_features = set()
+# Background notification delivery (keeps /set_button off the slow SMS/email path);
+# dashboards follow each job's delivery state through the event stream
+notification_dispatcher = NotificationDispatcher(
+    notify_caregivers,
+    num_workers=int(os.environ.get('NOTIFICATION_WORKERS', 4)),
+    on_update=lambda job: event_broker.publish('notification_updated', job)
+)
 
 # Default caregiver info (fallback)
 default_caregiver = {
@@ -310,18 +324,24 @@ def register_caregiver():
 @app.route('/api/get_patients', methods=['GET'])
 def get_patients():
     try:
-        patients = Patient.query.filter_by(is_active=True).all()
-        patient_list = []
+        # Last activity per patient in the same query (grouped max over the
+        # (patient_id, timestamp) index) instead of one query per patient
+        last_activity = db.session.query(
+            PatientRequest.patient_id.label('patient_id'),
+            func.max(PatientRequest.timestamp).label('last_activity')
+        ).group_by(PatientRequest.patient_id).subquery()
         
-        for patient in patients:
+        rows = db.session.query(Patient, last_activity.c.last_activity).outerjoin(
+            last_activity, last_activity.c.patient_id == Patient.patient_id
+        ).filter(Patient.is_active == True).all()
+        
+        patient_list = []
+        for patient, last_request_time in rows:
             patient_dict = patient.to_dict()
             # Add compatibility fields for dashboard
             patient_dict['id'] = patient.patient_id
             patient_dict['name'] = patient.full_name
-            
-            # Add last activity from recent requests
-            recent_request = PatientRequest.query.filter_by(patient_id=patient.patient_id).order_by(PatientRequest.timestamp.desc()).first()
-            patient_dict['lastActivity'] = recent_request.timestamp.strftime('%Y-%m-%d %H:%M') if recent_request else 'No recent activity'
+            patient_dict['lastActivity'] = last_request_time.strftime('%Y-%m-%d %H:%M') if last_request_time else 'No recent activity'
             patient_list.append(patient_dict)
         
         return jsonify({"status": "success", "patients": patient_list})
@@ -374,13 +394,72 @@ def test_notification():
 
 @app.route('/api/get_latest_request', methods=['GET'])
 def get_latest_request():
-    global latest_request
-    if latest_request:
-        request_data = latest_request
-        latest_request = None
-        return jsonify({"request": request_data})
+    """Pop the newest unread request (for one bed with ?patient_id=, else across all beds)"""
+    patient_id = request.args.get('patient_id')
+    if patient_id:
+        session = sessions.get(patient_id)
+        candidates = [session] if session else []
+    else:
+        candidates = [s for s in sessions.sessions() if s.latest_request]
+    
+    if candidates:
+        session = max(candidates, key=lambda s: (s.latest_request or {}).get('timestamp', 0))
+        with session.lock:
+            request_data = session.latest_request
+            session.latest_request = None
+        if request_data:
+            sessions.save(session)
+            return jsonify({"request": request_data})
     return jsonify({"request": None})
 
+@app.route('/api/sessions', methods=['GET'])
+def get_sessions():
+    """List active bedside monitoring sessions"""
+    sessions.evict_idle()
+    return jsonify({"status": "success", "sessions": [s.to_dict() for s in sessions.sessions()]})
+
+@app.route('/api/events/stream', methods=['GET'])
+@limiter.exempt
+def stream_events():
+    """Server-Sent Events stream of patient requests for the ICU dashboard"""
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('since'))
+    last_event_id = int(last_event_id) if last_event_id and str(last_event_id).isdigit() else None
+    subscriber = event_broker.subscribe(last_event_id)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                events = subscriber.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if not events:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": heartbeat\n\n"
+                    continue
+                for event in events:
+                    yield format_sse(event)
+        finally:
+            event_broker.unsubscribe(subscriber)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/events/poll', methods=['GET'])
+@limiter.exempt
+def poll_events():
+    """Long-poll fallback: wait for events newer than `since`"""
+    since = request.args.get('since', type=int)
+    timeout = min(request.args.get('timeout', 25, type=float), LONG_POLL_MAX_SECONDS)
+    
+    # First call only learns the current position
+    if since is None:
+        return jsonify({"status": "success", "events": [], "last_event_id": event_broker.last_event_id()})
+    
+    events = event_broker.events_since(since, timeout)
+    last_event_id = events[-1]['id'] if events else since
+    return jsonify({"status": "success", "events": events, "last_event_id": last_event_id})
+
 @app.route('/api/remove_patient', methods=['POST'])
 def remove_patient():
     try:
@@ -422,38 +501,68 @@ def remove_patient():
         print(f"[ERROR] Failed to remove patient: {e}")
         return jsonify({"status": "error", "message": f"Failed to remove patient: {str(e)}"}), 500
 
-# Monitoring routes (simplified for cloud)
-@app.route('/start_monitoring', methods=['POST'])
-def start_monitoring():
-    global active_features, patient_info
-    data = request.json
+def get_request_patient_id(data=None):
+    """Patient/bed a bedside client is acting for (JSON body or ?patient_id=)"""
+    data = data or {}
+    return data.get('patientId') or data.get('patient_id') or request.args.get('patient_id')
+
+def get_monitoring_session(data=None):
+    """Session for the requesting bed; clients that name no bed get the most recent one"""
+    patient_id = get_request_patient_id(data)
+    if patient_id:
+        return sessions.get(patient_id)
+    return sessions.most_recent()
+
+def resolve_patient_info(patient_id, data):
+    """Build monitoring patient info for a bed from the database or registration data"""
+    if patient_id:
+        patient = Patient.query.filter_by(patient_id=patient_id).first()
+        if patient:
+            return {
+                "name": patient.full_name,
+                "id": patient.patient_id,
+                "bed_number": patient.bed_number,
+                "room_number": patient.room_number,
+                "primary_condition": patient.primary_condition
+            }
+    
     # Get patient from registered patients
     patients = registration_data.get('patients', [])
+    if patient_id:
+        patients = [p for p in patients if patient_id in (p.get('patientId'), p.get('id'))] or patients
     if patients:
         patient = patients[0]
-        patient_info = {
+        return {
             "name": patient.get("fullName", data.get("patientName", "")),
             "id": patient.get("patientId", "N/A"),
             "bed_number": patient.get("bedNumber", data.get("bedNumber", "")),
             "room_number": patient.get("roomNumber", "N/A"),
             "primary_condition": patient.get("primaryCondition", "N/A")
         }
-    else:
-        patient_info = {
-            "name": data.get("patientName", ""),
-            "id": "N/A",
-            "bed_number": data.get("bedNumber", ""),
-            "room_number": "N/A",
-            "primary_condition": "N/A"
-        }
-    active_features = set(data.get("features", []))
-    return jsonify({"status": "success", "message": "Monitoring started (cloud mode)"})
+    return {
+        "name": data.get("patientName", ""),
+        "id": patient_id or "N/A",
+        "bed_number": data.get("bedNumber", ""),
+        "room_number": "N/A",
+        "primary_condition": "N/A"
+    }
+
+# Monitoring routes (simplified for cloud)
+@app.route('/start_monitoring', methods=['POST'])
+def start_monitoring():
+    data = request.json or {}
+    patient_id = get_request_patient_id(data)
+    patient_info = resolve_patient_info(patient_id, data)
+    
+    session_key = patient_id or (patient_info["id"] if patient_info["id"] != "N/A" else None)
+    session = sessions.start(session_key, patient_info, data.get("features", []))
+    return jsonify({"status": "success", "message": "Monitoring started (cloud mode)", "session_id": session.key, "patient": patient_info})
 
 @app.route('/get_selected_button')
 def get_selected_button():
-    global selected_button
+    session = get_monitoring_session()
     # Simulate button detection for demo
-    return jsonify({"button": selected_button, "text": "Demo Mode"})
+    return jsonify({"button": session.selected_button if session else None, "text": "Demo Mode"})
 
 @app.route('/set_button', methods=['POST'])
 def set_button():
@@ -464,10 +573,46 @@ def set_button():
     if button and 1 <= button <= 5:
         button_names = ["Call Nurse", "Water", "Food", "Bathroom", "Emergency"]
         action_name = button_names[button - 1]
-        return set_button_internal(button, 'gesture', f'Hand Gesture: {action_name}')
+        return set_button_internal(button, 'gesture', f'Hand Gesture: {action_name}', get_monitoring_session(data))
     
     return jsonify({"status": "error", "message": "Invalid gesture"})
 
+@app.route('/api/beds/<bed>/events', methods=['POST'])
+@limiter.exempt
+def ingest_gesture_events(bed):
+    """Batched finger counts from browser hand tracking; the server decides what is a request"""
+    body = request.get_data() if request.mimetype == 'application/octet-stream' else request.get_json(silent=True)
+    try:
+        epoch, events = parse_batch(body, request.mimetype)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    def ingest(session):
+        if session.gesture_state is None:
+            session.gesture_state = new_gesture_state()
+        return GestureStabilizer(session.gesture_state).ingest(epoch, events)
+
+    # Stabilizer state is kept with the session and updated atomically, so every
+    # worker sees the same vote and seq
+    session, result = sessions.update(bed, ingest)
+    if not session:
+        return jsonify({"status": "error", "message": "No monitoring session for this bed"}), 404
+    if result is None:
+        return jsonify({"status": "error", "message": "Another page is sending events for this bed"}), 409
+
+    accepted, duplicates, last_seq, button = result
+    if button:
+        action_name = ["Call Nurse", "Water", "Food", "Bathroom", "Emergency"][button - 1]
+        set_button_internal(button, 'gesture', f'Hand Gesture: {action_name}', session)
+
+    return jsonify({
+        "status": "success",
+        "accepted": accepted,
+        "duplicates": duplicates,
+        "last_seq": last_seq,
+        "button": button
+    })
+
 @app.route('/listen_voice', methods=['POST'])
 def listen_voice():
     # Simulate voice recognition for demo
@@ -491,20 +636,23 @@ def simulate_voice_request():
     button = voice_map.get(voice_command)
     if button:
         # Use the same logic as set_button
-        return set_button_internal(button, 'voice', f'Voice Command: {voice_command}')
+        return set_button_internal(button, 'voice', f'Voice Command: {voice_command}', get_monitoring_session(data))
     
     return jsonify({"status": "error", "message": "Voice command not recognized"})
 
-def set_button_internal(button, method, message):
+def set_button_internal(button, method, message, session=None):
     """Internal function to handle button requests from different sources"""
-    global selected_button, latest_request
+    patient_info = session.patient_info if session else {}
     
     if button and 1 <= button <= 5:
-        selected_button = button
+        if session:
+            with session.lock:
+                session.selected_button = button
         button_names = ["Call Nurse", "Water", "Food", "Bathroom", "Emergency"]
         action_name = button_names[button - 1]
         
         # Save request to database
+        request_id = None
         try:
             new_request = PatientRequest(
                 patient_id=patient_info.get("id", "UNKNOWN"),
@@ -513,16 +661,22 @@ def set_button_internal(button, method, message):
                 request_message=message,
                 room_number=patient_info.get("room_number", "N/A"),
                 bed_number=patient_info.get("bed_number", "N/A"),
-                urgency_level='critical' if button == 5 else 'normal'
+                urgency_level='critical' if button == 5 else 'normal',
+                timestamp=datetime.utcnow(),
+                status='pending'
             )
             
             db.session.add(new_request)
+            record_request_created(new_request)
             db.session.commit()
+            request_id = new_request.id
             
         except Exception as e:
+            db.session.rollback()
             print(f"[ERROR] Failed to save request: {e}")
         
-        # Send notifications to caregivers
+        # Queue notifications to caregivers (delivered by background workers)
+        notification_id = None
         try:
             # Get all registered caregivers (from memory + database)
             memory_caregivers = registration_data.get('caregivers', [])
@@ -531,18 +685,19 @@ def set_button_internal(button, method, message):
             all_caregivers = memory_caregivers + [cg.to_dict() for cg in db_caregivers]
             
             if all_caregivers:
-                notify_caregivers(
+                notification_id = notification_dispatcher.enqueue(
                     all_caregivers,
                     patient_info.get("name", "Unknown Patient"),
                     button,
                     patient_info.get("room_number", "N/A"),
-                    patient_info.get("bed_number", "N/A")
+                    patient_info.get("bed_number", "N/A"),
+                    request_id=request_id
                 )
-                print(f"[SUCCESS] Notifications sent to {len(all_caregivers)} caregivers")
+                print(f"[INFO] Notifications queued for {len(all_caregivers)} caregivers")
             else:
                 print("[WARNING] No caregivers registered for notifications")
         except Exception as e:
-            print(f"[ERROR] Failed to send notifications: {e}")
+            print(f"[ERROR] Failed to queue notifications: {e}")
         
         # Update latest request for real-time dashboard
         latest_request = {
@@ -554,19 +709,126 @@ def set_button_internal(button, method, message):
             "requestType": button,
             "timestamp": time.time(),
             "message": message,
-            "type": method
+            "type": method,
+            "requestId": request_id,
+            "notificationId": notification_id
         }
         
+        if session:
+            with session.lock:
+                session.latest_request = latest_request
+            sessions.save(session)
+        
+        # Push to every connected ICU dashboard
+        try:
+            event_broker.publish('patient_request', latest_request)
+        except Exception as e:
+            print(f"[ERROR] Failed to publish request event: {e}")
+        
         print(f"[NOTIFICATION] {patient_info.get('name', 'Patient')} - {action_name} ({method})")
-        return jsonify({"status": "success", "message": action_name})
+        return jsonify({"status": "success", "message": action_name, "notification_id": notification_id})
     
     return jsonify({"status": "error", "message": "Invalid request"})
 
+@app.route('/api/notifications', methods=['GET'])
+def get_notifications():
+    """Get recent notification jobs and dispatcher queue statistics"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        "status": "success",
+        "notifications": notification_dispatcher.recent(limit),
+        "stats": notification_dispatcher.stats()
+    })
+
+@app.route('/api/notifications/providers', methods=['GET'])
+def get_notification_providers():
+    """Get circuit breaker state and rolling health stats per SMS/email provider"""
+    return jsonify({"status": "success", "providers": provider_registry.stats()})
+
+@app.route('/api/notifications/<notification_id>', methods=['GET'])
+@limiter.exempt
+def get_notification_status(notification_id):
+    """Get delivery state of a queued notification"""
+    job = notification_dispatcher.status(notification_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Notification not found"}), 404
+    return jsonify({"status": "success", "notification": job})
+
+@app.route('/api/notifications/<notification_id>/ack', methods=['POST'])
+def acknowledge_notification(notification_id):
+    """Mark a notification as acknowledged from the ICU dashboard"""
+    data = request.get_json(silent=True) or {}
+    job = notification_dispatcher.ack(notification_id, data.get('acknowledged_by'))
+    if not job:
+        return jsonify({"status": "error", "message": "Notification not found"}), 404
+    return jsonify({"status": "success", "notification": job})
+
+def publish_request_updates(updated):
+    """Tell every open dashboard which requests were acknowledged/completed"""
+    if updated:
+        event_broker.publish('requests_updated', {"requests": updated})
+
+def respond_to_request(request_id, status):
+    data = request.get_json(silent=True) or {}
+    try:
+        updated = respond_to_requests([request_id], status, data.get('responded_by'), data.get('notes'))
+    except Exception as e:
+        print(f"[ERROR] Failed to update request {request_id}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    if not updated:
+        existing = db.session.get(PatientRequest, request_id)
+        if not existing:
+            return jsonify({"status": "error", "message": "Request not found"}), 404
+        return jsonify({"status": "error", "message": f"Request is already {existing.status}"}), 409
+
+    publish_request_updates(updated)
+    return jsonify({"status": "success", "request": updated[0]})
+
+@app.route('/api/requests/<int:request_id>/acknowledge', methods=['POST'])
+def acknowledge_request(request_id):
+    """Acknowledge a patient request (stamps response time and responder)"""
+    return respond_to_request(request_id, 'acknowledged')
+
+@app.route('/api/requests/<int:request_id>/complete', methods=['POST'])
+def complete_request(request_id):
+    """Mark a patient request as completed"""
+    return respond_to_request(request_id, 'completed')
+
+@app.route('/api/requests/acknowledge', methods=['POST'])
+def bulk_acknowledge_requests():
+    """Acknowledge (or complete, with "status": "completed") many requests in one call"""
+    data = request.get_json(silent=True) or {}
+    request_ids = data.get('request_ids') or []
+    status = data.get('status', 'acknowledged')
+
+    if not isinstance(request_ids, list) or not all(isinstance(i, int) for i in request_ids):
+        return jsonify({"status": "error", "message": "request_ids must be a list of request IDs"}), 400
+    if len(request_ids) > MAX_BULK_REQUESTS:
+        return jsonify({"status": "error", "message": f"At most {MAX_BULK_REQUESTS} requests per call"}), 400
+    if status not in TRANSITIONS:
+        return jsonify({"status": "error", "message": f"Unknown status: {status}"}), 400
+
+    try:
+        updated = respond_to_requests(request_ids, status, data.get('responded_by'), data.get('notes'))
+    except Exception as e:
+        print(f"[ERROR] Failed to update requests: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    publish_request_updates(updated)
+    updated_ids = {row['id'] for row in updated}
+    return jsonify({
+        "status": "success",
+        "updated": updated,
+        "skipped": [i for i in request_ids if i not in updated_ids]
+    })
+
 @app.route('/stop_monitoring', methods=['POST'])
 def stop_monitoring():
-    global active_features, selected_button
-    active_features.clear()
-    selected_button = None
+    data = request.get_json(silent=True) or {}
+    session = get_monitoring_session(data)
+    if session:
+        sessions.remove(session.key)
     return jsonify({"status": "success", "message": "Monitoring stopped"})
 
 @app.route('/api/patient/details/<patient_id>', methods=['GET'])
@@ -605,24 +867,12 @@ def test_patients():
 def print_patient_report_direct(patient_id):
     """Direct HTML report for printing"""
     try:
-        # Get patient data
-        patient = Patient.query.filter_by(patient_id=patient_id).first()
-        if not patient:
+        # Rendered from the report template (cached until the patient's data changes)
+        report_html = get_patient_report(patient_id)
+        if report_html is None:
             return '<h1>Patient not found</h1>'
         
-        # Get patient requests (last 30 days)
-        from datetime import timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        requests = PatientRequest.query.filter(
-            PatientRequest.patient_id == patient_id,
-            PatientRequest.timestamp >= thirty_days_ago
-        ).order_by(PatientRequest.timestamp.desc()).all()
-        
-        # Get request patterns
-        patterns = get_patient_request_patterns(patient_id, 30)
-        
-        # Generate and return HTML report directly
-        return generate_report_html(patient, requests, patterns)
+        return report_html
         
     except Exception as e:
         return f'<h1>Error generating report: {str(e)}</h1>'
@@ -654,25 +904,11 @@ def test_report():
 def generate_patient_report(patient_id):
     """Generate comprehensive patient report"""
     try:
-        # Get patient data
-        patient = Patient.query.filter_by(patient_id=patient_id).first()
-        if not patient:
+        # The HTML is opened in a new window, so link the stylesheet absolutely
+        report_html = get_patient_report(patient_id, stylesheet_url=request.host_url.rstrip('/') + STYLESHEET_URL)
+        if report_html is None:
             return jsonify({'status': 'error', 'message': 'Patient not found'}), 404
         
-        # Get patient requests (last 30 days)
-        from datetime import timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        requests = PatientRequest.query.filter(
-            PatientRequest.patient_id == patient_id,
-            PatientRequest.timestamp >= thirty_days_ago
-        ).order_by(PatientRequest.timestamp.desc()).all()
-        
-        # Get request patterns
-        patterns = get_patient_request_patterns(patient_id, 30)
-        
-        # Generate HTML report
-        report_html = generate_report_html(patient, requests, patterns)
-        
         return jsonify({
             'status': 'success',
             'report': report_html
@@ -681,252 +917,32 @@ def generate_patient_report(patient_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-def generate_report_html(patient, requests, patterns):
-    """Generate HTML report for printing"""
-    
-    # Calculate age
-    age = 'N/A'
-    if patient.date_of_birth:
-        today = date.today()
-        age = today.year - patient.date_of_birth.year - ((today.month, today.day) < (patient.date_of_birth.month, patient.date_of_birth.day))
-    
-    # Request type names
-    request_types = {
-        1: 'Call Nurse',
-        2: 'Water Request', 
-        3: 'Food Request',
-        4: 'Bathroom Assistance',
-        5: 'Emergency Alert'
-    }
+@app.route('/api/reports/ward', methods=['GET'])
+def generate_ward_reports():
+    """Reports for every active patient in a department, as one paginated HTML page or a zip"""
+    department = request.args.get('department')
+    output = request.args.get('format', 'html')
+    days = request.args.get('days', 30, type=int)
+    if output not in WARD_REPORT_FORMATS:
+        return jsonify({'status': 'error', 'message': f'Unknown format: {output}'}), 400
     
-    # Generate request summary
-    request_summary = []
-    for req_type, count in patterns.get('request_types', {}).items():
-        request_summary.append(f"{request_types.get(req_type, 'Unknown')}: {count} times")
-    
-    # Recent requests table
-    recent_requests_html = ''
-    for req in requests[:20]:  # Last 20 requests
-        recent_requests_html += f'''
-        <tr>
-            <td>{req.timestamp.strftime('%Y-%m-%d %H:%M')}</td>
-            <td>{request_types.get(req.request_type, 'Unknown')}</td>
-            <td>{req.request_method.title()}</td>
-            <td>{req.status.title()}</td>
-        </tr>
-        '''
-    
-    report_html = f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Patient Report - {patient.full_name}</title>
-        <style>
-            @media print {{
-                body {{ margin: 0; }}
-                .no-print {{ display: none; }}
-            }}
-            body {{
-                font-family: "Times New Roman", serif;
-                font-size: 12pt;
-                line-height: 1.4;
-                margin: 20px;
-                color: #000;
-            }}
-            .header {{
-                text-align: center;
-                border-bottom: 2px solid #000;
-                padding-bottom: 10px;
-                margin-bottom: 20px;
-            }}
-            .hospital-name {{
-                font-size: 18pt;
-                font-weight: bold;
-                margin-bottom: 5px;
-            }}
-            .report-title {{
-                font-size: 16pt;
-                font-weight: bold;
-                margin-bottom: 5px;
-            }}
-            .report-date {{
-                font-size: 10pt;
-                color: #666;
-            }}
-            .section {{
-                margin-bottom: 20px;
-                page-break-inside: avoid;
-            }}
-            .section-title {{
-                font-size: 14pt;
-                font-weight: bold;
-                border-bottom: 1px solid #000;
-                padding-bottom: 3px;
-                margin-bottom: 10px;
-            }}
-            .info-grid {{
-                display: grid;
-                grid-template-columns: 1fr 1fr;
-                gap: 20px;
-                margin-bottom: 15px;
-            }}
-            .info-item {{
-                margin-bottom: 8px;
-            }}
-            .label {{
-                font-weight: bold;
-                display: inline-block;
-                width: 150px;
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 10px;
-            }}
-            th, td {{
-                border: 1px solid #000;
-                padding: 8px;
-                text-align: left;
-            }}
-            th {{
-                background-color: #f0f0f0;
-                font-weight: bold;
-            }}
-            .stats-grid {{
-                display: grid;
-                grid-template-columns: repeat(3, 1fr);
-                gap: 15px;
-                margin: 15px 0;
-            }}
-            .stat-box {{
-                border: 1px solid #000;
-                padding: 10px;
-                text-align: center;
-            }}
-            .stat-number {{
-                font-size: 18pt;
-                font-weight: bold;
-                color: #000;
-            }}
-            .stat-label {{
-                font-size: 10pt;
-                margin-top: 5px;
-            }}
-            .print-btn {{
-                background: #007bff;
-                color: white;
-                border: none;
-                padding: 10px 20px;
-                border-radius: 5px;
-                cursor: pointer;
-                font-size: 12pt;
-                margin: 20px 0;
-            }}
-            .footer {{
-                margin-top: 30px;
-                padding-top: 10px;
-                border-top: 1px solid #000;
-                font-size: 10pt;
-                text-align: center;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <div class="hospital-name">BedsideBot Healthcare System</div>
-            <div class="report-title">Patient Monitoring Report</div>
-            <div class="report-date">Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</div>
-        </div>
-        
-        <button class="print-btn no-print" onclick="window.print()">🖨️ Print Report</button>
-        
-        <div class="section">
-            <div class="section-title">Patient Information</div>
-            <div class="info-grid">
-                <div>
-                    <div class="info-item"><span class="label">Full Name:</span> {patient.full_name}</div>
-                    <div class="info-item"><span class="label">Patient ID:</span> {patient.patient_id}</div>
-                    <div class="info-item"><span class="label">Date of Birth:</span> {patient.date_of_birth.strftime('%B %d, %Y') if patient.date_of_birth else 'N/A'}</div>
-                    <div class="info-item"><span class="label">Age:</span> {age} years</div>
-                    <div class="info-item"><span class="label">Gender:</span> {patient.gender or 'N/A'}</div>
-                    <div class="info-item"><span class="label">Blood Type:</span> {patient.blood_type or 'N/A'}</div>
-                </div>
-                <div>
-                    <div class="info-item"><span class="label">Room Number:</span> {patient.room_number}</div>
-                    <div class="info-item"><span class="label">Bed Number:</span> {patient.bed_number}</div>
-                    <div class="info-item"><span class="label">Department:</span> {patient.department}</div>
-                    <div class="info-item"><span class="label">Care Level:</span> {patient.care_level}</div>
-                    <div class="info-item"><span class="label">Admission Date:</span> {patient.admission_date.strftime('%B %d, %Y') if patient.admission_date else 'N/A'}</div>
-                    <div class="info-item"><span class="label">Assigned Nurse:</span> {patient.assigned_nurse_id or 'N/A'}</div>
-                </div>
-            </div>
-        </div>
-        
-        <div class="section">
-            <div class="section-title">Medical Information</div>
-            <div class="info-item"><span class="label">Primary Condition:</span> {patient.primary_condition}</div>
-            <div class="info-item"><span class="label">Mobility Level:</span> {patient.mobility_level or 'N/A'}</div>
-            <div class="info-item"><span class="label">Attending Physician:</span> {patient.attending_physician or 'N/A'}</div>
-            {f'<div class="info-item"><span class="label">Medical History:</span> {patient.medical_history}</div>' if patient.medical_history else ''}
-            {f'<div class="info-item"><span class="label">Allergies:</span> {patient.allergies}</div>' if hasattr(patient, 'allergies') and patient.allergies else ''}
-            {f'<div class="info-item"><span class="label">Current Medications:</span> {patient.current_medications}</div>' if hasattr(patient, 'current_medications') and patient.current_medications else ''}
-        </div>
-        
-        <div class="section">
-            <div class="section-title">Request Summary (Last 30 Days)</div>
-            <div class="stats-grid">
-                <div class="stat-box">
-                    <div class="stat-number">{patterns.get('total_requests', 0)}</div>
-                    <div class="stat-label">Total Requests</div>
-                </div>
-                <div class="stat-box">
-                    <div class="stat-number">{len([r for r in requests if r.request_type == 5])}</div>
-                    <div class="stat-label">Emergency Alerts</div>
-                </div>
-                <div class="stat-box">
-                    <div class="stat-number">{round(sum(patterns.get('response_times', [0])) / len(patterns.get('response_times', [1])), 1) if patterns.get('response_times') else 0}</div>
-                    <div class="stat-label">Avg Response (min)</div>
-                </div>
-            </div>
-            
-            <div style="margin-top: 15px;">
-                <strong>Request Breakdown:</strong><br>
-                {'; '.join(request_summary) if request_summary else 'No requests in the last 30 days'}
-            </div>
-        </div>
-        
-        <div class="section">
-            <div class="section-title">Recent Activity (Last 20 Requests)</div>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Date & Time</th>
-                        <th>Request Type</th>
-                        <th>Method</th>
-                        <th>Status</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {recent_requests_html if recent_requests_html else '<tr><td colspan="4" style="text-align: center;">No recent requests</td></tr>'}
-                </tbody>
-            </table>
-        </div>
-        
-        <div class="section">
-            <div class="section-title">Communication Preferences</div>
-            <div class="info-item"><span class="label">Preferred Methods:</span> {', '.join(json.loads(patient.communication_methods)) if patient.communication_methods else 'Not specified'}</div>
-            {f'<div class="info-item"><span class="label">Communication Notes:</span> {patient.communication_notes}</div>' if patient.communication_notes else ''}
-        </div>
-        
-        <div class="footer">
-            <p>This report was generated by BedsideBot Healthcare System</p>
-            <p>For questions or concerns, please contact the nursing station</p>
-        </div>
-    </body>
-    </html>
-    '''
+    try:
+        body, count = generate_ward_report(department, output, days)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
     
-    return report_html
+    if output == 'zip':
+        filename = ward_report_filename(department)
+        response = Response(body, mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    else:
+        response = Response(body, mimetype='text/html')
+    response.headers['X-Report-Count'] = str(count)
+    return response
+
+def generate_report_html(patient, requests, patterns):
+    """Generate HTML report for printing"""
+    return render_report(build_report(patient, requests, patterns))
 
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 8080))
@@ -3,7 +3,6 @@ import mediapipe as mp
 from flask import Flask, render_template, Response, request, jsonify, redirect, url_for
 from flask_cors import CORS
 import threading
-from collections import deque
 import time
 import speech_recognition as sr
 import pyttsx3
@@ -17,35 +16,40 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 
+from bed_vision import BedVision, BUTTON_NAMES, SELECTION_BUFFER_TIME
+from camera_pipeline import CameraPipeline, MjpegBroadcaster
+from database import init_database
+from face_templates import MAX_ENROLL_IMAGES, decode_image, face_crop, enroll, load_template, cached_template, matches
+from frame_sources import open_source
+from vision_engine import VisionEngine, cameras_from_env
+
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///bedsidebot.db')
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 CORS(app)
 
-# Initialize Mediapipe Hand Detector with optimized settings
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=1,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.7,
-    model_complexity=0  # Use lighter model for speed
-)
 mp_drawing = mp.solutions.drawing_utils
 
-# Initialize face detector for basic face detection
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+# Speech engine, face detector, hand/eye detectors, local camera pipeline and its
+# video feed are set up by create_app(). Ward worker processes are spawned and
+# re-import this module, so nothing heavy may run at import time.
+engine = None
+face_cascade = None
+bedside = None
+camera = None
+broadcaster = None
 
 # Global variables
 selected_button = None
 detected_button = None
 previous_button = None
 last_selection_time = 0
-SELECTION_BUFFER_TIME = 3.0  # 3 seconds buffer between selections
-cap = None
-engine = pyttsx3.init()
+CAMERA_SOURCE = os.getenv("CAMERA_SOURCE", "0")  # Camera index, /dev/videoN, rtsp:// URL, video file or 'synthetic'
+FRAME_WAIT_TIMEOUT = 0.5  # How long the video feed waits for a processed frame before showing a status frame
 
 # Action mapping for notifications
 action_mapping = {
@@ -57,29 +61,14 @@ action_mapping = {
 }
 
 # Button names
-button_names = ["CALL NURSE", "WATER", "FOOD", "BATHROOM", "EMERGENCY"]
+button_names = BUTTON_NAMES
 
-# Patient information with face encoding
-patient_info = {"name": "", "bed_number": "", "face_encoding": None}
-patient_face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-patient_face_template = None
-patient_trained = False
+# Patient being monitored; enrolled face templates are in the database (face_templates.py)
+patient_info = {"name": "", "bed_number": "", "id": ""}
 
 # Active features
 active_features = set()
 
-# Gesture buffer
-gesture_buffer = deque(maxlen=20)
-
-# Eye gaze tracking variables - optimized
-gaze_buffer = deque(maxlen=10)  # Smaller buffer for speed
-eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-
-# Performance tracking
-frame_count = 0
-start_time = time.time()
-fps = 0
-
 # Registration data storage (in production, use a database)
 registration_data = {
     'hospital': {},
@@ -198,257 +187,139 @@ def get_request_type_from_text(action_text):
         return 5
     return 1  # Default to nurse call
 
-# Function to detect eye gaze direction
-def detect_eye_gaze(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    eyes = eye_cascade.detectMultiScale(gray, 1.3, 5)
-
-    if len(eyes) == 0:
-        return None
-
-    largest_eye = max(eyes, key=lambda eye: eye[2] * eye[3])
-    x, y, w, h = largest_eye
-
-    eye_roi = gray[y:y + h, x:x + w]
-    _, threshold = cv2.threshold(eye_roi, 70, 255, cv2.THRESH_BINARY_INV)
-
-    contours, _ = cv2.findContours(threshold, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-    if not contours:
-        return None
+# Function to check if detected face is the patient
+def is_patient_face(face_roi):
+    # Loaded by /start_monitoring or /train_patient_face; this runs on the camera thread
+    template = cached_template(patient_info.get("id"))
+    if template is None:
+        return True  # If no patient trained, allow all faces
+    
+    try:
+        # Use template matching for simple face comparison
+        return matches(face_roi, template)
+    except:
+        return False
 
-    largest_contour = max(contours, key=cv2.contourArea)
-    M = cv2.moments(largest_contour)
+# Whether the patient is the one in front of the camera (anyone is, until a face is enrolled)
+def patient_in_view(frame):
+    if cached_template(patient_info.get("id")) is None:
+        return True
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    return any(is_patient_face(frame[y:y + h, x:x + w]) for (x, y, w, h) in faces)
 
-    if M["m00"] == 0:
-        return None
+# Function to process a camera frame and recognize gestures and eye gaze
+def process_frame(frame):
+    global selected_button, detected_button, previous_button, last_selection_time
 
-    cx = int(M["m10"] / M["m00"])
-    cy = int(M["m01"] / M["m00"])
+    camera_frame = frame
+    frame, button = bedside.process(frame, active_features, last_selection_time, patient_info.get('name', ''))
 
-    eye_center_x = w // 2
+    # Only the enrolled patient can make requests (checked per selection, not per frame)
+    if button is not None and not patient_in_view(camera_frame):
+        print("⚠️ Selection ignored: enrolled patient's face not in view")
+        button = None
 
-    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-    cv2.circle(frame, (x + cx, y + cy), 2, (0, 0, 255), 3)
+    if button is not None:
+        selected_button = button
+        detected_button = selected_button
 
-    if cx < eye_center_x - 5:
-        return "left"
-    elif cx > eye_center_x + 5:
-        return "right"
-    else:
-        return "center"
+        button_idx = detected_button - 1
+        action_text = button_names[button_idx] if 0 <= button_idx < len(
+            button_names) else "Unknown Request"
+        notify_caregiver(action_text, patient_info["name"], patient_info["bed_number"])
+        previous_button = detected_button
+        last_selection_time = time.time()
 
-# Function to get stable eye gaze direction
-def get_stable_gaze():
-    if not gaze_buffer:
-        return None
+    return frame
 
-    valid_gazes = [g for g in gaze_buffer if g is not None]
-    if not valid_gazes:
-        return None
+# Open the bedside camera
+def open_camera():
+    return open_source(CAMERA_SOURCE, live=True)
 
-    return max(set(valid_gazes), key=valid_gazes.count)
 
-# Function to count raised fingers
-def count_raised_fingers(hand_landmarks):
-    if not hand_landmarks:
-        return 0
-    fingers_up = 0
-    tips = [8, 12, 16, 20]
-    base = [6, 10, 14, 18]
+# Encode a frame for the video feed
+def encode_jpeg(frame):
+    ret, buffer = cv2.imencode('.jpg', frame)
+    return buffer.tobytes() if ret else None
 
-    if hand_landmarks.landmark[4].x < hand_landmarks.landmark[3].x:
-        fingers_up += 1
+# Status frames shown while there is no camera frame (encoded once each)
+status_jpegs = {}
 
-    for tip, base_point in zip(tips, base):
-        if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[base_point].y:
-            fingers_up += 1
+def render_status_jpeg(lines):
+    key = lines[0][0]
+    if key not in status_jpegs:
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        for text, position, scale in lines:
+            cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), 2)
+        status_jpegs[key] = encode_jpeg(frame)
+    return status_jpegs[key]
 
-    return fingers_up
+def status_jpeg():
+    if camera.is_running():
+        return render_status_jpeg([('Processing...', (200, 240), 1)])
+    return render_status_jpeg([('Camera Not Started', (150, 240), 1), ('Click Start Monitoring', (120, 280), 0.7)])
 
-# Function to stabilize gesture recognition
-def get_stable_gesture():
-    if len(gesture_buffer) < 3:  # Need at least 3 readings
-        return None
-    
-    # Get most common gesture from recent readings
-    recent_gestures = list(gesture_buffer)[-10:]
-    valid_gestures = [g for g in recent_gestures if 1 <= g <= 5]
-    
-    if not valid_gestures:
-        return None
-        
-    # Return most frequent valid gesture
-    gesture_counts = {}
-    for g in valid_gestures:
-        gesture_counts[g] = gesture_counts.get(g, 0) + 1
-    
-    # Only return if gesture appears at least 2 times
-    max_gesture = max(gesture_counts, key=gesture_counts.get)
-    if gesture_counts[max_gesture] >= 2:
-        return max_gesture
-    
-    return None
-
-# Function to check if detected face is the patient
-def is_patient_face(face_roi):
-    global patient_trained, patient_face_template
-    
-    if not patient_trained or patient_face_template is None:
-        return True  # If no patient trained, allow all faces
-    
-    try:
-        gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
-        gray_face = cv2.resize(gray_face, (100, 100))
-        
-        # Use template matching for simple face comparison
-        result = cv2.matchTemplate(gray_face, patient_face_template, cv2.TM_CCOEFF_NORMED)
-        _, max_val, _, _ = cv2.minMaxLoc(result)
-        
-        # Higher value means better match (1.0 = perfect match)
-        return max_val > 0.6  # Adjust threshold as needed
-    except:
-        return False
-
-# Function to process camera feed and recognize gestures and eye gaze
-def process_frame():
-    global selected_button, cap, detected_button, previous_button, frame_count, start_time, fps, last_selection_time
-
-    if cap is None or not cap.isOpened():
-        return None
-
-    ret, frame = cap.read()
-    if not ret or frame is None:
-        return None
-    
-    # Calculate FPS
-    frame_count += 1
-    if frame_count % 30 == 0:
-        fps = 30 / (time.time() - start_time)
-        start_time = time.time()
-
-    # Keep standard resolution
-    frame = cv2.resize(frame, (640, 480))
-    
-    frame = cv2.flip(frame, 1)
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    
-    # Process hand detection
-    if "Hand Sign Detection" in active_features:
-        results = hands.process(rgb_frame)
-
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                fingers_count = count_raised_fingers(hand_landmarks)
-                gesture_buffer.append(fingers_count)
-                
-                # Show current finger count
-                cv2.putText(frame, f'Fingers: {fingers_count}', (10, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-            stable_gesture = get_stable_gesture()
-            if stable_gesture and 1 <= stable_gesture <= 5:
-                current_time = time.time()
-                
-                # Show detected gesture
-                cv2.putText(frame, f'Gesture: {stable_gesture}', (10, 80), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-                
-                # Check if enough time has passed since last selection
-                if (current_time - last_selection_time) >= SELECTION_BUFFER_TIME:
-                    selected_button = stable_gesture
-                    detected_button = selected_button
-                    
-                    button_idx = detected_button - 1
-                    action_text = button_names[button_idx] if 0 <= button_idx < len(
-                        button_names) else "Unknown Request"
-                    notify_caregiver(action_text, patient_info["name"], patient_info["bed_number"])
-                    previous_button = detected_button
-                    last_selection_time = current_time
-                    
-                    # Show selection confirmation
-                    cv2.putText(frame, f'SELECTED: {action_text}', (10, 110), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-    # Process eye gaze detection
-    if "Eye Gaze Detection" in active_features:
-        gaze_direction = detect_eye_gaze(frame)
-        if gaze_direction:
-            gaze_buffer.append(gaze_direction)
-            stable_gaze = get_stable_gaze()
-
-            if stable_gaze:
-                cv2.putText(frame, f'Gaze: {stable_gaze}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-
-                new_button = None
-                if stable_gaze == "left":
-                    new_button = 1
-                elif stable_gaze == "right":
-                    new_button = 5
-                elif stable_gaze == "center":
-                    new_button = 3
-
-                if new_button is not None:
-                    current_time = time.time()
-                    
-                    # Check if enough time has passed since last selection
-                    if (current_time - last_selection_time) >= SELECTION_BUFFER_TIME:
-                        selected_button = new_button
-                        detected_button = selected_button
-                        
-                        button_idx = detected_button - 1
-                        action_text = button_names[button_idx] if 0 <= button_idx < len(
-                            button_names) else "Unknown Request"
-                        notify_caregiver(action_text, patient_info["name"], patient_info["bed_number"])
-                        previous_button = detected_button
-                        last_selection_time = current_time
-
-    # Add system info to frame
-    cv2.putText(frame, f'FPS: {fps:.0f}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-    
-    # Show buffer status
-    current_time = time.time()
-    time_since_last = current_time - last_selection_time
-    if time_since_last < SELECTION_BUFFER_TIME:
-        remaining = SELECTION_BUFFER_TIME - time_since_last
-        cv2.putText(frame, f'Buffer: {remaining:.1f}s', (10, 120), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-    
-    # Add patient info
-    if patient_info.get('name'):
-        cv2.putText(frame, f'Patient: {patient_info["name"]}', (10, frame.shape[0] - 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-    return frame
+def ward_status_jpeg():
+    return render_status_jpeg([('Bed Camera Offline', (150, 240), 1), ('Reconnecting...', (220, 280), 0.7)])
 
 # Generate frames for video streaming
 def generate_frames():
-    global cap
-    
     # Initialize camera on first access
-    if cap is None:
-        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        if cap.isOpened():
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            cap.set(cv2.CAP_PROP_FPS, 30)
-    
-    while True:
-        if cap is None or not cap.isOpened():
-            # Show error frame
-            frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(frame, 'Camera Not Started', (150, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            cv2.putText(frame, 'Click Start Monitoring', (120, 280), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        else:
-            frame = process_frame()
-            if frame is None:
-                frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv2.putText(frame, 'Processing...', (200, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if ret:
-            yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-        
-        time.sleep(0.033)
+    if not camera.is_running():
+        camera.start()
+
+    return broadcaster.stream()
+
+def create_app():
+    """Set up the database, speech engine, detectors and local camera pipeline; returns the app"""
+    global engine, face_cascade, bedside, camera, broadcaster
+    if camera is None:
+        # Initialize database (patient face templates)
+        init_database(app)
+        engine = pyttsx3.init()
+        # Initialize face detector for basic face detection
+        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # Hand detector, eye detector and gesture/gaze buffers for the local camera
+        bedside = BedVision()
+        # Capture and inference run on their own threads; the video feed shows the latest processed frame
+        camera = CameraPipeline(open_camera, process_frame)
+        # Every viewer of the video feed shares one encoded copy of each frame
+        broadcaster = MjpegBroadcaster(camera.output, encode_jpeg, status_jpeg, FRAME_WAIT_TIMEOUT)
+    return app
+
+# Ward mode: one supervised worker process per bed camera listed in WARD_CAMERAS
+ward_engine = None
+ward_engine_lock = threading.Lock()
+ward_broadcasters = {}
+
+def handle_ward_event(event):
+    if event['type'] == 'selection':
+        notify_caregiver(event['text'], event['patient_name'], event['bed'])
+    else:
+        print(f"⚠️ Bed {event['bed']} camera problem ({event['type']}): {event.get('source')}")
+
+def start_ward_engine():
+    global ward_engine
+    with ward_engine_lock:
+        if ward_engine is None:
+            cameras = cameras_from_env()
+            if not cameras:
+                return None
+            ward_engine = VisionEngine(cameras, handle_ward_event)
+        ward_engine.start()
+        return ward_engine
+
+def stop_ward_engine():
+    global ward_engine
+    with ward_engine_lock:
+        if ward_engine is not None:
+            # Viewers read the engine's shared frames; stop them before the frames are unlinked
+            for ward_broadcaster in ward_broadcasters.values():
+                ward_broadcaster.close()
+            ward_broadcasters.clear()
+            ward_engine.stop()
+            ward_engine = None
 
 # Voice recognition function with trigger word
 def voice_recognition():
@@ -553,59 +424,85 @@ def video_feed():
     return Response(generate_frames(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+# Encoded photos in a /train_patient_face request, as raw bytes
+def uploaded_images():
+    if request.mimetype == 'multipart/form-data':
+        files = request.files.getlist('image') + request.files.getlist('images')
+        return [f.read() for f in files]
+    
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        # One photo as the request body, read straight into the NumPy buffer
+        return [request.get_data(cache=False)]
+    
+    # Legacy JSON: base64 data URLs
+    data = request.get_json(silent=True) or {}
+    images = data.get('images') or [data.get('image')]
+    return [base64.b64decode(image.split(',')[-1]) for image in images if image]
+
 @app.route('/train_patient_face', methods=['POST'])
 def train_patient_face():
-    global patient_trained, patient_face_template, patient_info
-    
+    """
+    Enroll the patient's face from one or more photos: multipart/form-data
+    (image/images files), a raw image body, or JSON with base64 data URLs.
+    ?append=1 averages them into the existing template instead of replacing it.
+    """
     try:
-        data = request.json
-        image_data = data.get('image')
+        data = request.form if request.mimetype == 'multipart/form-data' else (request.get_json(silent=True) or {})
+        patient_id = data.get('patientId') or request.args.get('patient_id') or patient_info.get("id")
+        if not patient_id:
+            return jsonify({"status": "error", "message": "patientId is required"}), 400
+        append = str(data.get('append', request.args.get('append', ''))).lower() in ('1', 'true', 'yes')
         
-        # Decode base64 image
-        image_data = image_data.split(',')[1]  # Remove data:image/jpeg;base64,
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        images = uploaded_images()
+        if not images:
+            return jsonify({"status": "error", "message": "No image uploaded"}), 400
+        if len(images) > MAX_ENROLL_IMAGES:
+            return jsonify({"status": "error", "message": f"At most {MAX_ENROLL_IMAGES} images per request"}), 400
         
-        # Convert to grayscale and detect face
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = patient_face_cascade.detectMultiScale(gray, 1.3, 5)
+        crops, rejected = [], 0
+        for encoded in images:
+            image = decode_image(encoded)
+            crop = face_crop(image) if image is not None else None
+            if crop is None:
+                rejected += 1
+            else:
+                crops.append(crop)
         
-        if len(faces) == 0:
+        if not crops:
             return jsonify({"status": "error", "message": "No face detected in image"})
         
-        # Use the largest face as template
-        (x, y, w, h) = max(faces, key=lambda face: face[2] * face[3])
-        face_roi = gray[y:y+h, x:x+w]
-        patient_face_template = cv2.resize(face_roi, (100, 100))
-        patient_trained = True
-        
-        return jsonify({"status": "success", "message": "Patient face trained successfully"})
+        template = enroll(patient_id, crops, append)
+        return jsonify({
+            "status": "success",
+            "message": "Patient face trained successfully",
+            "patient_id": patient_id,
+            "images_used": len(crops),
+            "images_rejected": rejected,
+            "sample_count": template.sample_count
+        })
         
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
 
 @app.route('/start_monitoring', methods=['POST'])
 def start_monitoring():
-    global active_features, patient_info, cap
+    global active_features, patient_info
 
     data = request.json
     patient_info = {
         "name": data.get("patientName", ""),
         "bed_number": data.get("bedNumber", ""),
-        "face_encoding": None
+        "id": data.get("patientId", "")
     }
     active_features = set(data.get("features", []))
+    if patient_info["id"]:
+        load_template(patient_info["id"])
     
     print(f"Starting monitoring for patient: {patient_info['name']} in bed: {patient_info['bed_number']}")
     print(f"Active features: {active_features}")
 
     # Initialize camera
-    if cap is None:
-        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 30)
+    camera.start()
 
     return jsonify({"status": "success", "message": "Monitoring started", "patient": patient_info})
 
@@ -700,11 +597,9 @@ def get_active_features():
 
 @app.route('/stop_monitoring', methods=['POST'])
 def stop_monitoring():
-    global cap, active_features, detected_button, previous_button, last_selection_time
+    global active_features, detected_button, previous_button, last_selection_time
 
-    if cap is not None:
-        cap.release()
-        cap = None
+    camera.stop()
 
     active_features.clear()
     detected_button = None
@@ -757,22 +652,70 @@ def get_all_requests():
 
 # Clean up resources when the app is shutting down
 def cleanup():
-    global cap
-    if cap is not None:
-        cap.release()
+    if camera is not None:
+        camera.stop()
+    stop_ward_engine()
     cv2.destroyAllWindows()
 
 # Add route to check camera status
 @app.route('/camera_status')
 def camera_status():
-    global cap
     status = {
-        'camera_available': cap is not None and cap.isOpened(),
+        'camera_available': camera.is_running(),
         'active_features': list(active_features),
-        'patient_info': patient_info
+        'patient_info': patient_info,
+        'pipeline': camera.stats(),
+        'video_feed': broadcaster.stats()
     }
     return jsonify(status)
 
+# Ward vision engine routes
+@app.route('/api/ward/start', methods=['POST'])
+def ward_start():
+    engine = start_ward_engine()
+    if engine is None:
+        return jsonify({"status": "error", "message": "No ward cameras configured (WARD_CAMERAS)"}), 400
+    return jsonify({"status": "success", "cameras": engine.status()})
+
+@app.route('/api/ward/stop', methods=['POST'])
+def ward_stop():
+    stop_ward_engine()
+    return jsonify({"status": "success", "message": "Ward cameras stopped"})
+
+@app.route('/api/ward/cameras')
+def ward_cameras():
+    engine = ward_engine
+    return jsonify({"running": engine is not None, "cameras": engine.status() if engine else []})
+
+@app.route('/api/ward/cameras/<bed>', methods=['POST'])
+def configure_ward_camera(bed):
+    engine = start_ward_engine()
+    data = request.get_json() or {}
+    settings = {}
+    if 'features' in data:
+        settings['features'] = data['features']
+    if 'patientName' in data:
+        settings['patient_name'] = data['patientName']
+
+    if engine is None or not engine.configure(bed, **settings):
+        return jsonify({"status": "error", "message": f"Unknown bed: {bed}"}), 404
+    return jsonify({"status": "success", "camera": engine.workers[bed].status()})
+
+@app.route('/video_feed/<bed>')
+def ward_video_feed(bed):
+    engine = start_ward_engine()
+    frames = engine.frames(bed) if engine else None
+    if frames is None:
+        return jsonify({"status": "error", "message": f"Unknown bed: {bed}"}), 404
+
+    with ward_engine_lock:
+        broadcaster = ward_broadcasters.get(bed)
+        if broadcaster is None:
+            broadcaster = ward_broadcasters[bed] = MjpegBroadcaster(
+                frames, encode_jpeg, ward_status_jpeg, FRAME_WAIT_TIMEOUT)
+    return Response(broadcaster.stream(),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
 # Simple camera test route
 @app.route('/camera_test')
 def camera_test():
@@ -792,6 +735,6 @@ if __name__ == "__main__":
         print("BedsideBot - Starting System...")
         print("Open your browser to: http://localhost:5000")
         print("Press Ctrl+C to stop the application")
-        app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
+        create_app().run(debug=True, host='0.0.0.0', port=5000, threaded=True)
     finally:
         cleanup()
\ No newline at end of file
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Request Rollup Backfill Script
+Rebuilds the hourly and daily request rollups (hourly_request_rollups and
+system_analytics) and the response-time sketches from patient_requests. An
+upgraded database is backfilled once at startup (migration 3 in migrations.py);
+run this any time the rollups need repairing.
+
+Usage:
+    python backfill_rollups.py            # all history
+    python backfill_rollups.py --days 30  # only the last 30 local days
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from rollups import rebuild
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild request rollups and response-time sketches')
+    parser.add_argument('--days', type=int, default=None,
+                        help='only rebuild the last N hospital-local days (default: all history)')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='requests fetched per database round trip')
+    args = parser.parse_args()
+
+    started = time.time()
+    with app.app_context():
+        hourly, daily, sketches = rebuild(days=args.days, batch_size=args.batch_size)
+
+    scope = f'last {args.days} days' if args.days else 'all history'
+    print(f"[OK] Rebuilt {hourly} hourly and {daily} daily rollup rows and {sketches} "
+          f"response-time sketches ({scope}) in {time.time() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
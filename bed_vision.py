@@ -0,0 +1,420 @@
+"""
+Bedside gesture and gaze recognition
+Everything one bed camera needs to turn frames into button selections: a
+MediaPipe hand detector, the Haar eye detector and the buffers that stabilize
+finger counts and gaze directions across frames. app_simple.py keeps one
+BedVision for its local camera; each vision engine worker keeps one per bed.
+
+Detection is scheduled adaptively. The full frame is searched every
+FULL_DETECT_INTERVAL frames; in between, the hand and the eye are tracked and
+detection only runs on a crop around where they were last seen. With no hand
+in view and nothing moving, hand detection and the full-frame eye search drop
+to every IDLE_INTERVAL-th frame and return to full rate as soon as anything
+moves; a tracked eye is still checked every frame, since that crop is cheap and
+gaze users hardly move. VISION_ADAPTIVE=0 runs full-frame detection on every
+frame instead.
+"""
+import os
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+import cv2
+import mediapipe as mp
+
+from gesture_events import SELECTION_BUFFER_TIME, GESTURE_BUFFER_SIZE, stable_gesture
+
+FRAME_SIZE = (640, 480)
+
+HAND_FEATURE = "Hand Sign Detection"
+GAZE_FEATURE = "Eye Gaze Detection"
+
+# Button names
+BUTTON_NAMES = ["CALL NURSE", "WATER", "FOOD", "BATHROOM", "EMERGENCY"]
+
+# Gaze direction -> button
+GAZE_BUTTONS = {"left": 1, "center": 3, "right": 5}
+
+# Adaptive detection scheduling
+ADAPTIVE = os.environ.get('VISION_ADAPTIVE', '1') != '0'
+FULL_DETECT_INTERVAL = 10  # Re-search the whole frame at least every N detections
+IDLE_INTERVAL = 6  # No hand and no motion: detect on every Nth frame
+ACTIVE_HOLD = 15  # Frames to stay at full rate after the last motion or hand
+MOTION_SIZE = (80, 60)  # Thumbnail compared between frames for motion
+MOTION_THRESHOLD = 3.0  # Mean absolute thumbnail difference (0-255) that counts as motion
+HAND_ROI_MARGIN = 0.5  # Padding around the tracked hand, as a fraction of its size
+MIN_HAND_ROI = 160
+HAND_ROI_SIZE = 256  # Hand crops are scaled to this square before inference
+EYE_ROI_MARGIN = 1.0
+MIN_EYE_ROI = 80
+
+
+def create_hand_detector():
+    """Mediapipe Hand Detector with optimized settings"""
+    return mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=1,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.7,
+        model_complexity=0  # Use lighter model for speed
+    )
+
+
+def load_eye_cascade():
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+
+
+def square_box(cx, cy, side, width, height):
+    """(x0, y0, x1, y1) of a square centred on (cx, cy), shifted to lie inside the frame"""
+    side = int(min(side, width, height))
+    x0 = int(min(max(cx - side / 2, 0), width - side))
+    y0 = int(min(max(cy - side / 2, 0), height - side))
+    return x0, y0, x0 + side, y0 + side
+
+
+def centered_box(cx, cy, side, width, height):
+    """(x0, y0, x1, y1) of a square centred on (cx, cy); may extend past the frame edge (see padded_crop)"""
+    side = int(min(side, max(width, height)))
+    x0 = int(cx - side / 2)
+    y0 = int(cy - side / 2)
+    return x0, y0, x0 + side, y0 + side
+
+
+def padded_crop(frame, box):
+    """The pixels under a box, padded with black where it runs off the frame so the crop stays square"""
+    x0, y0, x1, y1 = box
+    height, width = frame.shape[:2]
+    crop = frame[max(y0, 0):min(y1, height), max(x0, 0):min(x1, width)]
+    return cv2.copyMakeBorder(crop, max(-y0, 0), max(y1 - height, 0), max(-x0, 0), max(x1 - width, 0),
+                              cv2.BORDER_CONSTANT, value=(0, 0, 0))
+
+
+def button_text(button):
+    button_idx = button - 1
+    return BUTTON_NAMES[button_idx] if 0 <= button_idx < len(BUTTON_NAMES) else "Unknown Request"
+
+
+# Function to count raised fingers
+def count_raised_fingers(hand_landmarks):
+    if not hand_landmarks:
+        return 0
+    fingers_up = 0
+    tips = [8, 12, 16, 20]
+    base = [6, 10, 14, 18]
+
+    if hand_landmarks.landmark[4].x < hand_landmarks.landmark[3].x:
+        fingers_up += 1
+
+    for tip, base_point in zip(tips, base):
+        if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[base_point].y:
+            fingers_up += 1
+
+    return fingers_up
+
+
+# Function to get stable eye gaze direction
+def stable_gaze(gaze_buffer):
+    if not gaze_buffer:
+        return None
+
+    valid_gazes = [g for g in gaze_buffer if g is not None]
+    if not valid_gazes:
+        return None
+
+    return max(set(valid_gazes), key=valid_gazes.count)
+
+
+# Function to find the most prominent eye
+def largest_eye(gray, eye_cascade):
+    eyes = eye_cascade.detectMultiScale(gray, 1.3, 5)
+
+    if len(eyes) == 0:
+        return None
+
+    return max(eyes, key=lambda eye: eye[2] * eye[3])
+
+
+# Function to read the gaze direction from the pupil position within an eye box
+def gaze_direction(frame, gray, eye):
+    x, y, w, h = eye
+
+    eye_roi = gray[y:y + h, x:x + w]
+    _, threshold = cv2.threshold(eye_roi, 70, 255, cv2.THRESH_BINARY_INV)
+
+    contours, _ = cv2.findContours(threshold, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    largest_contour = max(contours, key=cv2.contourArea)
+    M = cv2.moments(largest_contour)
+
+    if M["m00"] == 0:
+        return None
+
+    cx = int(M["m10"] / M["m00"])
+    cy = int(M["m01"] / M["m00"])
+
+    eye_center_x = w // 2
+
+    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    cv2.circle(frame, (x + cx, y + cy), 2, (0, 0, 255), 3)
+
+    if cx < eye_center_x - 5:
+        return "left"
+    elif cx > eye_center_x + 5:
+        return "right"
+    else:
+        return "center"
+
+
+# Function to detect eye gaze direction
+def detect_eye_gaze(frame, eye_cascade):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    eye = largest_eye(gray, eye_cascade)
+    if eye is None:
+        return None
+    return gaze_direction(frame, gray, eye)
+
+
+class StageTimer:
+    """Wall time spent in each pipeline stage, per frame (for benchmarks: BedVision(timer=...))"""
+
+    def __init__(self):
+        self.frames = []
+        self._current = defaultdict(float)
+
+    def start_frame(self):
+        self._current = defaultdict(float)
+        self.frames.append(self._current)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current[name] += time.perf_counter() - started
+
+
+class BedVision:
+    """Gesture and gaze recognition state for one bed camera"""
+
+    def __init__(self, selection_buffer_time=SELECTION_BUFFER_TIME, adaptive=ADAPTIVE, timer=None):
+        self.selection_buffer_time = selection_buffer_time
+        self.adaptive = adaptive
+        self.timer = timer
+        self.hands = create_hand_detector()
+        self.eye_cascade = load_eye_cascade()
+        self.gesture_buffer = deque(maxlen=GESTURE_BUFFER_SIZE)
+        self.gaze_buffer = deque(maxlen=10)  # Smaller buffer for speed
+
+        # Adaptive scheduling state
+        self.roi_hands = None  # Separate tracker fed only hand crops
+        self.hand_box = None
+        self.eye_box = None
+        self._hand_roi_runs = 0
+        self._eye_roi_runs = 0
+        self._motion_thumb = None
+        self._active_until = ACTIVE_HOLD  # Start at full rate
+        self.counters = Counter()
+
+        # Latest per-frame readings (None when nothing was detected or the frame was skipped)
+        self.detected = False
+        self.fingers = None
+        self.gaze = None
+
+        # Performance tracking
+        self.frame_count = 0
+        self.start_time = None
+        self.fps = 0
+
+    def close(self):
+        self.hands.close()
+        if self.roi_hands is not None:
+            self.roi_hands.close()
+
+    def _stage(self, name):
+        return self.timer.stage(name) if self.timer is not None else nullcontext()
+
+    def _should_detect(self, gray):
+        """Full rate while something moves or a hand is tracked, IDLE_INTERVAL otherwise"""
+        if not self.adaptive:
+            return True
+
+        with self._stage('motion'):
+            thumb = cv2.resize(gray, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+            moving = self._motion_thumb is not None and cv2.absdiff(thumb, self._motion_thumb).mean() > MOTION_THRESHOLD
+            self._motion_thumb = thumb
+
+        if moving or self.hand_box is not None:
+            self._active_until = self.frame_count + ACTIVE_HOLD
+        return self.frame_count <= self._active_until or self.frame_count % IDLE_INTERVAL == 0
+
+    def _detect_hands(self, frame):
+        """Hand landmarks for this frame, from a crop around the tracked hand when there is one"""
+        height, width = frame.shape[:2]
+        if self.adaptive and self.hand_box is not None and self._hand_roi_runs < FULL_DETECT_INTERVAL:
+            x0, y0, x1, y1 = self.hand_box
+            if self.roi_hands is None:
+                self.roi_hands = create_hand_detector()
+            with self._stage('color'):
+                # Padded rather than clamped at the frame edge: a square crop scales
+                # to HAND_ROI_SIZE without stretching the hand
+                crop = padded_crop(frame, self.hand_box)
+                rgb = cv2.cvtColor(cv2.resize(crop, (HAND_ROI_SIZE, HAND_ROI_SIZE)), cv2.COLOR_BGR2RGB)
+            with self._stage('mediapipe'):
+                results = self.roi_hands.process(rgb)
+            origin = (x0, y0, x1 - x0, y1 - y0)
+            self._hand_roi_runs += 1
+            self.counters['hand_roi'] += 1
+        else:
+            with self._stage('color'):
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with self._stage('mediapipe'):
+                results = self.hands.process(rgb)
+            origin = (0, 0, width, height)
+            self._hand_roi_runs = 0
+            self.counters['hand_full'] += 1
+
+        landmarks = results.multi_hand_landmarks or []
+        self.hand_box = None
+        if landmarks and self.adaptive:
+            # Landmarks are normalized to the image they were found in
+            ox, oy, ow, oh = origin
+            xs = [ox + point.x * ow for point in landmarks[0].landmark]
+            ys = [oy + point.y * oh for point in landmarks[0].landmark]
+            side = max(max(xs) - min(xs), max(ys) - min(ys)) * (1 + 2 * HAND_ROI_MARGIN)
+            self.hand_box = centered_box((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2,
+                                         max(side, MIN_HAND_ROI), width, height)
+        return landmarks
+
+    def _detect_gaze(self, frame, gray):
+        """Gaze direction for this frame, searching around the tracked eye when there is one"""
+        if self.adaptive and self.eye_box is not None and self._eye_roi_runs < FULL_DETECT_INTERVAL:
+            x0, y0, x1, y1 = self.eye_box
+            with self._stage('haar'):
+                eye = largest_eye(gray[y0:y1, x0:x1], self.eye_cascade)
+            if eye is not None:
+                eye = (eye[0] + x0, eye[1] + y0, eye[2], eye[3])
+            self._eye_roi_runs += 1
+            self.counters['eye_roi'] += 1
+        else:
+            if gray is None:
+                with self._stage('color'):
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            with self._stage('haar'):
+                eye = largest_eye(gray, self.eye_cascade)
+            self._eye_roi_runs = 0
+            self.counters['eye_full'] += 1
+
+        if eye is None:
+            self.eye_box = None
+            return None
+
+        if self.adaptive:
+            x, y, w, h = eye
+            height, width = gray.shape
+            self.eye_box = square_box(x + w / 2, y + h / 2, max(max(w, h) * (1 + 2 * EYE_ROI_MARGIN), MIN_EYE_ROI),
+                                      width, height)
+        with self._stage('haar'):
+            return gaze_direction(frame, gray, eye)
+
+    def process(self, frame, features, last_selection_time=0, patient_name='', now=None):
+        """
+        Run the active features on a camera frame. Returns (annotated frame,
+        selected button or None); a button is only selected once
+        selection_buffer_time has passed since `last_selection_time`. `now`
+        overrides the clock, for replaying recorded video.
+        """
+        selected = None
+        current_time = time.time() if now is None else now
+        self.fingers = self.gaze = None
+        labels = []  # (text, position, scale, color), drawn in this order at the end
+
+        # Calculate FPS
+        self.frame_count += 1
+        if self.start_time is None:
+            self.start_time = current_time
+        elif self.frame_count % 30 == 0:
+            self.fps = 30 / max(current_time - self.start_time, 1e-6)
+            self.start_time = current_time
+
+        # Keep standard resolution
+        with self._stage('resize'):
+            frame = cv2.resize(frame, FRAME_SIZE)
+            frame = cv2.flip(frame, 1)
+
+        gray = None
+        if self.adaptive:
+            with self._stage('color'):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        detect = self.detected = self._should_detect(gray)
+        self.counters['frames'] += 1
+        if not detect:
+            self.counters['skipped'] += 1
+
+        if HAND_FEATURE not in features:
+            self.hand_box = None
+
+        # Process hand detection
+        if HAND_FEATURE in features and detect:
+            landmarks = self._detect_hands(frame)
+
+            if landmarks:
+                for hand_landmarks in landmarks:
+                    fingers_count = count_raised_fingers(hand_landmarks)
+                    self.gesture_buffer.append(fingers_count)
+                    self.fingers = fingers_count
+
+                    # Show current finger count
+                    labels.append((f'Fingers: {fingers_count}', (10, 50), 0.6, (255, 255, 0)))
+
+                gesture = stable_gesture(self.gesture_buffer)
+                if gesture and 1 <= gesture <= 5:
+                    # Show detected gesture
+                    labels.append((f'Gesture: {gesture}', (10, 80), 0.6, (0, 255, 255)))
+
+                    # Check if enough time has passed since last selection
+                    if (current_time - last_selection_time) >= self.selection_buffer_time:
+                        selected = gesture
+                        last_selection_time = current_time
+
+                        # Show selection confirmation
+                        labels.append((f'SELECTED: {button_text(gesture)}', (10, 110), 0.5, (0, 255, 0)))
+
+        # Process eye gaze detection
+        if GAZE_FEATURE in features and (detect or self.eye_box is not None):
+            gaze_direction = self._detect_gaze(frame, gray)
+            if gaze_direction:
+                self.gaze = gaze_direction
+                self.gaze_buffer.append(gaze_direction)
+                gaze = stable_gaze(self.gaze_buffer)
+
+                if gaze:
+                    labels.append((f'Gaze: {gaze}', (10, 30), 0.9, (255, 0, 0)))
+
+                    new_button = GAZE_BUTTONS.get(gaze)
+                    if new_button is not None:
+                        # Check if enough time has passed since last selection
+                        if (current_time - last_selection_time) >= self.selection_buffer_time:
+                            selected = new_button
+                            last_selection_time = current_time
+
+        # Add system info to frame
+        labels.append((f'FPS: {self.fps:.0f}', (10, 30), 0.6, (0, 255, 0)))
+
+        # Show buffer status
+        time_since_last = current_time - last_selection_time
+        if time_since_last < self.selection_buffer_time:
+            remaining = self.selection_buffer_time - time_since_last
+            labels.append((f'Buffer: {remaining:.1f}s', (10, 120), 0.6, (255, 0, 0)))
+
+        # Add patient info
+        if patient_name:
+            labels.append((f'Patient: {patient_name}', (10, frame.shape[0] - 30), 0.6, (255, 255, 255)))
+
+        with self._stage('overlay'):
+            for text, position, scale, color in labels:
+                cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
+        return frame, selected
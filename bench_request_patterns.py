@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Request Pattern Benchmark
+Compares the original per-row get_patient_request_patterns (full ORM objects,
+Python counters) with the column-only NumPy version on synthetic requests in a
+temporary SQLite database.
+
+Usage:
+    python bench_request_patterns.py                # 1,000,000 rows
+    python bench_request_patterns.py --rows 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import db, init_database, PatientRequest, get_patient_request_patterns
+
+PATIENT_ID = 'BENCH001'
+DAYS = 30
+
+
+def legacy_request_patterns(patient_id, days=7):
+    """The per-row implementation this benchmark compares against"""
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=days)
+
+    requests = PatientRequest.query.filter(
+        PatientRequest.patient_id == patient_id,
+        PatientRequest.timestamp >= start_date
+    ).all()
+
+    patterns = {
+        'total_requests': len(requests),
+        'request_types': {},
+        'hourly_patterns': {},
+        'method_preferences': {},
+        'response_times': []
+    }
+
+    for request in requests:
+        patterns['request_types'][request.request_type] = patterns['request_types'].get(request.request_type, 0) + 1
+        hour = request.timestamp.hour
+        patterns['hourly_patterns'][hour] = patterns['hourly_patterns'].get(hour, 0) + 1
+        method = request.request_method
+        patterns['method_preferences'][method] = patterns['method_preferences'].get(method, 0) + 1
+        if request.response_time:
+            patterns['response_times'].append((request.response_time - request.timestamp).total_seconds() / 60)
+
+    return patterns
+
+
+def seed(rows, chunk_size=50000):
+    """Insert `rows` synthetic requests for one patient over the last DAYS days"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    methods = ['gesture', 'voice', 'manual']
+    inserted = 0
+    while inserted < rows:
+        chunk = []
+        for _ in range(min(chunk_size, rows - inserted)):
+            timestamp = now - timedelta(seconds=rng.uniform(60, (DAYS - 1) * 86400))
+            answered = rng.random() < 0.7
+            chunk.append({
+                'patient_id': PATIENT_ID,
+                'request_type': rng.randint(1, 5),
+                'request_method': rng.choice(methods),
+                'timestamp': timestamp,
+                'response_time': timestamp + timedelta(minutes=rng.expovariate(1 / 4.0)) if answered else None,
+                'status': 'completed' if answered else 'pending'
+            })
+        db.session.execute(PatientRequest.__table__.insert(), chunk)
+        db.session.commit()
+        inserted += len(chunk)
+
+
+def timed(function, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = function(PATIENT_ID, DAYS)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark get_patient_request_patterns')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_file.name}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_database(app)
+
+    try:
+        with app.app_context():
+            started = time.perf_counter()
+            seed(args.rows)
+            print(f"Seeded {args.rows:,} requests in {time.perf_counter() - started:.1f}s")
+
+            legacy_seconds, legacy = timed(legacy_request_patterns, args.repeat)
+            new_seconds, new = timed(get_patient_request_patterns, args.repeat)
+
+            # Same answers (response times compared as sorted vectors)
+            for key in ('total_requests', 'request_types', 'hourly_patterns', 'method_preferences'):
+                assert legacy[key] == new[key], f"{key} differs"
+            assert np.allclose(np.sort(legacy['response_times']), np.sort(new['response_times']))
+
+            print(f"Per-row ORM loop:  {legacy_seconds:8.3f}s")
+            print(f"NumPy bincount:    {new_seconds:8.3f}s  ({legacy_seconds / new_seconds:.1f}x faster)")
+            print(f"Response times:    {new['response_time_stats']}")
+    finally:
+        os.unlink(db_file.name)
+
+
+if __name__ == "__main__":
+    main()
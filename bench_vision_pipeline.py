@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Vision Pipeline Benchmark
+Replays recorded video files, image sequences or synthetic frames (any
+frame_sources.open_source spec) through the bedside gesture and gaze pipeline
+without a camera, and reports:
+  - latency per stage (decode, resize, color convert, motion, MediaPipe,
+    Haar/pupil, overlay, JPEG encode) and end-to-end FPS
+  - gesture detection accuracy and latency against labeled ground truth
+
+Ground truth is a CSV next to the clip (clip.mp4 -> clip.csv) or given with
+--labels, one row per request the patient made:
+    start,end,button
+    2.0,4.5,2
+    9.1,12.0,5
+where start/end are seconds into the clip during which the gesture (or gaze) for
+`button` is held. A selection of that button between start and end + --grace
+is a hit, and its latency is measured from start.
+
+Results can be saved with --save and compared against a previous run with
+--baseline, which exits non-zero if FPS, a stage or accuracy regressed.
+
+Usage:
+    python bench_vision_pipeline.py clips/bed12_fingers.mp4 clips/bed14_gaze/
+    python bench_vision_pipeline.py clips/*.mp4 --mode both --save bench.json
+    python bench_vision_pipeline.py clips/*.mp4 --baseline bench.json --tolerance 0.2
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bed_vision import BedVision, StageTimer, HAND_FEATURE, GAZE_FEATURE
+from frame_sources import open_source
+
+FEATURES = {'hand': HAND_FEATURE, 'gaze': GAZE_FEATURE}
+STAGES = ['decode', 'resize', 'color', 'motion', 'mediapipe', 'haar', 'overlay', 'encode']
+
+# Stages faster than this (ms) are too noisy to flag as regressions
+MIN_REGRESSION_MS = 0.5
+
+
+def load_labels(path):
+    """[(start, end, button)] from a ground truth CSV"""
+    with open(path, newline='') as f:
+        return [(float(row['start']), float(row['end']), int(row['button'])) for row in csv.DictReader(f)]
+
+
+def labels_for(clip, labels_path=None):
+    if labels_path:
+        return load_labels(labels_path)
+    candidate = (clip.rstrip(os.sep) if os.path.isdir(clip) else os.path.splitext(clip)[0]) + '.csv'
+    return load_labels(candidate) if os.path.exists(candidate) else None
+
+
+def replay(path, features, adaptive):
+    """Run one clip through decode -> BedVision -> JPEG encode, timing every stage"""
+    timer = StageTimer()
+    vision = BedVision(adaptive=adaptive, timer=timer)
+    source = open_source(path)
+    frames, fps = iter(source), source.fps
+    last_selection_time = float('-inf')
+    selections = []
+
+    started = time.perf_counter()
+    index = 0
+    while True:
+        timer.start_frame()
+        with timer.stage('decode'):
+            frame = next(frames, None)
+        if frame is None:
+            timer.frames.pop()
+            break
+
+        now = index / fps
+        annotated, button = vision.process(frame, features, last_selection_time, now=now)
+        with timer.stage('encode'):
+            cv2.imencode('.jpg', annotated)
+
+        if button is not None:
+            selections.append((now, button))
+            last_selection_time = now
+        index += 1
+    elapsed = time.perf_counter() - started
+    source.release()
+    vision.close()
+
+    stages = {}
+    for stage in STAGES:
+        samples = np.array([frame_times.get(stage, 0.0) for frame_times in timer.frames]) * 1000
+        if samples.any():
+            stages[stage] = {
+                'mean': round(float(samples.mean()), 3),
+                'p50': round(float(np.percentile(samples, 50)), 3),
+                'p95': round(float(np.percentile(samples, 95)), 3)
+            }
+    return {
+        'frames': index,
+        'clip_fps': fps,
+        'fps': round(index / elapsed, 1) if elapsed else 0.0,
+        'stages': stages,
+        'counters': dict(vision.counters),
+        'selections': selections
+    }
+
+
+def score(selections, labels, grace):
+    """Hits, misses, false selections and detection latency against ground truth"""
+    hit = set()
+    latencies = []
+    false_selections = repeats = 0
+
+    for when, button in selections:
+        label = next((i for i, (start, end, _) in enumerate(labels) if start <= when <= end + grace), None)
+        if label is None or labels[label][2] != button:
+            false_selections += 1
+        elif label in hit:
+            repeats += 1  # Gesture held past the selection buffer
+        else:
+            hit.add(label)
+            latencies.append(when - labels[label][0])
+
+    detected = len(hit)
+    return {
+        'labels': len(labels),
+        'detected': detected,
+        'missed': len(labels) - detected,
+        'false': false_selections,
+        'repeats': repeats,
+        'recall': round(detected / len(labels), 3) if labels else None,
+        'precision': round(detected / (detected + false_selections), 3) if detected + false_selections else None,
+        'latency_mean': round(float(np.mean(latencies)), 3) if latencies else None,
+        'latency_max': round(float(np.max(latencies)), 3) if latencies else None
+    }
+
+
+def print_result(clip, mode, result):
+    print(f"{clip} [{mode}]: {result['frames']} frames, {result['fps']:.1f} FPS end to end "
+          f"({result['clip_fps']:.0f} FPS clip)")
+    print(f"  {'stage':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage, times in result['stages'].items():
+        print(f"  {stage:<10} {times['mean']:9.2f} {times['p50']:9.2f} {times['p95']:9.2f}")
+    accuracy = result.get('accuracy')
+    if accuracy:
+        latency = f"{accuracy['latency_mean']:.2f}s mean, {accuracy['latency_max']:.2f}s max" \
+            if accuracy['latency_mean'] is not None else 'n/a'
+        print(f"  Gestures   {accuracy['detected']}/{accuracy['labels']} detected, {accuracy['false']} false, "
+              f"{accuracy['repeats']} repeats; latency {latency}")
+    else:
+        print(f"  Selections {[(round(when, 2), button) for when, button in result['selections']]}")
+
+
+def regressions(results, baseline, tolerance):
+    """Human-readable list of everything worse than the baseline run"""
+    problems = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        if result['fps'] < before['fps'] * (1 - tolerance):
+            problems.append(f"{key}: {result['fps']} FPS, was {before['fps']}")
+        for stage, times in result['stages'].items():
+            previous = before['stages'].get(stage)
+            if previous and times['p50'] >= MIN_REGRESSION_MS and times['p50'] > previous['p50'] * (1 + tolerance):
+                problems.append(f"{key}: {stage} p50 {times['p50']} ms, was {previous['p50']} ms")
+        accuracy, previous = result.get('accuracy'), before.get('accuracy')
+        if accuracy and previous:
+            for metric in ('recall', 'precision'):
+                if (accuracy[metric] or 0) < (previous[metric] or 0):
+                    problems.append(f"{key}: {metric} {accuracy[metric]}, was {previous[metric]}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the gesture/gaze pipeline on recorded video')
+    parser.add_argument('clips', nargs='+', help='video files, image directories or synthetic[:WxH][@FPS]')
+    parser.add_argument('--features', default='hand,gaze', help='comma separated: hand, gaze')
+    parser.add_argument('--mode', choices=['full', 'adaptive', 'both'], default='adaptive',
+                        help='detection scheduling to benchmark')
+    parser.add_argument('--labels', help='ground truth CSV (single clip only)')
+    parser.add_argument('--grace', type=float, default=2.0, help='seconds after a label ends a selection still counts')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs the baseline')
+    args = parser.parse_args()
+
+    if args.labels and len(args.clips) > 1:
+        parser.error('--labels can only be used with a single clip')
+
+    features = {FEATURES[name.strip()] for name in args.features.split(',') if name.strip()}
+    modes = ['full', 'adaptive'] if args.mode == 'both' else [args.mode]
+    results = {}
+
+    for clip in args.clips:
+        labels = labels_for(clip, args.labels)
+        for mode in modes:
+            result = replay(clip, features, adaptive=mode == 'adaptive')
+            if labels is not None:
+                result['accuracy'] = score(result['selections'], labels, args.grace)
+            results[f'{clip} [{mode}]'] = result
+            print_result(clip, mode, result)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = regressions(results, json.load(f), args.tolerance)
+        if problems:
+            print("Regressions against baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
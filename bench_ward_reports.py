@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Ward Report Benchmark
+Measures report throughput for a synthetic ward in a temporary SQLite
+database: one /print/patient style report at a time versus the batch ward
+report, rendered in-process and across a process pool.
+
+Usage:
+    python bench_ward_reports.py                   # 500 patients, 60 requests each
+    python bench_ward_reports.py --patients 100 --requests 200 --workers 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import db, init_database, Patient, PatientRequest
+from patient_reports import get_patient_report, report_cache
+from ward_reports import generate_ward_report
+
+DEPARTMENT = 'icu'
+
+
+def seed(patients, requests_per_patient):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    db.session.execute(Patient.__table__.insert(), [{
+        'patient_id': f'W{i:04d}',
+        'full_name': f'Ward Patient {i}',
+        'date_of_birth': date(1950 + i % 50, 1 + i % 12, 1 + i % 28),
+        'primary_condition': 'Post-operative observation',
+        'room_number': str(100 + i // 2),
+        'bed_number': 'AB'[i % 2],
+        'department': DEPARTMENT,
+        'care_level': 'intensive',
+        'admission_date': date.today() - timedelta(days=rng.randint(1, 20)),
+        'communication_methods': '["gesture", "voice"]',
+        'is_active': True
+    } for i in range(patients)])
+
+    rows = []
+    for i in range(patients):
+        for _ in range(requests_per_patient):
+            timestamp = now - timedelta(seconds=rng.uniform(60, 29 * 86400))
+            answered = rng.random() < 0.8
+            rows.append({
+                'patient_id': f'W{i:04d}',
+                'request_type': rng.randint(1, 5),
+                'request_method': rng.choice(['gesture', 'voice']),
+                'timestamp': timestamp,
+                'response_time': timestamp + timedelta(minutes=rng.expovariate(1 / 5.0)) if answered else None,
+                'status': 'completed' if answered else 'pending'
+            })
+    db.session.execute(PatientRequest.__table__.insert(), rows)
+    db.session.commit()
+
+
+def one_at_a_time(patient_ids):
+    for patient_id in patient_ids:
+        report_cache.clear()
+        get_patient_report(patient_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch ward report generation')
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=60, help='requests per patient')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_file.name}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_database(app)
+
+    try:
+        with app.app_context():
+            seed(args.patients, args.requests)
+            patient_ids = [p.patient_id for p in Patient.query.order_by(Patient.patient_id)]
+            print(f"Seeded {args.patients} patients x {args.requests} requests")
+
+            runs = [
+                ('One report at a time', lambda: one_at_a_time(patient_ids)),
+                ('Batch, in-process', lambda: generate_ward_report(DEPARTMENT, workers=1)),
+                (f'Batch, {args.workers} processes', lambda: generate_ward_report(DEPARTMENT, workers=args.workers)),
+                (f'Batch zip, {args.workers} processes', lambda: generate_ward_report(DEPARTMENT, 'zip', workers=args.workers)),
+            ]
+            for label, run in runs:
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                print(f"{label:<28} {elapsed:7.2f}s  {args.patients / elapsed:8.1f} reports/s")
+    finally:
+        os.unlink(db_file.name)
+
+
+if __name__ == "__main__":
+    main()
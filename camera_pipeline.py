@@ -0,0 +1,257 @@
+"""
+Camera capture pipeline
+The camera is read on its own thread into a single-slot buffer that only ever
+holds the newest frame. Inference runs on a second thread and takes whatever
+is newest each time it finishes a frame, so frames that arrive while it is busy
+are dropped instead of queueing up behind it. Gesture latency stays at one
+capture plus one inference however slow inference gets.
+
+MjpegBroadcaster serves the processed frames to any number of video feed
+viewers: each frame is JPEG-encoded once and the same bytes go to every
+viewer. A slow viewer skips to the newest frame and never holds up the
+others.
+"""
+import threading
+import time
+
+# Pause before retrying after a failed camera read
+READ_RETRY_DELAY = 0.05
+
+# How long the worker threads wait on an empty buffer before re-checking for stop
+POLL_TIMEOUT = 0.5
+
+# Smoothing factor for the timing averages in stats()
+EMA_ALPHA = 0.1
+
+
+class LatestFrame:
+    """Single-slot frame buffer: put() replaces the frame, get() waits for a newer one"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._timestamp = None
+        self._seq = 0
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def put(self, frame, timestamp=None):
+        with self._condition:
+            self._frame = frame
+            self._timestamp = time.time() if timestamp is None else timestamp
+            self._seq += 1
+            self._condition.notify_all()
+
+    def get(self, after=0, timeout=None):
+        """
+        Wait up to `timeout` seconds for a frame newer than sequence number `after`.
+        Returns (seq, frame, timestamp) for the newest frame, or None on timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._seq > after, timeout):
+                return None
+            return self._seq, self._frame, self._timestamp
+
+
+class CameraPipeline:
+    """
+    Capture thread -> LatestFrame -> inference thread -> LatestFrame (output).
+    `open_camera` returns an opened cv2.VideoCapture (or anything with read(),
+    isOpened() and release()); `process` turns a camera frame into the frame to
+    display. Readers wait on `output` for processed frames.
+    """
+
+    def __init__(self, open_camera, process):
+        self.open_camera = open_camera
+        self.process = process
+        self.frames = LatestFrame()
+        self.output = LatestFrame()
+        self._cap = None
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+        self.read_failures = 0
+        self.inference_ms = 0.0
+        self.latency_ms = 0.0
+
+    def is_running(self):
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self):
+        """Open the camera and start both threads; returns False if the camera can't be opened"""
+        with self._lock:
+            if self.is_running():
+                return True
+
+            cap = self.open_camera()
+            if cap is None or not cap.isOpened():
+                if cap is not None:
+                    cap.release()
+                return False
+
+            self._cap = cap
+            self._stop.clear()
+            self._reset_stats()
+            self._threads = [
+                threading.Thread(target=self._capture_loop, name='camera-capture', daemon=True),
+                threading.Thread(target=self._inference_loop, name='camera-inference', daemon=True)
+            ]
+            for thread in self._threads:
+                thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join(timeout=2.0)
+            self._threads = []
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+
+    def _capture_loop(self):
+        cap = self._cap
+        while not self._stop.is_set():
+            # read() blocks until the camera delivers, which paces this loop
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                self.read_failures += 1
+                time.sleep(READ_RETRY_DELAY)
+                continue
+            self.captured += 1
+            self.frames.put(frame)
+
+    def _inference_loop(self):
+        seq = self.frames.seq
+        while not self._stop.is_set():
+            item = self.frames.get(after=seq, timeout=POLL_TIMEOUT)
+            if item is None:
+                continue
+
+            latest_seq, frame, captured_at = item
+            self.dropped += latest_seq - seq - 1
+            seq = latest_seq
+
+            started = time.time()
+            try:
+                processed = self.process(frame)
+            except Exception as e:
+                print(f"❌ Frame processing error: {e}")
+                continue
+            finished = time.time()
+
+            self.processed += 1
+            self.inference_ms += EMA_ALPHA * ((finished - started) * 1000 - self.inference_ms)
+            self.latency_ms += EMA_ALPHA * ((finished - captured_at) * 1000 - self.latency_ms)
+            if processed is not None:
+                self.output.put(processed, captured_at)
+
+    def stats(self):
+        return {
+            'running': self.is_running(),
+            'frames_captured': self.captured,
+            'frames_processed': self.processed,
+            'frames_dropped': self.dropped,
+            'read_failures': self.read_failures,
+            'inference_ms': round(self.inference_ms, 1),
+            'latency_ms': round(self.latency_ms, 1)
+        }
+
+
+def mjpeg_part(jpeg):
+    """One part of a multipart/x-mixed-replace; boundary=frame stream"""
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
+
+class MjpegBroadcaster:
+    """
+    Single producer, many viewers. While anyone is watching, one thread encodes
+    each new frame from `frames` with `encode` (frame -> JPEG bytes or None) and
+    publishes the multipart chunk. `idle_jpeg` (-> JPEG bytes) is shown when no
+    frame arrives within `wait_timeout` seconds. close() ends every viewer's
+    stream and stops reading `frames`.
+    """
+
+    def __init__(self, frames, encode, idle_jpeg, wait_timeout=POLL_TIMEOUT):
+        self.frames = frames
+        self.encode = encode
+        self.idle_jpeg = idle_jpeg
+        self.wait_timeout = wait_timeout
+        self.parts = LatestFrame()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.viewers = 0
+        self.encoded = 0
+        self.skipped = 0
+        self._closed = False
+
+    def _subscribe(self):
+        with self._lock:
+            self.viewers += 1
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._produce, name='mjpeg-broadcast', daemon=True)
+                self._thread.start()
+
+    def _unsubscribe(self):
+        with self._lock:
+            self.viewers -= 1
+
+    def _produce(self):
+        seq = self.frames.seq
+        while True:
+            with self._lock:
+                if not self.viewers or self._closed:
+                    self._thread = None
+                    return
+
+            item = self.frames.get(after=seq, timeout=self.wait_timeout)
+            if item is None:
+                continue
+            seq, frame, timestamp = item
+
+            jpeg = self.encode(frame)
+            if jpeg:
+                self.encoded += 1
+                self.parts.put(mjpeg_part(jpeg), timestamp)
+
+    def stream(self):
+        """Generator of multipart chunks for one viewer (a Flask Response body)"""
+        self._subscribe()
+        try:
+            seq = self.parts.seq
+            while not self._closed:
+                item = self.parts.get(after=seq, timeout=self.wait_timeout)
+                if item is None:
+                    yield mjpeg_part(self.idle_jpeg())
+                    continue
+                latest_seq, part, _ = item
+                # Frames published while this viewer was still sending the last one
+                self.skipped += latest_seq - seq - 1
+                seq = latest_seq
+                yield part
+        finally:
+            self._unsubscribe()
+
+    def close(self):
+        """End all streams and wait for the producer to stop reading `frames` (before it goes away)"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            thread.join(self.wait_timeout + 1.0)
+
+    def stats(self):
+        return {
+            'viewers': self.viewers,
+            'frames_encoded': self.encoded,
+            'frames_skipped': self.skipped
+        }
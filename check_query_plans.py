@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Query Plan Check
+Runs EXPLAIN QUERY PLAN for the hot patient_requests / monitoring_sessions /
+patients queries against a fresh SQLite database and fails if any of them
+falls back to a full table scan. Run after changing models or queries.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import db, init_database, Patient, PatientRequest, MonitoringSession, SystemAnalytics, HourlyRequestRollup, ResponseTimeSketch
+
+
+def hot_queries():
+    """(description, query) pairs for the filters used by dashboards, analytics and reports"""
+    now = datetime.utcnow()
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_ago = now - timedelta(days=30)
+
+    return [
+        ('Patient history (reports, patient analytics)',
+         PatientRequest.query.filter(
+             PatientRequest.patient_id == 'P001',
+             PatientRequest.timestamp >= month_ago
+         ).order_by(PatientRequest.timestamp.desc())),
+        ('Requests in a time window (dashboard, trends, export)',
+         db.session.query(func.count(PatientRequest.id)).filter(
+             PatientRequest.timestamp >= day_start,
+             PatientRequest.timestamp < day_start + timedelta(days=1)
+         )),
+        ('Pending requests in a time window',
+         PatientRequest.query.filter(
+             PatientRequest.status == 'pending',
+             PatientRequest.timestamp >= day_start
+         )),
+        ('Latest activity per patient (ICU dashboard)',
+         db.session.query(
+             PatientRequest.patient_id,
+             func.max(PatientRequest.timestamp)
+         ).group_by(PatientRequest.patient_id)),
+        ('Active monitoring sessions',
+         db.session.query(func.count(MonitoringSession.id)).filter(MonitoringSession.session_end.is_(None))),
+        ('Patient monitoring sessions',
+         MonitoringSession.query.filter(
+             MonitoringSession.patient_id == 'P001',
+             MonitoringSession.session_start >= month_ago
+         )),
+        ('Active patients in a department',
+         Patient.query.filter(Patient.is_active == True, Patient.department == 'icu')),
+        ('Daily rollups (dashboard, trends)',
+         SystemAnalytics.query.filter(SystemAnalytics.date >= month_ago.date())),
+        ('Hourly rollups',
+         HourlyRequestRollup.query.filter(HourlyRequestRollup.bucket_start >= day_start)),
+        ('Response time sketches for a patient',
+         ResponseTimeSketch.query.filter(
+             ResponseTimeSketch.scope == 'patient',
+             ResponseTimeSketch.scope_key == 'P001',
+             ResponseTimeSketch.date >= month_ago.date()
+         )),
+    ]
+
+
+def explain(query):
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {statement}')).fetchall()
+    return [row[-1] for row in rows]
+
+
+def is_full_scan(plan_line):
+    """SQLite reports a table scan without an index as 'SCAN <table>' with no USING clause"""
+    return plan_line.startswith('SCAN ') and 'USING' not in plan_line
+
+
+def main():
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_file.name}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_database(app)
+
+    failures = 0
+    try:
+        with app.app_context():
+            for description, query in hot_queries():
+                plan = explain(query)
+                ok = not any(is_full_scan(line) for line in plan)
+                failures += 0 if ok else 1
+                print(f"[{'OK' if ok else 'FULL SCAN'}] {description}")
+                for line in plan:
+                    print(f"    {line}")
+    finally:
+        os.unlink(db_file.name)
+
+    print()
+    if failures:
+        print(f"[ERROR] {failures} quer{'y' if failures == 1 else 'ies'} scan a whole table")
+        sys.exit(1)
+    print("[OK] All hot queries use an index")
+
+
+if __name__ == "__main__":
+    main()
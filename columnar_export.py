@@ -0,0 +1,317 @@
+"""
+Columnar export of patient_requests for offline analytics
+Writes compressed Parquet (or Arrow IPC) files partitioned Hive-style by
+hospital-local date and patient department:
+
+    <export dir>/date=2026-10-17/department=ICU/part-000123-0.parquet
+
+Partitions are rewritten whole, never appended to. Each run rebuilds every
+date from the oldest request newer than the watermark (the highest request id
+already exported, kept in <export dir>/_watermark.json) - and at least the last
+REFRESH_DAYS days, so requests acknowledged or completed since they were
+exported get their new status - in a staging directory, then swaps those date
+directories in. A lock file keeps two exports (API and cron) from running in
+the same directory at once. Requires the optional pyarrow package.
+"""
+import json
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from sqlalchemy import func, or_
+
+from database import db, Patient, PatientRequest
+from time_windows import day_window, local_today, to_local
+
+# Where exports are written unless a directory is given
+COLUMNAR_EXPORT_DIR = os.environ.get('COLUMNAR_EXPORT_DIR', 'exports')
+
+WATERMARK_FILE = '_watermark.json'
+LOCK_FILE = '_export.lock'
+STAGING_PREFIX = '_staging-'
+
+# Incremental runs always rebuild this many recent local days (status/response changes)
+REFRESH_DAYS = int(os.environ.get('COLUMNAR_REFRESH_DAYS', 3))
+
+# Rows fetched per database round trip / written per row group
+BATCH_SIZE = 5000
+
+FILE_EXTENSIONS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow'
+}
+
+
+def columnar_export_available():
+    """Whether pyarrow is installed (exports raise RuntimeError without it)"""
+    return pa is not None
+
+
+def get_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('us')),
+        ('patient_id', pa.string()),
+        ('patient_name', pa.string()),
+        ('department', pa.string()),
+        ('room_number', pa.string()),
+        ('bed_number', pa.string()),
+        ('request_type', pa.int8()),
+        ('request_method', pa.string()),
+        ('request_message', pa.string()),
+        ('status', pa.string()),
+        ('urgency_level', pa.string()),
+        ('response_time', pa.timestamp('us')),
+        ('response_time_minutes', pa.float64()),
+        ('responded_by', pa.string())
+    ])
+
+
+def read_watermark(output_dir):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_watermark(output_dir, watermark):
+    """Replace the watermark file atomically so a crash never leaves it half written"""
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def export_lock(output_dir):
+    """Exclusive lock on an export directory; RuntimeError if another export holds it"""
+    lock_file = open(os.path.join(output_dir, LOCK_FILE), 'a+')
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise RuntimeError(f"Another columnar export is already running in {output_dir}")
+        yield
+    finally:
+        lock_file.close()  # Releases the lock
+
+
+def partition_value(value):
+    """Safe directory name for a partition value"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', value.strip()) if value and value.strip() else 'unknown'
+
+
+def rebuild_start(since_id, refresh_days=REFRESH_DAYS):
+    """First local day to rebuild: the oldest day with a request newer than since_id, or the refresh window"""
+    day = local_today() - timedelta(days=max(refresh_days, 1) - 1)
+    oldest_new = db.session.query(func.min(PatientRequest.timestamp)).filter(PatientRequest.id > since_id).scalar()
+    if oldest_new is not None:
+        day = min(day, to_local(oldest_new).date())
+    return day
+
+
+def export_query(first_day=None):
+    """Requests on or after local day first_day (all when None), in date order"""
+    query = db.session.query(
+        PatientRequest.id,
+        PatientRequest.timestamp,
+        PatientRequest.patient_id,
+        Patient.full_name,
+        Patient.department,
+        PatientRequest.room_number,
+        PatientRequest.bed_number,
+        PatientRequest.request_type,
+        PatientRequest.request_method,
+        PatientRequest.request_message,
+        PatientRequest.status,
+        PatientRequest.urgency_level,
+        PatientRequest.response_time,
+        PatientRequest.responded_by
+    ).outerjoin(
+        Patient, Patient.patient_id == PatientRequest.patient_id
+    )
+    if first_day is not None:
+        start, _ = day_window(first_day)
+        query = query.filter(or_(PatientRequest.timestamp >= start, PatientRequest.timestamp.is_(None)))
+    return query.order_by(PatientRequest.timestamp, PatientRequest.id)
+
+
+def swap_in(output_dir, staging_dir, first_day=None):
+    """Replace the date partitions from first_day on (all of them when None) with the staged ones"""
+    retired_dir = staging_dir + '-old'
+    os.makedirs(retired_dir)
+    for name in os.listdir(output_dir):
+        # 'date=unknown' (no timestamp) sorts after every date and is always rebuilt
+        if name.startswith('date=') and (first_day is None or name[len('date='):] >= first_day.isoformat()):
+            os.replace(os.path.join(output_dir, name), os.path.join(retired_dir, name))
+    for name in os.listdir(staging_dir):
+        os.replace(os.path.join(staging_dir, name), os.path.join(output_dir, name))
+    shutil.rmtree(retired_dir)
+    shutil.rmtree(staging_dir)
+
+
+class PartitionWriters:
+    """One open file writer per (date, department) partition"""
+
+    def __init__(self, output_dir, file_format, compression, run_id):
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.compression = compression
+        self.run_id = run_id
+        self.schema = get_schema()
+        self.files = []
+        self._writers = {}
+        self._sequence = {}
+
+    def _open(self, partition):
+        day, department = partition
+        directory = os.path.join(self.output_dir, f'date={day}', f'department={department}')
+        os.makedirs(directory, exist_ok=True)
+        sequence = self._sequence.get(partition, 0)
+        self._sequence[partition] = sequence + 1
+        path = os.path.join(directory, f'part-{self.run_id:06d}-{sequence}.{FILE_EXTENSIONS[self.file_format]}')
+
+        if self.file_format == 'parquet':
+            writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            writer = pa.ipc.new_file(path, self.schema, options=options)
+        self.files.append(os.path.relpath(path, self.output_dir))
+        return writer
+
+    def write(self, partition, rows):
+        writer = self._writers.get(partition)
+        if writer is None:
+            writer = self._writers[partition] = self._open(partition)
+        columns = {name: [row[name] for row in rows] for name in self.schema.names}
+        writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close_before(self, day):
+        """Close partitions for dates before `day` (requests arrive roughly in date order)"""
+        for partition in [p for p in self._writers if p[0] < day]:
+            self._writers.pop(partition).close()
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def export_requests(output_dir=None, file_format='parquet', full=False, since_id=None,
+                    compression='zstd', batch_size=BATCH_SIZE):
+    """
+    Rebuild the partitions for every day with requests newer than the
+    watermark (or than since_id when given) plus the last REFRESH_DAYS days -
+    every partition when full=True - and advance the watermark. Returns a summary.
+    """
+    if pa is None:
+        raise RuntimeError("The pyarrow package is required for Parquet/Arrow exports")
+    if file_format not in FILE_EXTENSIONS:
+        raise ValueError(f"Unknown export format: {file_format}")
+
+    output_dir = output_dir or COLUMNAR_EXPORT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    with export_lock(output_dir):
+        # Staging left behind by a crashed run
+        for name in os.listdir(output_dir):
+            if name.startswith(STAGING_PREFIX):
+                shutil.rmtree(os.path.join(output_dir, name))
+
+        watermark = {} if full else read_watermark(output_dir)
+        if since_id is None:
+            since_id = watermark.get('last_request_id', 0)
+        first_day = None if full else rebuild_start(since_id)
+        staging_dir = os.path.join(output_dir, f'{STAGING_PREFIX}{datetime.utcnow():%Y%m%d%H%M%S%f}')
+        os.makedirs(staging_dir)
+
+        last_id = since_id
+        last_timestamp = None
+        exported = new_requests = 0
+        writers = PartitionWriters(staging_dir, file_format, compression, since_id)
+        batch = {}
+
+        def flush():
+            if not batch:
+                return
+            for partition, rows in batch.items():
+                writers.write(partition, rows)
+            writers.close_before(min(day for day, _ in batch))
+            batch.clear()
+
+        try:
+            for row in export_query(first_day).yield_per(batch_size):
+                day = to_local(row.timestamp).date().isoformat() if row.timestamp else 'unknown'
+                partition = (day, partition_value(row.department))
+                batch.setdefault(partition, []).append({
+                    'id': row.id,
+                    'timestamp': row.timestamp,
+                    'patient_id': row.patient_id,
+                    'patient_name': row.full_name,
+                    'department': row.department,
+                    'room_number': row.room_number,
+                    'bed_number': row.bed_number,
+                    'request_type': row.request_type,
+                    'request_method': row.request_method,
+                    'request_message': row.request_message,
+                    'status': row.status,
+                    'urgency_level': row.urgency_level,
+                    'response_time': row.response_time,
+                    'response_time_minutes': ((row.response_time - row.timestamp).total_seconds() / 60) if row.response_time and row.timestamp else None,
+                    'responded_by': row.responded_by
+                })
+                exported += 1
+                if row.id > since_id:
+                    new_requests += 1
+                if row.id > last_id:
+                    last_id, last_timestamp = row.id, row.timestamp
+                if exported % batch_size == 0:
+                    flush()
+            flush()
+        except BaseException:
+            writers.close()
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        writers.close()
+
+        swap_in(output_dir, staging_dir, first_day)
+        write_watermark(output_dir, {
+            'last_request_id': last_id,
+            'last_timestamp': last_timestamp.isoformat() if last_timestamp else watermark.get('last_timestamp'),
+            'rebuilt_from': first_day.isoformat() if first_day else None,
+            'exported_at': datetime.utcnow().isoformat(),
+            'format': file_format,
+            'rows': exported,
+            'files': writers.files
+        })
+
+    return {
+        'output_dir': output_dir,
+        'format': file_format,
+        'since_request_id': since_id,
+        'rebuilt_from': first_day.isoformat() if first_day else None,
+        'last_request_id': last_id,
+        'new_requests': new_requests,
+        'rows': exported,
+        'files': writers.files
+    }
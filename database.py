@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import json
+import numpy as np
 
 db = SQLAlchemy()
 
@@ -72,6 +73,10 @@ class Staff(db.Model):
 # Patient Registration Table
 class Patient(db.Model):
     __tablename__ = 'patients'
+    __table_args__ = (
+        # Active patients, optionally per department (dashboards, ward reports)
+        db.Index('ix_patients_is_active_department', 'is_active', 'department'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -148,6 +153,14 @@ class Patient(db.Model):
 # Patient Requests/Interactions Table
 class PatientRequest(db.Model):
     __tablename__ = 'patient_requests'
+    __table_args__ = (
+        # Latest activity per patient (ICU dashboard) and per-patient history
+        db.Index('ix_patient_requests_patient_id_timestamp', 'patient_id', 'timestamp'),
+        # Time-window analytics, trends and exports
+        db.Index('ix_patient_requests_timestamp', 'timestamp'),
+        # Pending/acknowledged queues within a time window
+        db.Index('ix_patient_requests_status_timestamp', 'status', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.String(50), nullable=False)
@@ -189,6 +202,11 @@ class PatientRequest(db.Model):
 # Monitoring Sessions Table
 class MonitoringSession(db.Model):
     __tablename__ = 'monitoring_sessions'
+    __table_args__ = (
+        db.Index('ix_monitoring_sessions_patient_id_session_start', 'patient_id', 'session_start'),
+        # Active sessions are the ones with no end time
+        db.Index('ix_monitoring_sessions_session_end', 'session_end'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.String(50), nullable=False)
@@ -264,10 +282,14 @@ class Caregiver(db.Model):
 
 # System Analytics Table
 class SystemAnalytics(db.Model):
+    """Daily rollup (one row per hospital-local day), maintained by rollups.py"""
     __tablename__ = 'system_analytics'
+    __table_args__ = (
+        db.Index('ux_system_analytics_date', 'date', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, default=datetime.utcnow().date())
+    date = db.Column(db.Date, default=lambda: datetime.utcnow().date())
     
     # Daily Statistics
     total_patients = db.Column(db.Integer, default=0)
@@ -285,6 +307,8 @@ class SystemAnalytics(db.Model):
     avg_response_time = db.Column(db.Float, default=0.0)  # in minutes
     requests_completed = db.Column(db.Integer, default=0)
     requests_pending = db.Column(db.Integer, default=0)
+    response_count = db.Column(db.Integer, default=0)  # requests with a response_time
+    response_time_total = db.Column(db.Float, default=0.0)  # in minutes
     
     # System Usage
     gesture_recognition_usage = db.Column(db.Integer, default=0)
@@ -312,6 +336,103 @@ class SystemAnalytics(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+# Hourly Request Rollups (UTC hour buckets, maintained by rollups.py)
+class HourlyRequestRollup(db.Model):
+    __tablename__ = 'hourly_request_rollups'
+    __table_args__ = (
+        db.Index('ux_hourly_request_rollups_bucket_start', 'bucket_start', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False)  # start of the UTC hour
+    
+    total_requests = db.Column(db.Integer, default=0)
+    emergency_requests = db.Column(db.Integer, default=0)
+    nurse_requests = db.Column(db.Integer, default=0)
+    water_requests = db.Column(db.Integer, default=0)
+    food_requests = db.Column(db.Integer, default=0)
+    bathroom_requests = db.Column(db.Integer, default=0)
+    
+    avg_response_time = db.Column(db.Float, default=0.0)  # in minutes
+    requests_completed = db.Column(db.Integer, default=0)
+    requests_pending = db.Column(db.Integer, default=0)
+    response_count = db.Column(db.Integer, default=0)
+    response_time_total = db.Column(db.Float, default=0.0)  # in minutes
+    
+    gesture_recognition_usage = db.Column(db.Integer, default=0)
+    voice_recognition_usage = db.Column(db.Integer, default=0)
+    
+    def to_dict(self):
+        return {
+            'bucket_start': self.bucket_start.isoformat(),
+            'total_requests': self.total_requests,
+            'emergency_requests': self.emergency_requests,
+            'nurse_requests': self.nurse_requests,
+            'water_requests': self.water_requests,
+            'food_requests': self.food_requests,
+            'bathroom_requests': self.bathroom_requests,
+            'avg_response_time': self.avg_response_time,
+            'requests_completed': self.requests_completed,
+            'requests_pending': self.requests_pending,
+            'gesture_recognition_usage': self.gesture_recognition_usage,
+            'voice_recognition_usage': self.voice_recognition_usage
+        }
+
+# Response Time Sketches (mergeable quantile sketches, maintained by response_sketches.py)
+class ResponseTimeSketch(db.Model):
+    __tablename__ = 'response_time_sketches'
+    __table_args__ = (
+        db.Index('ux_response_time_sketches_scope_key_date', 'scope', 'scope_key', 'date', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)  # all, patient, department, shift
+    scope_key = db.Column(db.String(100), nullable=False)
+    date = db.Column(db.Date, nullable=False)  # hospital-local day the requests were made
+    
+    count = db.Column(db.Integer, default=0)
+    total = db.Column(db.Float, default=0.0)  # sum of response times, in minutes
+    sketch = db.Column(db.Text, nullable=False)  # JSON (DDSketch bins)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'scope': self.scope,
+            'scope_key': self.scope_key,
+            'date': self.date.isoformat(),
+            'count': self.count,
+            'avg_response_time': round(self.total / self.count, 2) if self.count else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+# Enrolled patient faces (mean of the equalized face crops, see face_templates.py)
+class PatientFaceTemplate(db.Model):
+    __tablename__ = 'patient_face_templates'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.String(50), unique=True, nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    template = db.Column(db.LargeBinary, nullable=False)  # float32 pixels, row major
+    sample_count = db.Column(db.Integer, default=0)  # face crops averaged into the template
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_array(self):
+        return np.frombuffer(self.template, dtype=np.float32).reshape(self.height, self.width)
+    
+    def to_dict(self):
+        return {
+            'patient_id': self.patient_id,
+            'width': self.width,
+            'height': self.height,
+            'sample_count': self.sample_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 def init_database(app):
     """Initialize database with app context"""
     db.init_app(app)
@@ -320,6 +441,10 @@ def init_database(app):
         # Create all tables
         db.create_all()
         
+        # Bring existing databases up to date (create_all never alters existing tables)
+        from migrations import run_migrations
+        run_migrations(db.engine)
+        
         # Create default admin user if not exists
         admin_staff = Staff.query.filter_by(staff_id='ADMIN001').first()
         if not admin_staff:
@@ -339,48 +464,69 @@ def init_database(app):
         
         print("[INFO] Database initialized successfully")
 
-def get_patient_request_patterns(patient_id, days=7):
-    """Analyze patient request patterns for insights"""
+def response_time_stats(minutes):
+    """count/mean/p50/p90/p99 (minutes) for an array of response times"""
+    minutes = np.asarray(minutes, dtype=float)
+    if not minutes.size:
+        return {'count': 0, 'mean': None, 'p50': None, 'p90': None, 'p99': None}
+    p50, p90, p99 = np.percentile(minutes, [50, 90, 99])
+    return {
+        'count': int(minutes.size),
+        'mean': round(float(minutes.mean()), 2),
+        'p50': round(float(p50), 2),
+        'p90': round(float(p90), 2),
+        'p99': round(float(p99), 2)
+    }
+
+def get_patient_request_patterns(patient_id, days=7, since=None):
+    """Analyze patient request patterns for insights (over the last `days` days, or from `since`)"""
     from datetime import timedelta
     
     end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-    
-    requests = PatientRequest.query.filter(
+    start_date = since or end_date - timedelta(days=days)
+    
+    # Column-only rows; timestamps are read as text and parsed by NumPy in one
+    # pass instead of building a datetime object per row
+    rows = db.session.query(
+        PatientRequest.request_type,
+        PatientRequest.request_method,
+        db.cast(PatientRequest.timestamp, db.String),
+        db.cast(PatientRequest.response_time, db.String)
+    ).filter(
         PatientRequest.patient_id == patient_id,
         PatientRequest.timestamp >= start_date
     ).all()
     
-    patterns = {
-        'total_requests': len(requests),
-        'request_types': {},
-        'hourly_patterns': {},
-        'method_preferences': {},
-        'response_times': []
-    }
+    return summarize_requests(*zip(*rows)) if rows else summarize_requests([], [], [], [])
+
+def summarize_requests(request_types, methods, timestamps, responded):
+    """Request patterns from parallel columns (timestamps as datetimes or ISO strings)"""
+    if not len(request_types):
+        return {
+            'total_requests': 0,
+            'request_types': {},
+            'hourly_patterns': {},
+            'method_preferences': {},
+            'response_times': [],
+            'response_time_stats': response_time_stats([])
+        }
     
-    for request in requests:
-        # Request type analysis
-        req_type = request.request_type
-        if req_type not in patterns['request_types']:
-            patterns['request_types'][req_type] = 0
-        patterns['request_types'][req_type] += 1
-        
-        # Hourly pattern analysis
-        hour = request.timestamp.hour
-        if hour not in patterns['hourly_patterns']:
-            patterns['hourly_patterns'][hour] = 0
-        patterns['hourly_patterns'][hour] += 1
-        
-        # Method preference analysis
-        method = request.request_method
-        if method not in patterns['method_preferences']:
-            patterns['method_preferences'][method] = 0
-        patterns['method_preferences'][method] += 1
-        
-        # Response time analysis
-        if request.response_time:
-            response_time = (request.response_time - request.timestamp).total_seconds() / 60
-            patterns['response_times'].append(response_time)
+    timestamps = np.array(timestamps, dtype='datetime64[us]')
+    responded = np.array(responded, dtype='datetime64[us]')
+    
+    type_counts = np.bincount(np.array(request_types, dtype=np.int64))
+    hours = (timestamps.astype('datetime64[h]') - timestamps.astype('datetime64[D]')).astype(np.int64)
+    hour_counts = np.bincount(hours, minlength=24)
+    method_values, method_counts = np.unique(np.array(methods, dtype=str), return_counts=True)
     
-    return patterns
\ No newline at end of file
+    answered = ~np.isnat(responded)
+    response_times = (responded[answered] - timestamps[answered]) / np.timedelta64(1, 'm')
+    
+    return {
+        'total_requests': len(request_types),
+        'request_types': {int(t): int(c) for t, c in enumerate(type_counts) if c},
+        'hourly_patterns': {int(h): int(c) for h, c in enumerate(hour_counts) if c},
+        'method_preferences': {str(m): int(c) for m, c in zip(method_values, method_counts)},
+        'response_times': response_times.tolist(),
+        'response_time_stats': response_time_stats(response_times)
+    }
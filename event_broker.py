@@ -0,0 +1,225 @@
+"""
+Real-time event broker for ICU dashboards
+Every subscriber (open dashboard) gets its own buffer, so every patient
+request reaches every dashboard. The in-memory broker serves one process;
+set EVENT_BROKER_URL=redis://... to share events across gunicorn workers.
+
+Event ids only grow while the id counter lives (the process for the in-memory
+broker, the Redis key otherwise). A client resuming from an id the broker
+hasn't issued yet is left over from before a restart, so it is treated as a
+reset and replayed from the start of the history instead of waiting for the
+new ids to catch up with its old one.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Events kept for replay (Last-Event-ID reconnects and long-poll clients)
+HISTORY_SIZE = 500
+
+# Events buffered per subscriber before the oldest are dropped
+SUBSCRIBER_BUFFER_SIZE = 100
+
+
+class Subscriber:
+    """A single dashboard's event buffer"""
+
+    def __init__(self, buffer_size=SUBSCRIBER_BUFFER_SIZE):
+        self._events = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def push(self, event):
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Wait up to `timeout` seconds and return all buffered events (may be empty)"""
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+
+class InMemoryBroker:
+    """Process-local broker with replay history"""
+
+    def __init__(self, history_size=HISTORY_SIZE, subscriber_buffer_size=SUBSCRIBER_BUFFER_SIZE,
+                 detect_resets=True):
+        self.subscriber_buffer_size = subscriber_buffer_size
+        self.detect_resets = detect_resets
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._condition = threading.Condition()
+        self._next_id = 1
+
+    def publish(self, event_type, data):
+        """Publish an event to every subscriber; returns the event"""
+        with self._condition:
+            event = {
+                'id': self._next_id,
+                'type': event_type,
+                'data': data,
+                'timestamp': time.time()
+            }
+            self._next_id += 1
+        self.deliver(event)
+        return event
+
+    def deliver(self, event):
+        """Record an already numbered event and hand it to local subscribers"""
+        with self._condition:
+            self._history.append(event)
+            self._next_id = max(self._next_id, event['id'] + 1)
+            subscribers = list(self._subscribers)
+            self._condition.notify_all()
+        for subscriber in subscribers:
+            subscriber.push(event)
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber, pre-filled with events missed since last_event_id"""
+        subscriber = Subscriber(self.subscriber_buffer_size)
+        with self._condition:
+            if last_event_id is not None:
+                last_event_id = self._resume_from(last_event_id)
+                for event in self._history:
+                    if event['id'] > last_event_id:
+                        subscriber.push(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._condition:
+            self._subscribers.discard(subscriber)
+
+    def events_since(self, last_event_id, timeout=0):
+        """Events newer than last_event_id, waiting up to `timeout` seconds for one to arrive"""
+        deadline = time.time() + timeout
+        with self._condition:
+            last_event_id = self._resume_from(last_event_id)
+            while True:
+                events = [event for event in self._history if event['id'] > last_event_id]
+                remaining = deadline - time.time()
+                if events or remaining <= 0:
+                    return events
+                self._condition.wait(remaining)
+
+    def _resume_from(self, last_event_id):
+        # An id this process never issued predates a restart: replay everything
+        if self.detect_resets and last_event_id >= self._next_id:
+            return 0
+        return last_event_id
+
+    def last_event_id(self):
+        with self._condition:
+            return self._history[-1]['id'] if self._history else 0
+
+    def stats(self):
+        with self._condition:
+            return {
+                'backend': 'memory',
+                'subscribers': len(self._subscribers),
+                'history': len(self._history),
+                'last_event_id': self._history[-1]['id'] if self._history else 0
+            }
+
+
+class RedisBroker:
+    """
+    Broker shared by several worker processes through Redis pub/sub.
+    Event ids and replay history live in Redis; each process fans
+    incoming events out to its own subscribers via a local InMemoryBroker.
+    """
+
+    def __init__(self, url, namespace='bedsidebot:events', history_size=HISTORY_SIZE,
+                 subscriber_buffer_size=SUBSCRIBER_BUFFER_SIZE):
+        if redis is None:
+            raise RuntimeError("The redis package is required for EVENT_BROKER_URL=redis://...")
+
+        self.history_size = history_size
+        self._redis = redis.Redis.from_url(url)
+        self._channel = namespace
+        self._id_key = f'{namespace}:id'
+        self._history_key = f'{namespace}:history'
+        # Ids come from Redis, so a worker may not have seen the newest one yet;
+        # resets are detected against the Redis counter instead (_resume_from)
+        self._local = InMemoryBroker(history_size, subscriber_buffer_size, detect_resets=False)
+
+        # Seed local history so long-poll clients can catch up after a restart
+        for raw in reversed(self._redis.lrange(self._history_key, 0, history_size - 1)):
+            self._local.deliver(json.loads(raw))
+
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self._channel)
+        self._listener = threading.Thread(target=self._listen, name='event-broker-redis', daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        for message in self._pubsub.listen():
+            try:
+                self._local.deliver(json.loads(message['data']))
+            except Exception as e:
+                print(f"[ERROR] Bad event from broker: {e}")
+
+    def publish(self, event_type, data):
+        event = {
+            'id': self._redis.incr(self._id_key),
+            'type': event_type,
+            'data': data,
+            'timestamp': time.time()
+        }
+        raw = json.dumps(event)
+        pipe = self._redis.pipeline()
+        pipe.lpush(self._history_key, raw)
+        pipe.ltrim(self._history_key, 0, self.history_size - 1)
+        pipe.publish(self._channel, raw)
+        pipe.execute()
+        return event
+
+    def _resume_from(self, last_event_id):
+        # Only a flushed or replaced Redis hands out ids below one a client has seen
+        if last_event_id is not None and last_event_id > int(self._redis.get(self._id_key) or 0):
+            return 0
+        return last_event_id
+
+    def subscribe(self, last_event_id=None):
+        return self._local.subscribe(self._resume_from(last_event_id))
+
+    def unsubscribe(self, subscriber):
+        self._local.unsubscribe(subscriber)
+
+    def events_since(self, last_event_id, timeout=0):
+        return self._local.events_since(self._resume_from(last_event_id), timeout)
+
+    def last_event_id(self):
+        return self._local.last_event_id()
+
+    def stats(self):
+        stats = self._local.stats()
+        stats['backend'] = 'redis'
+        return stats
+
+
+def create_broker(url=None):
+    """Build the broker configured by EVENT_BROKER_URL (in-memory by default)"""
+    url = url if url is not None else os.environ.get('EVENT_BROKER_URL', '')
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBroker(url)
+    return InMemoryBroker()
+
+
+def format_sse(event):
+    """Serialize an event in text/event-stream format"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
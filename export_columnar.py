@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Columnar Export Script
+Exports patient_requests (joined to patients) as Parquet or Arrow IPC files
+partitioned by date and department, for offline analytics. Each run rebuilds
+the days with requests newer than the last export's watermark plus the last
+few days (to pick up acknowledgements), so it can run from cron.
+
+Usage:
+    python export_columnar.py                      # incremental Parquet export
+    python export_columnar.py --format arrow       # Arrow IPC instead
+    python export_columnar.py --full --output /data/bedsidebot
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from columnar_export import export_requests, COLUMNAR_EXPORT_DIR, FILE_EXTENSIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export patient requests as partitioned Parquet/Arrow files')
+    parser.add_argument('--output', default=COLUMNAR_EXPORT_DIR,
+                        help=f'export directory (default: {COLUMNAR_EXPORT_DIR})')
+    parser.add_argument('--format', choices=sorted(FILE_EXTENSIONS), default='parquet')
+    parser.add_argument('--compression', default='zstd',
+                        help='codec, e.g. zstd, snappy, gzip (parquet) or zstd, lz4 (arrow)')
+    parser.add_argument('--full', action='store_true',
+                        help='ignore the watermark and rebuild every partition')
+    parser.add_argument('--since-id', type=int, default=None,
+                        help='rebuild from the day of the first request with an id greater than this')
+    args = parser.parse_args()
+
+    started = time.time()
+    try:
+        with app.app_context():
+            summary = export_requests(
+                output_dir=args.output,
+                file_format=args.format,
+                full=args.full,
+                since_id=args.since_id,
+                compression=args.compression
+            )
+    except (RuntimeError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    rebuilt = f"from {summary['rebuilt_from']}" if summary['rebuilt_from'] else 'all dates'
+    print(f"[OK] Exported {summary['rows']} requests ({summary['new_requests']} new since request "
+          f"{summary['since_request_id']}, partitions rebuilt {rebuilt}) "
+          f"to {len(summary['files'])} {args.format} files in {summary['output_dir']} "
+          f"in {time.time() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Request exports
+Streams patient_requests joined to the patient's name in fixed-size batches
+(server-side cursor via yield_per), so memory stays flat however large the
+export window is. Used by /api/analytics/export.
+"""
+import csv
+import io
+import json
+
+from database import db, Patient, PatientRequest
+
+# Rows fetched per database round trip / serialized per response chunk
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    'timestamp', 'patient_id', 'patient_name', 'room_number', 'bed_number',
+    'request_type', 'request_method', 'request_message', 'status',
+    'urgency_level', 'response_time_minutes'
+]
+
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'jsonl': 'application/jsonl',
+    'csv': 'text/csv'
+}
+
+
+def export_query(start, end):
+    """Requests in [start, end) with the patient's name, one LEFT JOIN instead of a query per row"""
+    return db.session.query(
+        PatientRequest.timestamp,
+        PatientRequest.patient_id,
+        Patient.full_name,
+        PatientRequest.room_number,
+        PatientRequest.bed_number,
+        PatientRequest.request_type,
+        PatientRequest.request_method,
+        PatientRequest.request_message,
+        PatientRequest.status,
+        PatientRequest.urgency_level,
+        PatientRequest.response_time
+    ).outerjoin(
+        Patient, Patient.patient_id == PatientRequest.patient_id
+    ).filter(
+        PatientRequest.timestamp >= start,
+        PatientRequest.timestamp < end
+    ).order_by(PatientRequest.timestamp, PatientRequest.id)
+
+
+def iter_export_rows(start, end, batch_size=EXPORT_BATCH_SIZE):
+    """Yield export records (dicts) for requests in [start, end)"""
+    for row in export_query(start, end).yield_per(batch_size):
+        yield {
+            'timestamp': row.timestamp.isoformat(),
+            'patient_id': row.patient_id,
+            'patient_name': row.full_name or 'Unknown',
+            'room_number': row.room_number,
+            'bed_number': row.bed_number,
+            'request_type': row.request_type,
+            'request_method': row.request_method,
+            'request_message': row.request_message,
+            'status': row.status,
+            'urgency_level': row.urgency_level,
+            'response_time_minutes': ((row.response_time - row.timestamp).total_seconds() / 60) if row.response_time else None
+        }
+
+
+def _batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_json_lines(records, batch_size=EXPORT_BATCH_SIZE):
+    """One JSON object per line (NDJSON / JSON Lines)"""
+    for batch in _batches(records, batch_size):
+        yield ''.join(json.dumps(record) + '\n' for record in batch)
+
+
+def stream_csv(records, batch_size=EXPORT_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for batch in _batches(records, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_json(records, period, batch_size=EXPORT_BATCH_SIZE):
+    """The original {'status', 'data', 'total_records', 'period'} body, written incrementally"""
+    yield '{"status": "success", "data": ['
+    total = 0
+    for batch in _batches(records, batch_size):
+        yield (', ' if total else '') + ', '.join(json.dumps(record) for record in batch)
+        total += len(batch)
+    yield f'], "total_records": {total}, "period": {json.dumps(period)}}}'
+
+
+def stream_export(format_type, start, end, period, batch_size=EXPORT_BATCH_SIZE):
+    """Chunks of the export body in the requested format"""
+    records = iter_export_rows(start, end, batch_size)
+    if format_type == 'csv':
+        return stream_csv(records, batch_size)
+    if format_type in ('ndjson', 'jsonl'):
+        return stream_json_lines(records, batch_size)
+    return stream_json(records, period, batch_size)
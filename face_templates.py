@@ -0,0 +1,105 @@
+"""
+Patient face templates
+/train_patient_face enrolls a patient from one or more photos: the largest
+Haar face in each is cropped, histogram-equalized (so ward lighting matters
+less) and scaled to TEMPLATE_SIZE, and the crops are averaged into one
+template per patient. Enrolling again with append keeps a running mean over
+every crop so far. Templates live in the patient_face_templates table;
+app_simple.py keeps the ones it is monitoring with in memory, since the face
+check runs on the camera thread outside any app context.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+from database import db, PatientFaceTemplate
+
+TEMPLATE_SIZE = (100, 100)
+MATCH_THRESHOLD = 0.6  # TM_CCOEFF_NORMED score that counts as the patient (1.0 = perfect match)
+
+# Most photos accepted in one enrollment request
+MAX_ENROLL_IMAGES = 10
+
+face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def decode_image(data):
+    """BGR image from encoded bytes (bytes, bytearray or memoryview), or None"""
+    buffer = np.frombuffer(data, np.uint8)
+    if not buffer.size:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def face_crop(image):
+    """Equalized TEMPLATE_SIZE grayscale crop of the largest face in a BGR image, or None"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    if len(faces) == 0:
+        return None
+    (x, y, w, h) = max(faces, key=lambda face: face[2] * face[3])
+    return cv2.equalizeHist(cv2.resize(gray[y:y + h, x:x + w], TEMPLATE_SIZE))
+
+
+def enroll(patient_id, crops, append=False):
+    """
+    Average face crops into the patient's stored template (replacing it, or
+    folding them into the existing mean with `append`). Returns the saved row.
+    """
+    crops = np.stack(crops).astype(np.float32)
+    record = PatientFaceTemplate.query.filter_by(patient_id=patient_id).first()
+    if record is None:
+        record = PatientFaceTemplate(patient_id=patient_id)
+        db.session.add(record)
+
+    total, count = crops.sum(axis=0), len(crops)
+    if append and record.sample_count and (record.width, record.height) == TEMPLATE_SIZE:
+        total += record.to_array() * record.sample_count
+        count += record.sample_count
+
+    mean = total / count
+    record.width, record.height = TEMPLATE_SIZE
+    record.template = mean.astype(np.float32).tobytes()
+    record.sample_count = count
+    db.session.commit()
+
+    with _cache_lock:
+        _cache[patient_id] = _match_image(mean)
+    return record
+
+
+def load_template(patient_id):
+    """The patient's template ready for matching, from the cache or the database; None if not enrolled"""
+    with _cache_lock:
+        if patient_id in _cache:
+            return _cache[patient_id]
+    record = PatientFaceTemplate.query.filter_by(patient_id=patient_id).first()
+    if record is None:
+        return None  # Not cached: an enrollment from another process shows up on the next load
+    template = _match_image(record.to_array())
+    with _cache_lock:
+        _cache[patient_id] = template
+    return template
+
+
+def cached_template(patient_id):
+    """Template already loaded for a patient (no database access, safe off the request thread)"""
+    with _cache_lock:
+        return _cache.get(patient_id)
+
+
+def _match_image(mean):
+    return np.clip(np.rint(mean), 0, 255).astype(np.uint8)
+
+
+def matches(face_roi, template):
+    """Whether a BGR face crop looks like the template"""
+    gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
+    gray_face = cv2.equalizeHist(cv2.resize(gray_face, TEMPLATE_SIZE))
+    result = cv2.matchTemplate(gray_face, template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, _ = cv2.minMaxLoc(result)
+    return max_val > MATCH_THRESHOLD
@@ -0,0 +1,325 @@
+"""
+Frame sources
+Everything the vision pipeline can read frames from, behind the
+cv2.VideoCapture interface it already uses (read(), isOpened(), release()):
+
+    CameraSource          local camera: V4L2 on Linux, DirectShow on Windows
+    VideoFileSource       recorded video file
+    ImageDirectorySource  directory of images, in file name order
+    StreamSource          network camera (rtsp://, http://), reconnects on drop
+    SyntheticSource       generated frames, no hardware or files needed
+
+open_source() picks one from a spec string, so production, CI and load tests
+run the same engine with different WARD_CAMERAS / CAMERA_SOURCE values.
+Frames are handed to the pipeline by reference, never copied: capture sources
+return the array OpenCV decoded into and preloaded sources return shared
+read-only arrays. Synthetic sources keep only a few rendered backgrounds and
+draw the moving block and counter onto a copy of one per frame, so their
+memory doesn't grow with resolution times frame rate.
+"""
+import glob
+import os
+import re
+import sys
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_SIZE = (640, 480)
+DEFAULT_FPS = 30.0
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+STREAM_SCHEMES = ('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://')
+
+# Seconds between reconnect attempts while a network stream is down
+RECONNECT_DELAY = 2.0
+
+# Seconds for the synthetic block to sweep across the frame and back
+SYNTHETIC_LOOP_SECONDS = 2
+
+# Noisy backgrounds rendered per synthetic source and cycled under the block
+SYNTHETIC_BACKGROUNDS = 4
+
+# Length of a synthetic clip opened for replay (live synthetic sources never end)
+SYNTHETIC_CLIP_SECONDS = 10
+
+SYNTHETIC_SPEC = re.compile(r'^synthetic(?::(\d+)x(\d+))?(?:@(\d+(?:\.\d+)?))?$')
+
+
+def camera_backend():
+    """Native capture API for this platform"""
+    if sys.platform.startswith('linux'):
+        return cv2.CAP_V4L2
+    if sys.platform == 'win32':
+        return cv2.CAP_DSHOW
+    if sys.platform == 'darwin':
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+
+class FrameSource:
+    """
+    Base class. Subclasses implement _read() -> frame or None; `realtime` paces
+    reads to `fps` (files and generators otherwise run as fast as they're read).
+    """
+
+    def __init__(self, fps=DEFAULT_FPS, realtime=False):
+        self.fps = fps
+        self.realtime = realtime
+        self.frames_read = 0
+        self._next_frame_at = None
+
+    def isOpened(self):
+        return True
+
+    def _read(self):
+        raise NotImplementedError
+
+    def read(self):
+        """(ok, frame), like cv2.VideoCapture.read()"""
+        if self.realtime:
+            self._pace()
+        frame = self._read()
+        if frame is None:
+            return False, None
+        self.frames_read += 1
+        return True, frame
+
+    def _pace(self):
+        now = time.monotonic()
+        if self._next_frame_at is None or now - self._next_frame_at > 1.0:
+            self._next_frame_at = now  # First frame, or we fell far behind: don't try to catch up
+        elif self._next_frame_at > now:
+            time.sleep(self._next_frame_at - now)
+        self._next_frame_at += 1.0 / self.fps
+
+    def release(self):
+        pass
+
+    def describe(self):
+        return type(self).__name__
+
+    def __iter__(self):
+        while True:
+            ok, frame = self.read()
+            if not ok:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class CaptureSource(FrameSource):
+    """A source backed by cv2.VideoCapture"""
+
+    def __init__(self, target, backend=cv2.CAP_ANY, fps=None, realtime=False):
+        self.target = target
+        self.backend = backend
+        self.cap = self._open()
+        super().__init__(fps or self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS, realtime)
+
+    def _open(self):
+        return cv2.VideoCapture(self.target, self.backend)
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def _read(self):
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def describe(self):
+        return f"{type(self).__name__}({self.target})"
+
+
+class CameraSource(CaptureSource):
+    """Local camera by index or device path (/dev/video0)"""
+
+    def __init__(self, device=0, size=DEFAULT_SIZE, fps=DEFAULT_FPS):
+        self.size = size
+        self.requested_fps = fps
+        super().__init__(device, camera_backend(), fps)
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.target, self.backend)
+        if not cap.isOpened() and self.backend != cv2.CAP_ANY:
+            cap = cv2.VideoCapture(self.target)
+        if cap.isOpened():
+            if self.backend == cv2.CAP_V4L2:
+                # Compressed capture keeps 640x480@30 within USB 2.0 bandwidth
+                cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+            cap.set(cv2.CAP_PROP_FPS, self.requested_fps)
+            # Don't let the driver queue frames behind a slow reader
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+
+class VideoFileSource(CaptureSource):
+    """Recorded video; `loop` restarts it at the end"""
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.loop = loop
+        super().__init__(path, realtime=realtime)
+
+    def _read(self):
+        frame = super()._read()
+        if frame is None and self.loop and self.frames_read:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            frame = super()._read()
+        return frame
+
+
+class StreamSource(CaptureSource):
+    """Network camera; reopens the stream (every RECONNECT_DELAY seconds) when it drops"""
+
+    def __init__(self, url, reconnect=True):
+        # RTSP over TCP: UDP drops packets (and whole frames) on busy hospital networks
+        os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS', 'rtsp_transport;tcp')
+        self.reconnect = reconnect
+        self.reconnects = 0
+        self._retry_at = 0.0
+        super().__init__(url, cv2.CAP_FFMPEG)
+
+    def _read(self):
+        if self.isOpened():
+            frame = super()._read()
+            if frame is not None or not self.reconnect:
+                return frame
+            self.cap.release()
+
+        if not self.reconnect or time.monotonic() < self._retry_at:
+            time.sleep(0.05)
+            return None
+        self._retry_at = time.monotonic() + RECONNECT_DELAY
+        self.reconnects += 1
+        self.cap = self._open()
+        return None
+
+    def describe(self):
+        # Don't leak stream credentials into logs and status pages
+        return f"StreamSource({re.sub(r'//[^/@]*@', '//***@', self.target)})"
+
+
+class ImageDirectorySource(FrameSource):
+    """
+    Images in a directory, in file name order. `preload` decodes them all up
+    front (and hands out the same read-only arrays on every loop).
+    """
+
+    def __init__(self, path, fps=DEFAULT_FPS, loop=False, realtime=False, preload=False):
+        super().__init__(fps, realtime)
+        self.path = path
+        self.loop = loop
+        self.files = sorted(f for f in glob.glob(os.path.join(path, '*')) if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+        self.cache = [self._load(f) for f in self.files] if preload else None
+
+    @staticmethod
+    def _load(path):
+        frame = cv2.imread(path)
+        if frame is not None:
+            frame.flags.writeable = False
+        return frame
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def _read(self):
+        if self.position >= len(self.files):
+            if not self.loop or not self.files:
+                return None
+            self.position = 0
+        index = self.position
+        self.position += 1
+        return self.cache[index] if self.cache is not None else self._load(self.files[index])
+
+    def describe(self):
+        return f"ImageDirectorySource({self.path}, {len(self.files)} images)"
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generated frames: a noisy gradient with a moving block and a frame counter.
+    A few backgrounds are rendered up front; each read copies one and draws the
+    block and counter on it. `frames` limits how many are produced.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, fps=DEFAULT_FPS, realtime=True, frames=None):
+        super().__init__(fps, realtime)
+        self.size = size
+        self.limit = frames
+        self.period = max(1, int(fps * SYNTHETIC_LOOP_SECONDS))
+        self.block = max(8, min(size) // 6)
+        self._backgrounds = self._render_backgrounds(size, SYNTHETIC_BACKGROUNDS)
+
+    @staticmethod
+    def _render_backgrounds(size, count):
+        width, height = size
+        rng = np.random.default_rng(0)
+        gradient = np.zeros((height, width, 3), dtype=np.uint8)
+        gradient[..., 0] = np.linspace(40, 200, width, dtype=np.uint8)[None, :]
+        gradient[..., 1] = np.linspace(60, 180, height, dtype=np.uint8)[:, None]
+        gradient[..., 2] = 90
+        return [gradient + rng.integers(0, 8, gradient.shape, dtype=np.uint8) for _ in range(count)]
+
+    def _read(self):
+        i = self.frames_read
+        if self.limit is not None and i >= self.limit:
+            return None
+
+        width, height = self.size
+        block = self.block
+        frame = self._backgrounds[i % len(self._backgrounds)].copy()
+        x = int((width - block) * (0.5 + 0.5 * np.sin(2 * np.pi * (i % self.period) / self.period)))
+        y = (height - block) // 2
+        frame[y:y + block, x:x + block] = (255, 255, 255)
+        cv2.putText(frame, f'SYNTHETIC {i % self.period:04d}', (10, height - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+        return frame
+
+    def describe(self):
+        return f"SyntheticSource({self.size[0]}x{self.size[1]}@{self.fps:g})"
+
+
+def open_source(spec, live=False, **options):
+    """
+    FrameSource for a spec string:
+        0, 1, /dev/video2           local camera
+        rtsp://..., http://...      network stream
+        synthetic[:WxH][@FPS]       generated frames
+        path/to/directory           image sequence
+        anything else               video file
+    `live` makes files and image directories behave like a camera (loop,
+    paced to their frame rate); benchmarks leave it off to read flat out,
+    and get a SYNTHETIC_CLIP_SECONDS clip from a synthetic spec.
+    """
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return CameraSource(int(spec), **options)
+    if spec.startswith('/dev/video'):
+        return CameraSource(spec, **options)
+    if spec.lower().startswith(STREAM_SCHEMES):
+        return StreamSource(spec, **options)
+
+    synthetic = SYNTHETIC_SPEC.match(spec)
+    if synthetic:
+        width, height, fps = synthetic.groups()
+        size = (int(width), int(height)) if width else DEFAULT_SIZE
+        fps = float(fps) if fps else DEFAULT_FPS
+        options.setdefault('frames', None if live else int(fps * SYNTHETIC_CLIP_SECONDS))
+        return SyntheticSource(size, fps, realtime=live, **options)
+
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, loop=live, realtime=live, **options)
+    return VideoFileSource(spec, loop=live, realtime=live, **options)
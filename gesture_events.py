@@ -0,0 +1,137 @@
+"""
+Browser gesture events
+interface.html runs MediaPipe Hands in the browser. Rather than the server
+decoding video, the page posts the finger count it reads from each frame, in
+batches, to /api/beds/<bed>/events. The server stays authoritative for what
+counts as a request: events go through the same stable_gesture() vote and
+SELECTION_BUFFER_TIME as the camera pipeline (bed_vision.py), which costs a few
+list operations per batch instead of a MediaPipe pass per frame.
+
+A batch is either compact JSON
+    {"epoch": 1234, "events": [[seq, t_ms, fingers], ...]}
+or application/octet-stream: BATCH_HEADER (version, epoch) followed by one
+EVENT_RECORD (seq, t_ms, fingers) per frame, little endian. `epoch` is picked
+at random on each page load, `seq` counts frames within it and `t_ms` is the
+page's clock. Events at or below the highest seq already seen for the bed are
+duplicates (a retried batch) and are dropped. One page load owns a bed at a
+time: a batch from another epoch (a second tab, or a late batch from before a
+reload) is refused until the owner has been silent for EPOCH_TAKEOVER_TIME.
+The selection buffer runs on the server clock and carries over to the new
+epoch, so switching pages can't trigger extra requests.
+
+The state lives in the bed's session (session_registry.BedSession), so it is
+shared between workers with SESSION_BACKEND_URL and goes away with the session.
+"""
+import struct
+import time
+
+SELECTION_BUFFER_TIME = 3.0  # 3 seconds buffer between selections
+GESTURE_BUFFER_SIZE = 20
+
+BATCH_VERSION = 1
+BATCH_HEADER = struct.Struct('<BI')  # version, epoch
+EVENT_RECORD = struct.Struct('<IIb')  # seq, t_ms, fingers
+
+# Largest batch accepted in one request (~17 seconds of frames at 30 fps)
+MAX_BATCH_EVENTS = 512
+
+# Seconds a bed's page must have been silent before a batch from another epoch takes it over
+EPOCH_TAKEOVER_TIME = 5.0
+
+
+# Function to stabilize gesture recognition
+def stable_gesture(gesture_buffer):
+    if len(gesture_buffer) < 3:  # Need at least 3 readings
+        return None
+
+    # Get most common gesture from recent readings
+    recent_gestures = list(gesture_buffer)[-10:]
+    valid_gestures = [g for g in recent_gestures if 1 <= g <= 5]
+
+    if not valid_gestures:
+        return None
+
+    # Return most frequent valid gesture
+    gesture_counts = {}
+    for g in valid_gestures:
+        gesture_counts[g] = gesture_counts.get(g, 0) + 1
+
+    # Only return if gesture appears at least 2 times
+    max_gesture = max(gesture_counts, key=gesture_counts.get)
+    if gesture_counts[max_gesture] >= 2:
+        return max_gesture
+
+    return None
+
+
+def parse_batch(body, content_type):
+    """(epoch, [(seq, t_ms, fingers)]) from a JSON or binary batch; ValueError if malformed"""
+    if content_type and content_type.startswith('application/octet-stream'):
+        if len(body) < BATCH_HEADER.size or (len(body) - BATCH_HEADER.size) % EVENT_RECORD.size:
+            raise ValueError("Batch length is not a header plus whole event records")
+        version, epoch = BATCH_HEADER.unpack_from(body)
+        if version != BATCH_VERSION:
+            raise ValueError(f"Unsupported batch version: {version}")
+        events = list(EVENT_RECORD.iter_unpack(memoryview(body)[BATCH_HEADER.size:]))
+    else:
+        data = body if isinstance(body, dict) else {}
+        epoch = data.get('epoch')
+        try:
+            events = [(int(seq), int(t_ms), int(fingers)) for seq, t_ms, fingers in data.get('events') or []]
+        except (TypeError, ValueError):
+            raise ValueError("events must be a list of [seq, t_ms, fingers]")
+        if not isinstance(epoch, int):
+            raise ValueError("epoch must be an integer")
+
+    if len(events) > MAX_BATCH_EVENTS:
+        raise ValueError(f"At most {MAX_BATCH_EVENTS} events per batch")
+    return epoch, events
+
+
+def new_gesture_state():
+    """Stabilizer state for a bed; a plain dict so it can be stored with the bed's session"""
+    return {'epoch': None, 'epoch_seen_at': 0.0, 'last_seq': 0, 'last_selection_time': None, 'buffer': []}
+
+
+class GestureStabilizer:
+    """Dedup and stabilization of one bed's browser gesture events, over its stored state"""
+
+    def __init__(self, state, selection_buffer_time=SELECTION_BUFFER_TIME):
+        self.state = state
+        self.selection_buffer_time = selection_buffer_time
+
+    def ingest(self, epoch, events, now=None):
+        """
+        Feed one batch in seq order. Returns (accepted, duplicates, last_seq,
+        button), where button is the request selected by this batch, if any,
+        or None if the batch comes from a page load that doesn't own the bed.
+        """
+        state = self.state
+        now = time.time() if now is None else now
+        if epoch != state['epoch']:
+            if state['epoch'] is not None and now - state['epoch_seen_at'] < EPOCH_TAKEOVER_TIME:
+                return None  # Another tab, or a late batch from before a reload
+            state.update(epoch=epoch, last_seq=0, buffer=[])
+        state['epoch_seen_at'] = now
+
+        accepted = 0
+        selected = None
+        buffer = state['buffer']
+        for seq, t_ms, fingers in sorted(events):
+            if seq <= state['last_seq']:
+                continue
+            state['last_seq'] = seq
+            accepted += 1
+            if fingers < 0:  # No hand in this frame
+                continue
+
+            buffer.append(fingers)
+            del buffer[:-GESTURE_BUFFER_SIZE]
+            gesture = stable_gesture(buffer)
+            last = state['last_selection_time']
+            # Server clock: page clocks restart on reload and differ between tabs
+            if gesture and (last is None or now - last >= self.selection_buffer_time):
+                selected = gesture
+                state['last_selection_time'] = now
+
+        return accepted, len(events) - accepted, state['last_seq'], selected
@@ -5,137 +5,149 @@ No verification, no setup, no Google accounts needed
 import requests
 import json
 from datetime import datetime
+from notification_fanout import delivery, fan_out, count_successes, send_timeout
+from provider_health import endpoint_name, provider_registry, response_ok, RecipientError
 
-def send_instant_sms(phone, message):
-    """Send SMS instantly using multiple free services"""
+TEXTBELT_URL = "https://textbelt.com/text"
+SMS77_URL = "https://gateway.sms77.io/api/sms"
+VONAGE_URL = "https://rest.nexmo.com/sms/json"
+EMAILJS_URL = "https://api.emailjs.com/api/v1.0/email/send"
+EMAILJS_SERVICE = 'service_bedsidebot'
+FORMSPREE_URL = "https://formspree.io/f/xpzvgqjr"  # Public form endpoint
+NETLIFY_URL = "https://bedsidebot-alerts.netlify.app/"
+
+def _sms_textbelt(phone, clean_phone, message):
+    """TextBelt (Free - works immediately)"""
+    data = {
+        'phone': clean_phone,
+        'message': message[:160],
+        'key': 'textbelt'
+    }
     
-    clean_phone = phone.replace('+', '').replace('-', '').replace(' ', '')
+    response = requests.post(TEXTBELT_URL, data=data, timeout=send_timeout(10))
+    if not response_ok(response):
+        return False
+    result = response.json()
     
-    # Method 1: TextBelt (Free - works immediately)
-    try:
-        url = "https://textbelt.com/text"
-        data = {
-            'phone': clean_phone,
-            'message': message[:160],
-            'key': 'textbelt'
-        }
-        
-        response = requests.post(url, data=data, timeout=10)
-        result = response.json()
-        
-        if result.get('success'):
-            print(f"SMS sent to {phone}")
-            return True
-        else:
-            print(f"TextBelt: {result.get('error', 'Failed')}")
-    except Exception as e:
-        print(f"TextBelt error: {e}")
-    
-    # Method 2: SMS77 (Free tier - works globally)
-    try:
-        url = "https://gateway.sms77.io/api/sms"
-        data = {
-            'to': clean_phone,
-            'text': message[:160],
-            'p': 'your_free_api_key',  # Free tier available
-            'from': 'BedsideBot'
-        }
-        
-        response = requests.post(url, data=data, timeout=10)
-        
-        if response.status_code == 100:  # SMS77 success code
-            print(f"SMS sent via SMS77 to {phone}")
-            return True
-    except Exception as e:
-        print(f"SMS77 error: {e}")
-    
-    # Method 3: Vonage (Free trial - $2 credit)
-    try:
-        url = "https://rest.nexmo.com/sms/json"
-        data = {
-            'api_key': 'your_vonage_key',
-            'api_secret': 'your_vonage_secret',
-            'to': clean_phone,
-            'from': 'BedsideBot',
-            'text': message[:160]
-        }
-        
-        response = requests.post(url, data=data, timeout=10)
-        result = response.json()
-        
-        if result.get('messages', [{}])[0].get('status') == '0':
-            print(f"SMS sent via Vonage to {phone}")
-            return True
-    except Exception as e:
-        print(f"Vonage error: {e}")
+    if result.get('success'):
+        print(f"SMS sent to {phone}")
+        return True
+    # Quota used up for this number, invalid number, ... - TextBelt itself is fine
+    raise RecipientError(result.get('error', 'Failed'))
+
+def _sms_sms77(phone, clean_phone, message):
+    """SMS77 (Free tier - works globally)"""
+    data = {
+        'to': clean_phone,
+        'text': message[:160],
+        'p': 'your_free_api_key',  # Free tier available
+        'from': 'BedsideBot'
+    }
     
+    response = requests.post(SMS77_URL, data=data, timeout=send_timeout(10))
+    
+    if response_ok(response) and response.text.strip() == '100':  # SMS77 success code
+        print(f"SMS sent via SMS77 to {phone}")
+        return True
     return False
 
-def send_instant_email(to_email, subject, message):
-    """Send email instantly using services that don't require verification"""
-    
-    # Method 1: EmailJS (Works immediately - no verification)
-    try:
-        url = "https://api.emailjs.com/api/v1.0/email/send"
-        data = {
-            'service_id': 'service_bedsidebot',
-            'template_id': 'template_alert',
-            'user_id': 'public_user_bedsidebot',
-            'template_params': {
-                'to_email': to_email,
-                'subject': subject,
-                'message': message,
-                'from_name': 'BedsideBot System'
-            }
-        }
-        
-        response = requests.post(url, json=data, timeout=10)
-        
-        if response.status_code == 200:
-            print(f"Email sent via EmailJS to {to_email}")
-            return True
-    except Exception as e:
-        print(f"EmailJS error: {e}")
-    
-    # Method 2: Formspree (Works immediately)
-    try:
-        url = "https://formspree.io/f/xpzvgqjr"  # Public form endpoint
-        data = {
-            'email': to_email,
+def _sms_vonage(phone, clean_phone, message):
+    """Vonage (Free trial - $2 credit)"""
+    data = {
+        'api_key': 'your_vonage_key',
+        'api_secret': 'your_vonage_secret',
+        'to': clean_phone,
+        'from': 'BedsideBot',
+        'text': message[:160]
+    }
+    
+    response = requests.post(VONAGE_URL, data=data, timeout=send_timeout(10))
+    if not response_ok(response):
+        return False
+    result = response.json()
+    
+    status = result.get('messages', [{}])[0]
+    if status.get('status') == '0':
+        print(f"SMS sent via Vonage to {phone}")
+        return True
+    raise RecipientError(status.get('error-text', 'Failed'))
+
+def send_instant_sms(phone, message):
+    """Send SMS instantly using multiple free services (healthiest first)"""
+    
+    clean_phone = phone.replace('+', '').replace('-', '').replace(' ', '')
+    
+    providers = [
+        (endpoint_name(TEXTBELT_URL), _sms_textbelt),
+        (endpoint_name(SMS77_URL), _sms_sms77),
+        (endpoint_name(VONAGE_URL), _sms_vonage)
+    ]
+    return provider_registry.first_success(providers, phone, clean_phone, message) is not None
+
+def _email_emailjs(to_email, subject, message):
+    """EmailJS (Works immediately - no verification)"""
+    data = {
+        'service_id': EMAILJS_SERVICE,
+        'template_id': 'template_alert',
+        'user_id': 'public_user_bedsidebot',
+        'template_params': {
+            'to_email': to_email,
             'subject': subject,
             'message': message,
-            '_replyto': 'noreply@bedsidebot.com'
-        }
-        
-        response = requests.post(url, data=data, timeout=10)
-        
-        if response.status_code == 200:
-            print(f"Email sent via Formspree to {to_email}")
-            return True
-    except Exception as e:
-        print(f"Formspree error: {e}")
-    
-    # Method 3: Netlify Forms (Works immediately)
-    try:
-        url = "https://bedsidebot-alerts.netlify.app/"
-        data = {
-            'form-name': 'alerts',
-            'email': to_email,
-            'subject': subject,
-            'message': message
+            'from_name': 'BedsideBot System'
         }
-        
-        response = requests.post(url, data=data, timeout=10)
-        
-        if response.status_code == 200:
-            print(f"Email sent via Netlify to {to_email}")
-            return True
-    except Exception as e:
-        print(f"Netlify error: {e}")
+    }
     
+    response = requests.post(EMAILJS_URL, json=data, timeout=send_timeout(10))
+    
+    if response_ok(response):
+        print(f"Email sent via EmailJS to {to_email}")
+        return True
     return False
 
-def notify_caregivers_instant(caregivers, patient_name, request_type, patient_room, patient_bed):
+def _email_formspree(to_email, subject, message):
+    """Formspree (Works immediately)"""
+    data = {
+        'email': to_email,
+        'subject': subject,
+        'message': message,
+        '_replyto': 'noreply@bedsidebot.com'
+    }
+    
+    response = requests.post(FORMSPREE_URL, data=data, timeout=send_timeout(10))
+    
+    if response_ok(response):
+        print(f"Email sent via Formspree to {to_email}")
+        return True
+    return False
+
+def _email_netlify(to_email, subject, message):
+    """Netlify Forms (Works immediately)"""
+    data = {
+        'form-name': 'alerts',
+        'email': to_email,
+        'subject': subject,
+        'message': message
+    }
+    
+    response = requests.post(NETLIFY_URL, data=data, timeout=send_timeout(10))
+    
+    if response_ok(response):
+        print(f"Email sent via Netlify to {to_email}")
+        return True
+    return False
+
+def send_instant_email(to_email, subject, message):
+    """Send email instantly using services that don't require verification (healthiest first)"""
+    
+    providers = [
+        (endpoint_name(EMAILJS_URL, EMAILJS_SERVICE), _email_emailjs),
+        (endpoint_name(FORMSPREE_URL), _email_formspree),
+        (endpoint_name(NETLIFY_URL, 'alerts'), _email_netlify)
+    ]
+    return provider_registry.first_success(providers, to_email, subject, message) is not None
+
+def notify_caregivers_instant(caregivers, patient_name, request_type, patient_room, patient_bed, deadline=None):
     """
     Instant notification system
     Works immediately when caregiver registers - no setup needed
@@ -169,11 +181,11 @@ Please respond to this patient request immediately.
 This is an automated alert from BedsideBot Healthcare System.
     """
     
-    notifications_sent = 0
-    
     print(f"\nSending instant notifications...")
     print(f"Patient: {patient_name} | Request: {request_name}")
     
+    # Build every caregiver/channel send, then deliver them all at once
+    deliveries = []
     for caregiver in caregivers:
         caregiver_name = caregiver.get('fullName', 'Caregiver')
         caregiver_phone = caregiver.get('primaryPhone', '')
@@ -185,13 +197,14 @@ This is an automated alert from BedsideBot Healthcare System.
         
         # Send SMS
         if contact_method in ['sms', 'both'] and caregiver_phone:
-            if send_instant_sms(caregiver_phone, sms_message):
-                notifications_sent += 1
+            deliveries.append(delivery(caregiver_name, 'sms', send_instant_sms, caregiver_phone, sms_message))
         
         # Send Email
         if contact_method in ['email', 'both'] and caregiver_email:
-            if send_instant_email(caregiver_email, email_subject, email_message):
-                notifications_sent += 1
+            deliveries.append(delivery(caregiver_name, 'email', send_instant_email, caregiver_email, email_subject, email_message))
+    
+    results = fan_out(deliveries, deadline)
+    notifications_sent = count_successes(results)
     
     print(f"\nNotifications sent: {notifications_sent}")
     return notifications_sent > 0
\ No newline at end of file
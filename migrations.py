@@ -0,0 +1,94 @@
+"""
+Lightweight schema migrations
+db.create_all() builds new tables with their indexes, but never changes a
+table that already exists. Each migration here brings older databases up to
+date; applied versions are recorded in the schema_migrations table.
+"""
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+
+def _create_model_indexes(*models):
+    """Migration step: create any index declared on the models that is missing"""
+    def apply(engine):
+        for model in models:
+            for index in model.__table__.indexes:
+                index.create(engine, checkfirst=True)
+    return apply
+
+
+def _add_missing_columns(model, *column_names):
+    """Migration step: ALTER TABLE ADD COLUMN for model columns the table lacks"""
+    def apply(engine):
+        table = model.__table__
+        existing = {column['name'] for column in inspect(engine).get_columns(table.name)}
+        with engine.begin() as conn:
+            for name in column_names:
+                if name in existing:
+                    continue
+                column = table.columns[name]
+                column_type = column.type.compile(dialect=engine.dialect)
+                default = column.default.arg if column.default is not None else None
+                default_sql = f' DEFAULT {default!r}' if isinstance(default, (int, float)) else ''
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}{default_sql}'))
+    return apply
+
+
+def _rebuild_rollups(engine):
+    """Migration step: build request rollups and sketches for requests recorded before they existed"""
+    from rollups import rebuild
+    hourly, daily, sketches = rebuild()
+    print(f"[INFO] Rebuilt {hourly} hourly and {daily} daily rollup rows and {sketches} response-time sketches")
+
+
+def _steps(*steps):
+    def apply(engine):
+        for step in steps:
+            step(engine)
+    return apply
+
+
+def get_migrations():
+    """Ordered (version, description, apply(engine)) migrations"""
+    from database import Patient, PatientRequest, MonitoringSession, SystemAnalytics
+
+    return [
+        (1, 'Indexes for patient_requests, monitoring_sessions and patients hot filters',
+         _create_model_indexes(PatientRequest, MonitoringSession, Patient)),
+        (2, 'Response time totals and one row per day for system_analytics rollups',
+         _steps(_add_missing_columns(SystemAnalytics, 'response_count', 'response_time_total'),
+                _create_model_indexes(SystemAnalytics))),
+        (3, 'Backfill request rollups and response-time sketches from patient_requests',
+         _rebuild_rollups),
+    ]
+
+
+def get_applied_versions(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations ('
+            'version INTEGER PRIMARY KEY, '
+            'description VARCHAR(200), '
+            'applied_at TIMESTAMP)'
+        ))
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def run_migrations(engine):
+    """Apply every migration not yet recorded; returns the versions applied"""
+    applied = get_applied_versions(engine)
+    newly_applied = []
+
+    for version, description, apply in get_migrations():
+        if version in applied:
+            continue
+        apply(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:version, :description, :applied_at)'),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+        newly_applied.append(version)
+        print(f"[INFO] Applied migration {version}: {description}")
+
+    return newly_applied
@@ -0,0 +1,113 @@
+"""
+Concurrent notification fan-out
+Sends every caregiver/channel delivery at once through a bounded thread pool,
+so an alert takes as long as the slowest single send instead of the sum.
+The pool is shared, so a delivery must not outlive its alert: senders size
+their network timeouts with send_timeout(), which never reaches past the
+fan-out's deadline, and the provider registry stops trying fallbacks once it
+has passed.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Upper bound on simultaneous outbound sends across the whole process
+MAX_FANOUT_WORKERS = int(os.environ.get('NOTIFICATION_FANOUT_WORKERS', 16))
+
+# Overall time budget for one alert, in seconds
+DEFAULT_DEADLINE = float(os.environ.get('NOTIFICATION_DEADLINE', 20))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Deadline (time.time()) of the delivery running on this thread, if any
+_delivery = threading.local()
+
+
+def get_executor():
+    """Shared, lazily created pool used by all fan-outs"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_FANOUT_WORKERS, thread_name_prefix='notify-fanout')
+        return _executor
+
+
+def delivery(caregiver, channel, send, *args):
+    """Describe a single send: send(*args) must return True on success"""
+    return {
+        'caregiver': caregiver,
+        'channel': channel,
+        'send': send,
+        'args': args
+    }
+
+
+def time_left():
+    """Seconds until the current delivery's deadline, or None outside a fan-out"""
+    deadline = getattr(_delivery, 'deadline', None)
+    return None if deadline is None else deadline - time.time()
+
+
+def send_timeout(default):
+    """Timeout for one network call: `default`, cut to what is left of the delivery's deadline"""
+    remaining = time_left()
+    if remaining is None:
+        return default
+    return max(0.1, min(default, remaining))
+
+
+def _run_delivery(item, deadline):
+    start = time.time()
+    _delivery.deadline = deadline
+    try:
+        success = bool(item['send'](*item['args']))
+        error = None if success else 'Send failed'
+    except Exception as e:
+        success = False
+        error = str(e)
+    finally:
+        _delivery.deadline = None
+    return success, error, time.time() - start
+
+
+def fan_out(deliveries, deadline=None):
+    """
+    Run all deliveries concurrently and wait at most `deadline` seconds.
+    Returns one result per delivery, in input order:
+    {'caregiver', 'channel', 'success', 'error', 'seconds'}
+    Deliveries still running at the deadline are reported as timed out.
+    """
+    if deadline is None:
+        deadline = DEFAULT_DEADLINE
+
+    if not deliveries:
+        return []
+
+    executor = get_executor()
+    start = time.time()
+    futures = [executor.submit(_run_delivery, item, start + deadline) for item in deliveries]
+    wait(futures, timeout=deadline)
+
+    results = []
+    for item, future in zip(deliveries, futures):
+        if future.done():
+            success, error, seconds = future.result()
+        else:
+            future.cancel()
+            success, error, seconds = False, f'Timed out after {deadline}s', time.time() - start
+        results.append({
+            'caregiver': item['caregiver'],
+            'channel': item['channel'],
+            'success': success,
+            'error': error,
+            'seconds': round(seconds, 3)
+        })
+
+    return results
+
+
+def count_successes(results):
+    """Number of deliveries that succeeded"""
+    return sum(1 for result in results if result['success'])
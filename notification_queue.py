@@ -0,0 +1,240 @@
+"""
+Notification dispatch queue - delivers caregiver alerts off the request path
+Patient requests are enqueued once saved; a pool of worker threads does the
+slow SMS/email delivery in the background and records the delivery state.
+A failed delivery is retried with exponential backoff, a bounded number of
+times (more for emergencies), unless staff acknowledge the alert first. Every
+state change is passed to an optional on_update callback (the web app
+publishes it to the ICU dashboards).
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+# Delivery states reported to the ICU dashboard
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_RETRYING = 'retrying'  # Failed, waiting to be sent again
+STATUS_DELIVERED = 'delivered'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'  # Acknowledged by staff before a retry was sent
+
+EMERGENCY_REQUEST_TYPE = 5
+
+# Delivery attempts per job before it is marked failed
+MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 3))
+EMERGENCY_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_EMERGENCY_MAX_ATTEMPTS', 5))
+
+# Seconds before the first retry; doubles on each further retry, up to RETRY_BACKOFF_MAX
+RETRY_BACKOFF = float(os.environ.get('NOTIFICATION_RETRY_BACKOFF', 5))
+RETRY_BACKOFF_MAX = 60.0
+
+
+class NotificationDispatcher:
+    """Queue of notification jobs served by a pool of worker threads"""
+
+    def __init__(self, send_function, num_workers=4, max_queue_size=1000, max_history=500,
+                 max_attempts=MAX_ATTEMPTS, emergency_max_attempts=EMERGENCY_MAX_ATTEMPTS,
+                 retry_backoff=RETRY_BACKOFF, on_update=None):
+        self.send_function = send_function
+        self.on_update = on_update
+        self.num_workers = num_workers
+        self.max_history = max_history
+        self.max_attempts = max_attempts
+        self.emergency_max_attempts = emergency_max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue = queue.PriorityQueue(maxsize=max_queue_size)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._workers = []
+        self._retry_timers = set()
+        self._running = False
+
+    def start(self):
+        """Start the worker pool (safe to call more than once)"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f'notify-worker-{i + 1}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        print(f"[INFO] Notification dispatcher started with {self.num_workers} workers")
+
+    def stop(self, timeout=5):
+        """Stop the workers once the queue has drained"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            timers, self._retry_timers = self._retry_timers, set()
+        for timer in timers:
+            timer.cancel()
+        for _ in self._workers:
+            self._queue.put((float('inf'), next(self._sequence), None))
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def enqueue(self, caregivers, patient_name, request_type, patient_room, patient_bed, request_id=None):
+        """Queue a notification job and return its id without waiting for delivery"""
+        if not self._running:
+            self.start()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'request_id': request_id,
+            'patient_name': patient_name,
+            'request_type': request_type,
+            'room_number': patient_room,
+            'bed_number': patient_bed,
+            'caregivers_count': len(caregivers),
+            'status': STATUS_QUEUED,
+            'attempts': 0,
+            'next_attempt_at': None,
+            'error': None,
+            'queued_at': datetime.utcnow().isoformat(),
+            'sent_at': None,
+            'delivery_seconds': None,
+            'acknowledged': False,
+            'acknowledged_by': None,
+            'acknowledged_at': None
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+
+        payload = (caregivers, patient_name, request_type, patient_room, patient_bed)
+        self._put(job_id, payload)
+        return job_id
+
+    def _put(self, job_id, payload):
+        # Emergencies jump the queue ahead of routine requests
+        priority = 0 if payload[2] == EMERGENCY_REQUEST_TYPE else 1
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), (job_id, payload)))
+        except queue.Full:
+            self._update(job_id, status=STATUS_FAILED, error='Notification queue is full')
+            print(f"[ERROR] Notification queue full, dropped job {job_id}")
+
+    def ack(self, job_id, acknowledged_by=None):
+        """Mark a notification as acknowledged by staff; returns the job or None"""
+        return self._update(
+            job_id,
+            acknowledged=True,
+            acknowledged_by=acknowledged_by,
+            acknowledged_at=datetime.utcnow().isoformat()
+        )
+
+    def status(self, job_id):
+        """Get a copy of the current state of a job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def recent(self, limit=50):
+        """Get the most recent jobs, newest first"""
+        with self._lock:
+            jobs = list(self._jobs.values())[-limit:]
+        return [dict(job) for job in reversed(jobs)]
+
+    def stats(self):
+        """Queue depth and per-status job counts"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {
+            'queue_depth': self._queue.qsize(),
+            'workers': len(self._workers),
+            'jobs': counts
+        }
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            job = dict(job)
+        if self.on_update:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                print(f"[ERROR] Failed to publish notification job {job_id}: {e}")
+        return job
+
+    def _worker_loop(self):
+        while True:
+            _, _, item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                job_id, payload = item
+                self._deliver(job_id, payload)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, job_id, payload):
+        attempts = (self.status(job_id) or {}).get('attempts', 0) + 1
+        self._update(job_id, status=STATUS_SENDING, attempts=attempts, next_attempt_at=None)
+
+        start = time.time()
+        try:
+            success = self.send_function(*payload)
+            error = None if success else 'No notification channel succeeded'
+        except Exception as e:
+            success, error = False, str(e)
+            print(f"[ERROR] Notification job {job_id} failed: {e}")
+
+        if success:
+            self._update(job_id, status=STATUS_DELIVERED, error=None, sent_at=datetime.utcnow().isoformat(),
+                         delivery_seconds=round(time.time() - start, 3))
+            return
+
+        failure = {'error': error, 'delivery_seconds': round(time.time() - start, 3)}
+        job = self.status(job_id)
+        if job is not None and job['acknowledged']:
+            # Staff already responded; no point alerting again
+            self._update(job_id, status=STATUS_CANCELLED, **failure)
+        elif not self._schedule_retry(job_id, payload, attempts, **failure):
+            self._update(job_id, status=STATUS_FAILED, **failure)
+
+    def _schedule_retry(self, job_id, payload, attempts, **fields):
+        """Queue the job again after a backoff; False if it is out of attempts"""
+        max_attempts = self.emergency_max_attempts if payload[2] == EMERGENCY_REQUEST_TYPE else self.max_attempts
+        if attempts >= max_attempts or not self._running:
+            return False
+
+        delay = min(self.retry_backoff * 2 ** (attempts - 1), RETRY_BACKOFF_MAX)
+        if not self._update(job_id, status=STATUS_RETRYING, **fields,
+                            next_attempt_at=datetime.utcfromtimestamp(time.time() + delay).isoformat()):
+            return False
+
+        def retry():
+            with self._lock:
+                self._retry_timers.discard(timer)
+            job = self.status(job_id)
+            if job is not None and job['acknowledged']:
+                # Acknowledged while waiting: the alert is no longer needed
+                self._update(job_id, status=STATUS_CANCELLED, next_attempt_at=None)
+                return
+            self._put(job_id, payload)
+
+        timer = threading.Timer(delay, retry)
+        timer.daemon = True
+        with self._lock:
+            self._retry_timers.add(timer)
+        timer.start()
+        print(f"[WARNING] Notification job {job_id} attempt {attempts} failed, retrying in {delay:g}s")
+        return True
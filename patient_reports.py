@@ -0,0 +1,223 @@
+"""
+Printable patient reports
+Reports are rendered from templates/patient_report.html (styled by
+static/patient_report.css) through a Jinja environment compiled once per
+process, which also works outside a Flask app context. Rendered reports are
+kept in an LRU cache keyed on the patient's record, latest request activity
+and report window, so repeated prints during ward rounds skip the 30-day
+queries. The window starts at midnight UTC so it moves (and the cached report
+changes) once a day; the "Generated on" time is filled in on every view.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy import case, func
+
+from database import db, Patient, PatientRequest, get_patient_request_patterns
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
+STYLESHEET_PATH = os.path.join(BASE_DIR, 'static', 'patient_report.css')
+STYLESHEET_URL = '/static/patient_report.css'
+
+# Report period and size of the recent activity table
+REPORT_DAYS = 30
+RECENT_LIMIT = 20
+
+# Rendered reports kept in memory (per process)
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 256))
+
+REQUEST_TYPE_NAMES = {
+    1: 'Call Nurse',
+    2: 'Water Request',
+    3: 'Food Request',
+    4: 'Bathroom Assistance',
+    5: 'Emergency Alert'
+}
+
+# Stands in for the "Generated on" time in cached HTML; replaced on every view
+GENERATED_ON_MARK = '@@generated_on@@'
+
+_environment = None
+_stylesheet = None
+
+
+def get_environment():
+    """Jinja environment for report templates; templates compile on first use and stay cached"""
+    global _environment
+    if _environment is None:
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=select_autoescape(['html']),
+            auto_reload=False
+        )
+    return _environment
+
+
+def read_stylesheet():
+    """Report CSS, for self-contained (inlined) reports"""
+    global _stylesheet
+    if _stylesheet is None:
+        with open(STYLESHEET_PATH) as f:
+            _stylesheet = f.read()
+    return _stylesheet
+
+
+class ReportCache:
+    """Thread-safe LRU cache of rendered report HTML"""
+
+    def __init__(self, max_size=REPORT_CACHE_SIZE):
+        self.max_size = max_size
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._reports.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._reports.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key, html):
+        with self._lock:
+            self._reports[key] = html
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.max_size:
+                self._reports.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._reports.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._reports), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+report_cache = ReportCache()
+
+
+def report_window_start(days=REPORT_DAYS, now=None):
+    """Oldest request time covered by a report: midnight UTC, `days` days ago"""
+    now = now or datetime.utcnow()
+    return datetime.combine(now.date() - timedelta(days=days), datetime.min.time())
+
+
+def generated_on_now():
+    return datetime.now().strftime('%B %d, %Y at %I:%M %p')
+
+
+def patient_age(date_of_birth, today=None):
+    if not date_of_birth:
+        return 'N/A'
+    today = today or date.today()
+    return today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def patient_snapshot(patient):
+    """Plain dict of a patient's columns (safe to cache or send to another process)"""
+    return {column.name: getattr(patient, column.name) for column in Patient.__table__.columns}
+
+
+def request_snapshot(patient_request):
+    return {
+        'timestamp': patient_request.timestamp,
+        'request_type': patient_request.request_type,
+        'request_method': patient_request.request_method or '',
+        'status': patient_request.status or ''
+    }
+
+
+def build_report(patient, requests, patterns, days=REPORT_DAYS, generated_on=None):
+    """
+    Template data for one report. `patient` and `requests` (newest first) may be
+    ORM objects or snapshots from patient_snapshot()/request_snapshot().
+    """
+    if not isinstance(patient, dict):
+        patient = patient_snapshot(patient)
+    recent = [r if isinstance(r, dict) else request_snapshot(r) for r in requests[:RECENT_LIMIT]]
+    stats = patterns.get('response_time_stats') or {}
+    request_types = patterns.get('request_types', {})
+
+    return {
+        'patient': patient,
+        'age': patient_age(patient.get('date_of_birth')),
+        'generated_on': generated_on or generated_on_now(),
+        'days': days,
+        'total_requests': patterns.get('total_requests', 0),
+        'emergency_requests': request_types.get(5, 0),
+        'avg_response_time': round(stats['mean'], 1) if stats.get('count') else 0,
+        'request_summary': [
+            f"{REQUEST_TYPE_NAMES.get(req_type, 'Unknown')}: {count} times"
+            for req_type, count in request_types.items()
+        ],
+        'recent_requests': recent,
+        'recent_limit': RECENT_LIMIT,
+        'request_types': REQUEST_TYPE_NAMES,
+        'communication_methods': json.loads(patient['communication_methods']) if patient.get('communication_methods') else []
+    }
+
+
+def render_report(report, stylesheet_url=STYLESHEET_URL, inline_css=None):
+    return get_environment().get_template('patient_report.html').render(
+        report=report, stylesheet_url=stylesheet_url, inline_css=inline_css
+    )
+
+
+def render_report_body(report):
+    """One report's markup without the page shell (ward reports concatenate these)"""
+    return get_environment().get_template('patient_report_body.html').render(report=report)
+
+
+def render_standalone_report(report):
+    """A full report page with the stylesheet inlined, for saving as a file"""
+    return render_report(report, inline_css=read_stylesheet())
+
+
+def report_cache_key(patient, days=REPORT_DAYS, since=None):
+    """
+    Changes whenever the report would: the patient record is edited, a request is
+    made, answered or completed, the window moves on (old requests age out) or
+    the day rolls over (age).
+    """
+    since = since or report_window_start(days)
+    last_id, last_response, completed = db.session.query(
+        func.max(PatientRequest.id),
+        func.max(PatientRequest.response_time),
+        func.sum(case((PatientRequest.status == 'completed', 1), else_=0))
+    ).filter(
+        PatientRequest.patient_id == patient.patient_id,
+        PatientRequest.timestamp >= since
+    ).one()
+    return (patient.patient_id, patient.updated_at, last_id, last_response, completed or 0, since, date.today(), days)
+
+
+def get_patient_report(patient_id, stylesheet_url=STYLESHEET_URL, days=REPORT_DAYS):
+    """Rendered report HTML for a patient (from the cache when nothing changed), or None"""
+    patient = Patient.query.filter_by(patient_id=patient_id).first()
+    if not patient:
+        return None
+
+    since = report_window_start(days)
+    key = report_cache_key(patient, days, since) + (stylesheet_url,)
+    html = report_cache.get(key)
+    if html is None:
+        requests = PatientRequest.query.filter(
+            PatientRequest.patient_id == patient_id,
+            PatientRequest.timestamp >= since
+        ).order_by(PatientRequest.timestamp.desc()).limit(RECENT_LIMIT).all()
+        patterns = get_patient_request_patterns(patient_id, days, since=since)
+
+        report = build_report(patient, requests, patterns, days, generated_on=GENERATED_ON_MARK)
+        html = render_report(report, stylesheet_url)
+        report_cache.put(key, html)
+    return html.replace(GENERATED_ON_MARK, generated_on_now(), 1)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Ward Report Script
+Generates the printable report for every active patient in a department (or
+the whole hospital) in one pass, for shift handover.
+
+Usage:
+    python print_ward_reports.py --department ICU                 # ward_reports_ICU_<date>.html
+    python print_ward_reports.py --department ICU --format zip    # one file per patient
+    python print_ward_reports.py --output handover.html --workers 8
+
+Connects to DATABASE_URL directly instead of importing app.py, so rendering
+workers (which re-import this script) never start the web app.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+from flask import Flask
+
+from database import db
+from ward_reports import generate_ward_report, ward_report_filename, OUTPUT_FORMATS
+
+
+def create_app():
+    """Database-only Flask app for the report queries"""
+    load_dotenv()
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///bedsidebot.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate reports for every active patient in a ward')
+    parser.add_argument('--department', default=None, help='department to report on (default: all)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='html',
+                        help='one paginated HTML file, or a zip of per-patient reports')
+    parser.add_argument('--days', type=int, default=30, help='report period in days')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='rendering processes (default: render in this process)')
+    parser.add_argument('--output', default=None, help='output file (default: ward_reports_<department>_<date>.<format>)')
+    args = parser.parse_args()
+
+    output = args.output or ward_report_filename(args.department, args.format)
+
+    started = time.time()
+    app = create_app()
+    with app.app_context():
+        # Files are opened from disk, so the stylesheet is inlined
+        body, count = generate_ward_report(args.department, args.format, args.days, args.workers, inline_css=True)
+
+    with open(output, 'wb') as f:
+        f.write(body if isinstance(body, bytes) else body.encode('utf-8'))
+
+    elapsed = time.time() - started
+    print(f"[OK] {count} patient reports written to {output} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
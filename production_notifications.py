@@ -6,132 +6,115 @@ import requests
 import json
 from datetime import datetime
 import urllib.parse
+from notification_fanout import delivery, fan_out, count_successes, send_timeout
+from provider_health import endpoint_name, provider_registry, response_ok, RecipientError
+
+TEXTBELT_URL = "https://textbelt.com/text"
+FORMSPREE_URL = "https://formspree.io/f/xpzvgqjr"  # Replace with your Formspree form ID
+NETLIFY_URL = "https://bedsidebot.netlify.app/"  # Your Netlify site
+CALLMEBOT_URL = "https://api.callmebot.com/whatsapp.php"
+TELEGRAM_URL = "https://api.telegram.org"
+
+# Senders run through provider_registry.call: transport errors propagate to it and
+# count against the endpoint's breaker, refusals for one recipient (RecipientError) don't
 
 def send_sms_textbelt(phone, message):
     """Send SMS using TextBelt (free service - 1 SMS per day per number)"""
-    try:
-        clean_phone = phone.replace('+', '').replace('-', '').replace(' ', '')
-        
-        url = "https://textbelt.com/text"
-        data = {
-            'phone': clean_phone,
-            'message': message[:160],
-            'key': 'textbelt'
-        }
-        
-        response = requests.post(url, data=data, timeout=15)
-        result = response.json()
-        
-        if result.get('success'):
-            print(f"✅ SMS sent to {phone}")
-            return True
-        else:
-            print(f"SMS failed: {result.get('error', 'Unknown error')}")
-            return False
-            
-    except Exception as e:
-        print(f"SMS error: {e}")
+    clean_phone = phone.replace('+', '').replace('-', '').replace(' ', '')
+    
+    data = {
+        'phone': clean_phone,
+        'message': message[:160],
+        'key': 'textbelt'
+    }
+    
+    response = requests.post(TEXTBELT_URL, data=data, timeout=send_timeout(15))
+    if not response_ok(response):
         return False
+    result = response.json()
+    
+    if result.get('success'):
+        print(f"✅ SMS sent to {phone}")
+        return True
+    # Quota used up for this number, invalid number, ... - TextBelt itself is fine
+    raise RecipientError(result.get('error', 'Unknown error'))
 
 def send_email_formspree(to_email, subject, message):
     """Send email using Formspree (free service - 50 emails/month)"""
-    try:
-        # Formspree endpoint (free tier)
-        url = "https://formspree.io/f/xpzvgqjr"  # Replace with your Formspree form ID
-        
-        data = {
-            'email': to_email,
-            'subject': subject,
-            'message': message,
-            '_replyto': to_email,
-            '_subject': subject
-        }
-        
-        response = requests.post(url, data=data, timeout=15)
-        
-        if response.status_code == 200:
-            print(f"✅ Email sent to {to_email}")
-            return True
-        else:
-            print(f"Email failed: {response.status_code}")
-            return False
-            
-    except Exception as e:
-        print(f"Email error: {e}")
-        return False
+    data = {
+        'email': to_email,
+        'subject': subject,
+        'message': message,
+        '_replyto': to_email,
+        '_subject': subject
+    }
+    
+    response = requests.post(FORMSPREE_URL, data=data, timeout=send_timeout(15))
+    
+    if response_ok(response):
+        print(f"✅ Email sent to {to_email}")
+        return True
+    print(f"Email failed: {response.status_code}")
+    return False
 
 def send_email_netlify(to_email, subject, message):
     """Send email using Netlify Forms (free service)"""
-    try:
-        # Netlify form endpoint
-        url = "https://bedsidebot.netlify.app/"  # Your Netlify site
-        
-        data = {
-            'form-name': 'contact',
-            'email': to_email,
-            'subject': subject,
-            'message': message
-        }
-        
-        response = requests.post(url, data=data, timeout=15)
-        
-        if response.status_code == 200:
-            print(f"✅ Email sent via Netlify to {to_email}")
-            return True
-        else:
-            return False
-            
-    except Exception as e:
-        print(f"Netlify email error: {e}")
-        return False
+    data = {
+        'form-name': 'contact',
+        'email': to_email,
+        'subject': subject,
+        'message': message
+    }
+    
+    response = requests.post(NETLIFY_URL, data=data, timeout=send_timeout(15))
+    
+    if response_ok(response):
+        print(f"✅ Email sent via Netlify to {to_email}")
+        return True
+    return False
 
 def send_whatsapp_callmebot(phone, message):
     """Send WhatsApp using CallMeBot (free service)"""
-    try:
-        # CallMeBot WhatsApp API
-        clean_phone = phone.replace('+', '')
-        encoded_message = urllib.parse.quote(message)
-        
-        # Note: User needs to add bot first, but we can try anyway
-        url = f"https://api.callmebot.com/whatsapp.php?phone={clean_phone}&text={encoded_message}&apikey=123456"
-        
-        response = requests.get(url, timeout=15)
-        
-        if response.status_code == 200:
-            print(f"✅ WhatsApp sent to {phone}")
-            return True
-        else:
-            return False
-            
-    except Exception as e:
-        print(f"WhatsApp error: {e}")
-        return False
+    clean_phone = phone.replace('+', '')
+    encoded_message = urllib.parse.quote(message)
+    
+    # Note: User needs to add bot first, but we can try anyway
+    url = f"{CALLMEBOT_URL}?phone={clean_phone}&text={encoded_message}&apikey=123456"
+    
+    response = requests.get(url, timeout=send_timeout(15))
+    
+    if response_ok(response):
+        print(f"✅ WhatsApp sent to {phone}")
+        return True
+    return False
 
 def send_telegram_notification(message):
     """Send Telegram notification (if bot is set up)"""
-    try:
-        bot_token = "your_bot_token"
-        chat_id = "your_chat_id"
-        
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': message
-        }
-        
-        response = requests.post(url, data=data, timeout=15)
-        
-        if response.status_code == 200:
-            print("✅ Telegram notification sent")
-            return True
-        else:
-            return False
-            
-    except Exception as e:
-        print(f"Telegram error: {e}")
-        return False
+    bot_token = "your_bot_token"
+    chat_id = "your_chat_id"
+    
+    url = f"{TELEGRAM_URL}/bot{bot_token}/sendMessage"
+    data = {
+        'chat_id': chat_id,
+        'text': message
+    }
+    
+    response = requests.post(url, data=data, timeout=send_timeout(15))
+    
+    if response_ok(response):
+        print("✅ Telegram notification sent")
+        return True
+    return False
+
+def send_email_with_fallback(to_email, subject, message):
+    """Send email via the healthiest of Formspree and Netlify Forms"""
+    providers = [
+        (endpoint_name(FORMSPREE_URL), send_email_formspree),
+        (endpoint_name(NETLIFY_URL, 'contact'), send_email_netlify)
+    ]
+    return provider_registry.first_success(providers, to_email, subject, message) is not None
 
-def notify_caregivers_production(caregivers, patient_name, request_type, patient_room, patient_bed):
+def notify_caregivers_production(caregivers, patient_name, request_type, patient_room, patient_bed, deadline=None):
     """
     Production notification system
     Works for ANY caregiver - they just enter phone/email and receive notifications
@@ -169,8 +152,6 @@ BedsideBot System
 Automated Patient Care
     """
     
-    total_notifications = 0
-    
     print(f"\n{'='*70}")
     print(f"🚨 PATIENT ALERT SYSTEM ACTIVATED")
     print(f"Patient: {patient_name}")
@@ -179,6 +160,8 @@ Automated Patient Care
     print(f"Time: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*70}")
     
+    # Build every caregiver/channel send, then deliver them all at once
+    deliveries = []
     for i, caregiver in enumerate(caregivers, 1):
         caregiver_name = caregiver.get('fullName', f'Caregiver {i}')
         caregiver_phone = caregiver.get('primaryPhone', '')
@@ -190,50 +173,35 @@ Automated Patient Care
         print(f"    📧 Email: {caregiver_email}")
         print(f"    📋 Method: {contact_method}")
         
-        # Send SMS
+        # Send SMS, with WhatsApp as a parallel backup
         if contact_method in ['sms', 'both'] and caregiver_phone:
-            print(f"    📱 Sending SMS...")
-            if send_sms_textbelt(caregiver_phone, sms_message):
-                total_notifications += 1
-            
-            # Try WhatsApp as backup
-            print(f"    💬 Trying WhatsApp...")
-            if send_whatsapp_callmebot(caregiver_phone, sms_message):
-                total_notifications += 1
+            deliveries.append(delivery(caregiver_name, 'sms', provider_registry.call, endpoint_name(TEXTBELT_URL), send_sms_textbelt, caregiver_phone, sms_message))
+            deliveries.append(delivery(caregiver_name, 'whatsapp', provider_registry.call, endpoint_name(CALLMEBOT_URL), send_whatsapp_callmebot, caregiver_phone, sms_message))
         
-        # Send Email
+        # Send Email (Formspree or Netlify, healthiest first)
         if contact_method in ['email', 'both'] and caregiver_email:
-            print(f"    📧 Sending Email...")
-            
-            # Try multiple email services
-            email_sent = False
-            
-            if send_email_formspree(caregiver_email, email_subject, email_message):
-                total_notifications += 1
-                email_sent = True
-            
-            if not email_sent and send_email_netlify(caregiver_email, email_subject, email_message):
-                total_notifications += 1
-                email_sent = True
-        
-        print(f"    ✅ Caregiver {caregiver_name} notified")
+            deliveries.append(delivery(caregiver_name, 'email', send_email_with_fallback, caregiver_email, email_subject, email_message))
     
     # Send backup Telegram notification
     telegram_message = f"🚨 BedsideBot Alert: {patient_name} needs {request_name} in Room {patient_room}, Bed {patient_bed}"
-    send_telegram_notification(telegram_message)
+    deliveries.append(delivery('telegram', 'telegram', provider_registry.call, endpoint_name(TELEGRAM_URL, 'sendMessage'), send_telegram_notification, telegram_message))
+    
+    results = fan_out(deliveries, deadline)
+    total_notifications = count_successes([r for r in results if r['channel'] != 'telegram'])
     
     print(f"\n📊 NOTIFICATION SUMMARY")
     print(f"    Caregivers: {len(caregivers)}")
     print(f"    Notifications sent: {total_notifications}")
-    print(f"    Success rate: {(total_notifications/(len(caregivers)*2)*100):.1f}%")
+    if caregivers:
+        print(f"    Success rate: {(total_notifications/(len(caregivers)*2)*100):.1f}%")
     print(f"{'='*70}\n")
     
     # Log the notification
-    log_notification_attempt(caregivers, patient_name, request_name, total_notifications)
+    log_notification_attempt(caregivers, patient_name, request_name, total_notifications, results)
     
     return total_notifications > 0
 
-def log_notification_attempt(caregivers, patient_name, request_name, sent_count):
+def log_notification_attempt(caregivers, patient_name, request_name, sent_count, results=None):
     """Log notification attempts for tracking"""
     
     log_entry = {
@@ -249,7 +217,8 @@ def log_notification_attempt(caregivers, patient_name, request_name, sent_count)
                 'email': cg.get('email')
             }
             for cg in caregivers
-        ]
+        ],
+        'deliveries': results or []
     }
     
     try:
@@ -0,0 +1,228 @@
+"""
+Notification provider health tracking
+Circuit breakers plus rolling success/latency stats per SMS/email provider
+endpoint, so fallback chains try healthy providers first and skip dead ones
+outright. Only provider failures (transport errors, 5xx responses) count
+against a breaker: a provider that answers but refuses one recipient (invalid
+number, per-number quota, a 4xx) raises RecipientError and stays healthy.
+"""
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from notification_fanout import time_left
+
+STATE_CLOSED = 'closed'        # Healthy - calls go through
+STATE_OPEN = 'open'            # Failing - calls are skipped
+STATE_HALF_OPEN = 'half_open'  # Cooling off - one trial call allowed
+
+# Consecutive failures before a provider's breaker opens
+FAILURE_THRESHOLD = 3
+
+# Seconds a breaker stays open before a trial call; doubles on each failed trial
+RESET_TIMEOUT = 60
+MAX_RESET_TIMEOUT = 900
+
+# Number of recent calls kept for success rate and latency
+WINDOW_SIZE = 50
+
+
+class RecipientError(Exception):
+    """The provider answered but refused this recipient or message"""
+
+
+def response_ok(response):
+    """True for a 2xx response; RecipientError for a 4xx; False for anything else (provider failure)"""
+    if 400 <= response.status_code < 500:
+        raise RecipientError(f"HTTP {response.status_code}")
+    return 200 <= response.status_code < 300
+
+
+def endpoint_name(url, *qualifiers):
+    """
+    Breaker name for one provider endpoint: the URL's host and path, plus
+    whatever else picks the account behind it (e.g. an EmailJS service). Senders
+    posting to the same endpoint share a breaker; different endpoints never do.
+    """
+    parts = urlsplit(url)
+    return '#'.join([parts.netloc + parts.path.rstrip('/')] + [str(q) for q in qualifiers])
+
+
+class CircuitBreaker:
+    """Circuit breaker with rolling stats for a single provider"""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT, window_size=WINDOW_SIZE):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0
+        self.trial_in_flight = False
+        self.outcomes = deque(maxlen=window_size)  # (success, latency_seconds)
+        self.total_calls = 0
+        self.skipped_calls = 0
+        self.refused_calls = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """Whether a call should be attempted right now"""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = STATE_HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == STATE_HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.skipped_calls += 1
+            return False
+
+    def record(self, success, latency):
+        """Record the outcome of a call"""
+        with self._lock:
+            self.total_calls += 1
+            self.outcomes.append((success, latency))
+
+            if success:
+                self.state = STATE_CLOSED
+                self.consecutive_failures = 0
+                self.reset_timeout = self.base_reset_timeout
+                self.trial_in_flight = False
+                return
+
+            self.consecutive_failures += 1
+            if self.state == STATE_HALF_OPEN:
+                # Trial failed - back off further before the next one
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def abandon(self):
+        """Forget a call that ended without an outcome (e.g. cut off by a deadline)"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_refused(self, latency):
+        """Record a call the provider answered but refused for this recipient (not a provider failure)"""
+        self.record(True, latency)
+        with self._lock:
+            self.refused_calls += 1
+
+    def _open(self):
+        if self.state != STATE_OPEN:
+            print(f"[WARNING] Provider {self.name} circuit opened for {self.reset_timeout}s")
+        self.state = STATE_OPEN
+        self.opened_at = time.time()
+        self.trial_in_flight = False
+
+    def success_rate(self):
+        if not self.outcomes:
+            return None
+        return sum(1 for success, _ in self.outcomes if success) / len(self.outcomes)
+
+    def avg_latency(self):
+        if not self.outcomes:
+            return None
+        return sum(latency for _, latency in self.outcomes) / len(self.outcomes)
+
+    def health_score(self):
+        """0-1 score: success rate discounted by latency; untried providers score 0.5"""
+        rate = self.success_rate()
+        if rate is None:
+            return 0.5
+        return rate / (1 + self.avg_latency() / 10)
+
+    def stats(self):
+        rate = self.success_rate()
+        latency = self.avg_latency()
+        return {
+            'provider': self.name,
+            'state': self.state,
+            'health_score': round(self.health_score(), 3),
+            'success_rate': round(rate, 3) if rate is not None else None,
+            'avg_latency_seconds': round(latency, 3) if latency is not None else None,
+            'consecutive_failures': self.consecutive_failures,
+            'total_calls': self.total_calls,
+            'skipped_calls': self.skipped_calls,
+            'refused_calls': self.refused_calls
+        }
+
+
+class ProviderRegistry:
+    """Registry of circuit breakers keyed by provider name"""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, **self.breaker_options)
+                self._breakers[name] = breaker
+            return breaker
+
+    def ordered(self, names):
+        """Order providers by health, open breakers last (ties keep the given order)"""
+        breakers = [self.get(name) for name in names]
+        ranked = sorted(
+            enumerate(breakers),
+            key=lambda item: (item[1].state == STATE_OPEN, -item[1].health_score(), item[0])
+        )
+        return [breaker.name for _, breaker in ranked]
+
+    def call(self, name, send, *args):
+        """Call send(*args) through the provider's breaker; False if skipped, refused or failed"""
+        remaining = time_left()
+        if remaining is not None and remaining <= 0:
+            return False  # The alert's deadline has passed; not the provider's fault
+        breaker = self.get(name)
+        if not breaker.allow_request():
+            return False
+
+        start = time.time()
+        try:
+            success = bool(send(*args))
+        except RecipientError as e:
+            print(f"{name} refused: {e}")
+            breaker.record_refused(time.time() - start)
+            return False
+        except Exception as e:
+            print(f"{name} error: {e}")
+            success = False
+        remaining = time_left()
+        if not success and remaining is not None and remaining <= 0:
+            # Cut short by the alert's deadline, which says nothing about the provider
+            breaker.abandon()
+            return False
+        breaker.record(success, time.time() - start)
+        return success
+
+    def first_success(self, providers, *args):
+        """
+        Try (name, send) providers healthiest first until one succeeds.
+        Returns the name of the provider that succeeded, or None.
+        """
+        sends = dict(providers)
+        for name in self.ordered([name for name, _ in providers]):
+            if self.call(name, sends[name], *args):
+                return name
+        return None
+
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.stats() for breaker in breakers]
+
+
+# Shared registry so every notification module sees the same provider health
+provider_registry = ProviderRegistry()
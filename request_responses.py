@@ -0,0 +1,95 @@
+"""
+Request acknowledgement
+Nurses acknowledge and complete patient requests from the ICU dashboard. Each
+state change is a single UPDATE over all the requested ids, guarded on the
+previous status so a request is never answered twice. The rows it changes
+update the rollups and response-time sketches in the same transaction, one
+UPDATE per affected hour, day and sketch rather than per request.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from database import db, PatientRequest
+from rollups import record_request_responses
+
+# Target status -> statuses a request can move to it from
+TRANSITIONS = {
+    'acknowledged': ('pending',),
+    'completed': ('pending', 'acknowledged')
+}
+
+# Largest batch accepted by the bulk endpoint
+MAX_BULK_REQUESTS = 500
+
+RETURNED_COLUMNS = (
+    PatientRequest.id,
+    PatientRequest.patient_id,
+    PatientRequest.request_type,
+    PatientRequest.timestamp,
+    PatientRequest.status,
+    PatientRequest.response_time,
+    PatientRequest.responded_by
+)
+
+
+def _update_returning(request_ids, previous_status, values):
+    """UPDATE the requests still in previous_status; returns the changed rows"""
+    guard = (PatientRequest.id.in_(request_ids), PatientRequest.status == previous_status)
+    statement = update(PatientRequest).where(*guard).values(**values)
+
+    if db.engine.dialect.update_returning:
+        return db.session.execute(statement.returning(*RETURNED_COLUMNS)).all()
+
+    # No UPDATE ... RETURNING (SQLite < 3.35): lock the rows, then update exactly those
+    ids = db.session.execute(select(PatientRequest.id).where(*guard).with_for_update()).scalars().all()
+    if not ids:
+        return []
+    db.session.execute(update(PatientRequest).where(PatientRequest.id.in_(ids)).values(**values))
+    return db.session.execute(select(*RETURNED_COLUMNS).where(PatientRequest.id.in_(ids))).all()
+
+
+def respond_to_requests(request_ids, status, responded_by=None, notes=None):
+    """
+    Move requests to 'acknowledged' or 'completed', stamping response_time and
+    responded_by when a pending request is first answered. Returns the updated
+    requests as dicts; ids already in (or past) that status are left alone.
+    """
+    if status not in TRANSITIONS:
+        raise ValueError(f"Unknown status: {status}")
+
+    now = datetime.utcnow()
+    updated = []
+    changes = []
+    try:
+        for previous_status in TRANSITIONS[status]:
+            values = {'status': status}
+            if previous_status == 'pending':
+                values.update(response_time=now, responded_by=responded_by)
+            elif responded_by:
+                values['responded_by'] = db.func.coalesce(PatientRequest.responded_by, responded_by)
+            if notes:
+                values['response_notes'] = notes
+
+            for row in _update_returning(request_ids, previous_status, values):
+                # Acknowledged requests already have their response time counted
+                previous_response_time = None if previous_status == 'pending' else row.response_time
+                changes.append((row, previous_status, previous_response_time))
+                updated.append(row)
+
+        record_request_responses(changes)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return [{
+        'id': row.id,
+        'patient_id': row.patient_id,
+        'request_type': row.request_type,
+        'status': row.status,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'response_time': row.response_time.isoformat() if row.response_time else None,
+        'response_minutes': round((row.response_time - row.timestamp).total_seconds() / 60, 2) if row.response_time and row.timestamp else None,
+        'responded_by': row.responded_by
+    } for row in updated]
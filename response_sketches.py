@@ -0,0 +1,206 @@
+"""
+Response-time quantile sketches
+A DDSketch-style sketch keeps response times in logarithmic buckets, so any
+quantile is accurate to within RELATIVE_ACCURACY of the true value using a few
+hundred counters, and two sketches merge by adding their buckets. One sketch
+is kept per hospital-local day for the whole hospital and for each patient,
+department and shift. p50/p90/p99 for any period is a merge of a handful of
+rows instead of a scan over patient_requests.
+"""
+import json
+import math
+from datetime import timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from database import db, Patient, ResponseTimeSketch
+from time_windows import local_today, shift_for, to_local
+
+# Quantiles are within 1% of the true value
+RELATIVE_ACCURACY = 0.01
+
+# Response times (minutes) at or below this are counted as zero
+MIN_TRACKED_VALUE = 1e-3
+
+SCOPES = ('all', 'patient', 'department', 'shift')
+
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+
+class DDSketch:
+    """Mergeable relative-error quantile sketch over non-negative values"""
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index):
+        """Representative value of a bucket (relative error <= relative_accuracy)"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        value = max(float(value), 0.0)
+        if value <= MIN_TRACKED_VALUE:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self):
+        """count/mean/p50/p90/p99 in minutes"""
+        summary = {'count': self.count, 'mean': round(self.mean, 2) if self.count else None}
+        for name, q in QUANTILES.items():
+            value = self.quantile(q)
+            summary[name] = round(value, 2) if value is not None else None
+        return summary
+
+    def to_json(self):
+        return json.dumps({
+            'relative_accuracy': self.relative_accuracy,
+            'bins': {str(index): count for index, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'min': self.min,
+            'max': self.max
+        })
+
+    @classmethod
+    def from_row(cls, row):
+        data = json.loads(row.sketch)
+        sketch = cls(data.get('relative_accuracy', RELATIVE_ACCURACY))
+        sketch.bins = {int(index): count for index, count in data.get('bins', {}).items()}
+        sketch.zero_count = data.get('zero_count', 0)
+        sketch.min = data.get('min')
+        sketch.max = data.get('max')
+        sketch.count = row.count or 0
+        sketch.total = row.total or 0.0
+        return sketch
+
+
+def sketch_keys(patient_id, department, timestamp):
+    """(scope, scope_key) pairs a request's response time is recorded under"""
+    return [
+        ('all', 'all'),
+        ('patient', patient_id or 'UNKNOWN'),
+        ('department', department or 'unknown'),
+        ('shift', shift_for(timestamp) or 'unknown')
+    ]
+
+
+def _save(scope, scope_key, day, sketch):
+    """Merge `sketch` into the stored row for (scope, scope_key, day)"""
+    row = ResponseTimeSketch.query.filter_by(
+        scope=scope, scope_key=scope_key, date=day
+    ).with_for_update().first()
+    if row is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(ResponseTimeSketch(
+                    scope=scope, scope_key=scope_key, date=day,
+                    count=sketch.count, total=sketch.total, sketch=sketch.to_json()
+                ))
+            return
+        except IntegrityError:
+            # Another worker created the row first
+            row = ResponseTimeSketch.query.filter_by(
+                scope=scope, scope_key=scope_key, date=day
+            ).with_for_update().first()
+    merged = DDSketch.from_row(row).merge(sketch)
+    row.count, row.total, row.sketch = merged.count, merged.total, merged.to_json()
+
+
+def record_response(patient_request, minutes):
+    """Add one answered request's response time to its day's sketches (caller commits)"""
+    patient = Patient.query.filter_by(patient_id=patient_request.patient_id).first()
+    day = to_local(patient_request.timestamp).date()
+    for scope, scope_key in sketch_keys(patient_request.patient_id, patient.department if patient else None,
+                                        patient_request.timestamp):
+        sketch = DDSketch()
+        sketch.add(minutes)
+        _save(scope, scope_key, day, sketch)
+
+
+def record_responses(responses):
+    """
+    Add a batch of (patient_id, timestamp, minutes) response times, merging them
+    per sketch first so each stored row is read and written once (caller commits)
+    """
+    patient_ids = {patient_id for patient_id, _, _ in responses}
+    departments = dict(db.session.query(Patient.patient_id, Patient.department).filter(
+        Patient.patient_id.in_(patient_ids)
+    ).all())
+
+    sketches = {}
+    for patient_id, timestamp, minutes in responses:
+        day = to_local(timestamp).date()
+        for scope, scope_key in sketch_keys(patient_id, departments.get(patient_id), timestamp):
+            sketches.setdefault((scope, scope_key, day), DDSketch()).add(minutes)
+
+    for (scope, scope_key, day), sketch in sketches.items():
+        _save(scope, scope_key, day, sketch)
+
+
+def sketch_rows(scope='all', scope_key='all', days=7):
+    """Stored daily sketches for the last `days` local days, oldest first"""
+    today = local_today()
+    return ResponseTimeSketch.query.filter(
+        ResponseTimeSketch.scope == scope,
+        ResponseTimeSketch.scope_key == scope_key,
+        ResponseTimeSketch.date >= today - timedelta(days=days - 1),
+        ResponseTimeSketch.date <= today
+    ).order_by(ResponseTimeSketch.date).all()
+
+
+def merged_sketch(rows):
+    sketch = DDSketch()
+    for row in rows:
+        sketch.merge(DDSketch.from_row(row))
+    return sketch
+
+
+def response_time_summary(scope='all', scope_key='all', days=7):
+    """count/mean/p50/p90/p99 over the last `days` days, merged from daily sketches"""
+    return merged_sketch(sketch_rows(scope, scope_key, days)).summary()
@@ -0,0 +1,254 @@
+"""
+Incremental request rollups
+Keeps hourly (HourlyRequestRollup, UTC hour buckets) and daily (SystemAnalytics,
+hospital-local days) aggregates, plus the response-time sketches, up to date as
+requests are created and answered, so dashboards and trends read a handful of
+pre-aggregated rows instead of counting patient_requests. Rows for requests
+recorded before rollups existed are built by a startup migration
+(migrations.py); backfill_rollups.py rebuilds them by hand for repairs.
+"""
+from datetime import timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from database import db, Patient, PatientRequest, ResponseTimeSketch, SystemAnalytics, HourlyRequestRollup
+from response_sketches import DDSketch, record_response, record_responses, sketch_keys
+from time_windows import day_window, local_today, to_local
+
+# Counter column per request type / request method
+REQUEST_TYPE_COLUMNS = {
+    1: 'nurse_requests',
+    2: 'water_requests',
+    3: 'food_requests',
+    4: 'bathroom_requests',
+    5: 'emergency_requests'
+}
+METHOD_COLUMNS = {
+    'gesture': 'gesture_recognition_usage',
+    'voice': 'voice_recognition_usage'
+}
+
+COUNTER_COLUMNS = (
+    ['total_requests', 'requests_completed', 'requests_pending', 'response_count', 'response_time_total']
+    + list(REQUEST_TYPE_COLUMNS.values()) + list(METHOD_COLUMNS.values())
+)
+
+
+def hour_bucket(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_date(timestamp, tz=None):
+    """Hospital-local date a stored (naive UTC) timestamp is rolled up under"""
+    return to_local(timestamp, tz).date()
+
+
+def response_minutes(patient_request):
+    if not patient_request.response_time or not patient_request.timestamp:
+        return None
+    return (patient_request.response_time - patient_request.timestamp).total_seconds() / 60
+
+
+def created_deltas(patient_request):
+    """Counter increments for a newly recorded request"""
+    deltas = {'total_requests': 1}
+    type_column = REQUEST_TYPE_COLUMNS.get(patient_request.request_type)
+    if type_column:
+        deltas[type_column] = 1
+    method_column = METHOD_COLUMNS.get(patient_request.request_method)
+    if method_column:
+        deltas[method_column] = 1
+    status = patient_request.status or 'pending'
+    if status == 'pending':
+        deltas['requests_pending'] = 1
+    elif status == 'completed':
+        deltas['requests_completed'] = 1
+    minutes = response_minutes(patient_request)
+    if minutes is not None:
+        deltas['response_count'] = 1
+        deltas['response_time_total'] = minutes
+    return deltas
+
+
+def _rollup_rows(timestamp):
+    """(model, key) for every rollup row a request timestamp contributes to"""
+    return [
+        (HourlyRequestRollup, {'bucket_start': hour_bucket(timestamp)}),
+        (SystemAnalytics, {'date': rollup_date(timestamp)})
+    ]
+
+
+def _bump(model, key, deltas, create=True):
+    """
+    Atomically add deltas to one rollup row (UPDATE col = col + n), creating it
+    if needed; the average response time is recomputed in the same statement
+    """
+    values = {
+        getattr(model, name): db.func.coalesce(getattr(model, name), 0) + delta
+        for name, delta in deltas.items()
+    }
+    if deltas.get('response_count'):
+        values[model.avg_response_time] = values[model.response_time_total] / values[model.response_count]
+    if model.query.filter_by(**key).update(values, synchronize_session=False):
+        return True
+    if not create:
+        return False
+    row = dict(deltas)
+    if deltas.get('response_count'):
+        row['avg_response_time'] = deltas['response_time_total'] / deltas['response_count']
+    try:
+        with db.session.begin_nested():
+            db.session.add(model(**key, **row))
+    except IntegrityError:
+        # Another worker created the row first
+        model.query.filter_by(**key).update(values, synchronize_session=False)
+    return True
+
+
+def _apply(timestamp, deltas, create=True):
+    for model, key in _rollup_rows(timestamp):
+        _bump(model, key, deltas, create)
+
+
+def record_request_created(patient_request):
+    """
+    Count a new request in its hour and day. Call before committing the request
+    so both land in the same transaction; failures are logged, never raised.
+    """
+    try:
+        with db.session.begin_nested():
+            deltas = created_deltas(patient_request)
+            _apply(patient_request.timestamp, deltas)
+            if 'response_time_total' in deltas:
+                record_response(patient_request, deltas['response_time_total'])
+    except Exception as e:
+        print(f"[ERROR] Failed to update request rollups: {e}")
+
+
+def response_deltas(patient_request, previous_status, previous_response_time=None):
+    """Counter changes for a request moving out of previous_status"""
+    deltas = {}
+    status = patient_request.status
+    if previous_status in (None, 'pending') and status != 'pending':
+        deltas['requests_pending'] = -1
+    if status == 'completed' and previous_status != 'completed':
+        deltas['requests_completed'] = 1
+    if previous_response_time is None:
+        minutes = response_minutes(patient_request)
+        if minutes is not None:
+            deltas['response_count'] = 1
+            deltas['response_time_total'] = minutes
+    return deltas
+
+
+def record_request_response(patient_request, previous_status, previous_response_time=None):
+    """
+    Move a request between the pending/completed counters and add its response
+    time (to the counters and the response-time sketches) once it has been
+    answered. Rows are credited to the hour/day the request was made. Call after
+    updating the request and before committing.
+    """
+    record_request_responses([(patient_request, previous_status, previous_response_time)])
+
+
+def record_request_responses(changes):
+    """
+    record_request_response for a batch of (request, previous_status,
+    previous_response_time): deltas are summed per hour and day row, and
+    response times per sketch, so each row is updated once however many of the
+    requests fall in it.
+    """
+    totals = {}
+    responses = []
+    for patient_request, previous_status, previous_response_time in changes:
+        deltas = response_deltas(patient_request, previous_status, previous_response_time)
+        for model, key in _rollup_rows(patient_request.timestamp):
+            summed = totals.setdefault((model, tuple(key.items())), {})
+            for name, delta in deltas.items():
+                summed[name] = summed.get(name, 0) + delta
+        if 'response_time_total' in deltas:
+            responses.append((patient_request.patient_id, patient_request.timestamp, deltas['response_time_total']))
+    if not any(totals.values()):
+        return
+
+    try:
+        with db.session.begin_nested():
+            for (model, key), deltas in totals.items():
+                if not deltas:
+                    continue
+                # A request from before rollups existed has no row to adjust
+                _bump(model, dict(key), deltas, create=False)
+            if responses:
+                record_responses(responses)
+    except Exception as e:
+        print(f"[ERROR] Failed to update request rollups: {e}")
+
+
+def _empty_counters():
+    return dict.fromkeys(COUNTER_COLUMNS, 0)
+
+
+def rebuild(days=None, batch_size=1000):
+    """
+    Recompute rollup rows and response-time sketches from patient_requests: the
+    last `days` local days, or all history when days is None. Existing rows in
+    that range are replaced. Returns (hourly rows, daily rows, sketch rows) written.
+    """
+    query = db.session.query(
+        PatientRequest.patient_id,
+        PatientRequest.timestamp,
+        PatientRequest.request_type,
+        PatientRequest.request_method,
+        PatientRequest.status,
+        PatientRequest.response_time,
+        Patient.department
+    ).outerjoin(
+        Patient, Patient.patient_id == PatientRequest.patient_id
+    ).filter(PatientRequest.timestamp.isnot(None))
+
+    first_day = start = None
+    if days:
+        first_day = local_today() - timedelta(days=days - 1)
+        start, _ = day_window(first_day)
+        # Whole hour buckets, even when the timezone offset is not a whole hour
+        query = query.filter(PatientRequest.timestamp >= hour_bucket(start))
+
+    hourly, daily, sketches = {}, {}, {}
+    for row in query.order_by(PatientRequest.timestamp).yield_per(batch_size):
+        deltas = created_deltas(row)
+        buckets = [hourly.setdefault(hour_bucket(row.timestamp), _empty_counters())]
+        in_range = start is None or row.timestamp >= start
+        if in_range:
+            day = rollup_date(row.timestamp)
+            buckets.append(daily.setdefault(day, _empty_counters()))
+            if 'response_time_total' in deltas:
+                for scope, scope_key in sketch_keys(row.patient_id, row.department, row.timestamp):
+                    sketches.setdefault((scope, scope_key, day), DDSketch()).add(deltas['response_time_total'])
+        for counters in buckets:
+            for name, delta in deltas.items():
+                counters[name] += delta
+
+    hourly_query = HourlyRequestRollup.query
+    daily_query = SystemAnalytics.query
+    sketch_query = ResponseTimeSketch.query
+    if start is not None:
+        hourly_query = hourly_query.filter(HourlyRequestRollup.bucket_start >= hour_bucket(start))
+        daily_query = daily_query.filter(SystemAnalytics.date >= first_day)
+        sketch_query = sketch_query.filter(ResponseTimeSketch.date >= first_day)
+    hourly_query.delete(synchronize_session=False)
+    daily_query.delete(synchronize_session=False)
+    sketch_query.delete(synchronize_session=False)
+
+    for rows, model, key in ((hourly, HourlyRequestRollup, 'bucket_start'), (daily, SystemAnalytics, 'date')):
+        for value, counters in rows.items():
+            average = counters['response_time_total'] / counters['response_count'] if counters['response_count'] else 0.0
+            db.session.add(model(**{key: value}, avg_response_time=average, **counters))
+
+    for (scope, scope_key, day), sketch in sketches.items():
+        db.session.add(ResponseTimeSketch(
+            scope=scope, scope_key=scope_key, date=day,
+            count=sketch.count, total=sketch.total, sketch=sketch.to_json()
+        ))
+
+    db.session.commit()
+    return len(hourly), len(daily), len(sketches)
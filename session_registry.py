@@ -0,0 +1,256 @@
+"""
+Per-bed monitoring sessions
+Replaces the single set of module-level globals (patient_info, active_features,
+selected_button, latest_request) so one server can monitor a whole ward.
+Sessions are keyed by patient ID; set SESSION_BACKEND_URL=redis://... to share
+session state between gunicorn workers. With a backend, the backend is the
+source of truth: every lookup reloads the session from it (refreshing this
+worker's copy in place) and listings come from the backend's keys. State that
+is read, changed and written back (the gesture stabilizer) goes through
+SessionRegistry.update, which the Redis backend makes atomic with WATCH/MULTI.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Key used by clients that do not identify their bed (single-bed deployments)
+DEFAULT_SESSION_KEY = 'default'
+
+# Sessions untouched for this long are evicted
+SESSION_IDLE_TIMEOUT = int(os.environ.get('SESSION_IDLE_TIMEOUT', 12 * 60 * 60))
+
+
+class BedSession:
+    """Monitoring state for a single patient/bed"""
+
+    def __init__(self, key, patient_info=None, active_features=None):
+        self.key = key
+        self.patient_info = patient_info or {"name": "", "id": "N/A", "bed_number": "", "room_number": "N/A", "primary_condition": "N/A"}
+        self.active_features = set(active_features or [])
+        self.selected_button = None
+        self.latest_request = None
+        self.gesture_state = None  # Browser gesture stabilizer state (gesture_events.py)
+        self.started_at = time.time()
+        self.last_seen = time.time()
+        self.lock = threading.RLock()
+
+    def touch(self):
+        self.last_seen = time.time()
+
+    def update_from(self, other):
+        """Take another copy's state (e.g. freshly loaded from the backend), keeping this object's lock"""
+        with self.lock:
+            self.patient_info = other.patient_info
+            self.active_features = other.active_features
+            self.selected_button = other.selected_button
+            self.latest_request = other.latest_request
+            self.gesture_state = other.gesture_state
+            self.started_at = other.started_at
+            self.last_seen = max(self.last_seen, other.last_seen)
+
+    def to_dict(self):
+        return {
+            'session_id': self.key,
+            'patient_info': self.patient_info,
+            'active_features': sorted(self.active_features),
+            'selected_button': self.selected_button,
+            'latest_request': self.latest_request,
+            'gesture_state': self.gesture_state,
+            'started_at': self.started_at,
+            'last_seen': self.last_seen
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls(data['session_id'], data.get('patient_info'), data.get('active_features'))
+        session.selected_button = data.get('selected_button')
+        session.latest_request = data.get('latest_request')
+        session.gesture_state = data.get('gesture_state')
+        session.started_at = data.get('started_at', time.time())
+        session.last_seen = data.get('last_seen', time.time())
+        return session
+
+
+class RedisSessionBackend:
+    """Stores serialized sessions in Redis so every worker sees the same beds"""
+
+    def __init__(self, url, namespace='bedsidebot:sessions', ttl=SESSION_IDLE_TIMEOUT):
+        if redis is None:
+            raise RuntimeError("The redis package is required for SESSION_BACKEND_URL=redis://...")
+        self._redis = redis.Redis.from_url(url)
+        self._namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key):
+        return f'{self._namespace}:{key}'
+
+    def load(self, key):
+        raw = self._redis.get(self._key(key))
+        return BedSession.from_dict(json.loads(raw)) if raw else None
+
+    def save(self, session):
+        self._redis.set(self._key(session.key), json.dumps(session.to_dict()), ex=self.ttl)
+
+    def update(self, key, change):
+        """
+        Run change(session) on the stored session and write it back, atomically:
+        if another worker saves the session in between, the write is dropped and
+        change runs again on the new state. Returns (session, change's result),
+        or (None, None) if there is no session.
+        """
+        name = self._key(key)
+        with self._redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    raw = pipe.get(name)
+                    if not raw:
+                        pipe.unwatch()
+                        return None, None
+                    session = BedSession.from_dict(json.loads(raw))
+                    session.touch()
+                    result = change(session)
+                    pipe.multi()
+                    pipe.set(name, json.dumps(session.to_dict()), ex=self.ttl)
+                    pipe.execute()
+                    return session, result
+                except redis.WatchError:
+                    continue
+
+    def delete(self, key):
+        self._redis.delete(self._key(key))
+
+    def keys(self):
+        prefix = f'{self._namespace}:'
+        return [raw.decode()[len(prefix):] for raw in self._redis.scan_iter(f'{prefix}*')]
+
+
+class SessionRegistry:
+    """Thread-safe registry of BedSessions with idle eviction"""
+
+    def __init__(self, backend=None, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.backend = backend
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Session for a patient/bed, or None"""
+        key = key or DEFAULT_SESSION_KEY
+        if self.backend is not None:
+            # Another worker may have started, updated or removed it since we last looked
+            session = self._refresh(key, self.backend.load(key))
+        else:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is not None:
+                    self._sessions.move_to_end(key)
+        if session is not None:
+            session.touch()
+        return session
+
+    def _refresh(self, key, loaded):
+        """Make this worker's copy of a session match the backend's; returns it (None if gone)"""
+        with self._lock:
+            if loaded is None:
+                self._sessions.pop(key, None)
+                return None
+            session = self._sessions.setdefault(key, loaded)
+            self._sessions.move_to_end(key)
+        if session is not loaded:
+            session.update_from(loaded)
+        return session
+
+    def start(self, key, patient_info, active_features):
+        """Create or replace the session for a patient/bed"""
+        key = key or DEFAULT_SESSION_KEY
+        session = BedSession(key, patient_info, active_features)
+        previous = self.get(key)
+        if previous is not None:
+            # A reloaded bedside page restarts monitoring; its gesture selection buffer must survive that
+            session.gesture_state = previous.gesture_state
+        with self._lock:
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+        self.save(session)
+        self.evict_idle()
+        return session
+
+    def save(self, session):
+        """Persist a session's state to the shared backend (if any)"""
+        if self.backend is not None:
+            with session.lock:
+                self.backend.save(session)
+
+    def update(self, key, change):
+        """
+        Read-modify-write a session: change(session) runs on its current state,
+        which is then saved. Safe across workers with a backend (change may run
+        more than once, so it must only modify the session). Returns
+        (session, change's result), or (None, None) if there is no session.
+        """
+        key = key or DEFAULT_SESSION_KEY
+        if self.backend is None:
+            session = self.get(key)
+            if session is None:
+                return None, None
+            with session.lock:
+                return session, change(session)
+
+        loaded, result = self.backend.update(key, change)
+        return self._refresh(key, loaded), result
+
+    def remove(self, key):
+        key = key or DEFAULT_SESSION_KEY
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(key)
+        return session
+
+    def evict_idle(self):
+        """Drop sessions idle longer than idle_timeout; returns how many were evicted"""
+        cutoff = time.time() - self.idle_timeout
+        evicted = []
+        with self._lock:
+            for key, session in list(self._sessions.items()):
+                if session.last_seen >= cutoff:
+                    break
+                evicted.append(key)
+                del self._sessions[key]
+        return len(evicted)
+
+    def sessions(self):
+        if self.backend is not None:
+            keys = self.backend.keys()
+            with self._lock:
+                for key in set(self._sessions) - set(keys):
+                    del self._sessions[key]
+            loaded = [self._refresh(key, self.backend.load(key)) for key in keys]
+            return [session for session in loaded if session is not None]
+        with self._lock:
+            return list(self._sessions.values())
+
+    def most_recent(self):
+        """Most recently used session (for clients that do not name a bed)"""
+        if self.backend is not None:
+            return max(self.sessions(), key=lambda session: session.last_seen, default=None)
+        with self._lock:
+            if not self._sessions:
+                return None
+            return next(reversed(self._sessions.values()))
+
+
+def create_session_registry(url=None):
+    """Build the registry configured by SESSION_BACKEND_URL (in-memory by default)"""
+    url = url if url is not None else os.environ.get('SESSION_BACKEND_URL', '')
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return SessionRegistry(RedisSessionBackend(url))
+    return SessionRegistry()
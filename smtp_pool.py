@@ -0,0 +1,180 @@
+"""
+Pooled SMTP connections for outgoing alert email
+Keeps authenticated sessions open per provider so a burst of alerts reuses
+one STARTTLS/login handshake instead of paying it for every message
+"""
+import smtplib
+import threading
+import time
+
+# Seconds an idle session may sit in the pool before it is closed
+DEFAULT_IDLE_TIMEOUT = 240
+
+
+def connection_lost(error):
+    """
+    Whether a send failed because the session is gone rather than because the
+    server refused the message. Every smtplib exception is an OSError, so a
+    plain OSError only counts when it isn't an SMTPException.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPHeloError)):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPConnectionPool:
+    """Pool of logged-in SMTP sessions for a single provider"""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 max_connections=4, idle_timeout=DEFAULT_IDLE_TIMEOUT, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []  # (connection, last_used)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    @property
+    def name(self):
+        return f"{self.username or 'anonymous'}@{self.host}:{self.port}"
+
+    def _connect(self, timeout=None):
+        server = smtplib.SMTP(self.host, self.port, timeout=timeout or self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self, timeout):
+        """Take an idle session if one is still fresh, otherwise open a new one"""
+        now = time.time()
+        fresh, stale = None, []
+        with self._lock:
+            while self._idle:
+                server, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    fresh = server
+                    break
+                stale.append(server)
+        # QUIT is a network round trip; never hold the lock (and every other sender) for it
+        for server in stale:
+            self._close(server)
+        if fresh is not None and fresh.sock is not None:
+            fresh.sock.settimeout(timeout)
+            return fresh, True
+        return self._connect(timeout), False
+
+    def _discard_or_checkin(self, server, error):
+        if connection_lost(error):
+            self._close(server)
+        else:
+            # Message-level rejection (refused sender/recipient, data error) -
+            # smtplib has already RSET the session, so it is still usable
+            self._checkin(server)
+
+    def _checkin(self, server):
+        with self._lock:
+            self._idle.append((server, time.time()))
+
+    def send(self, from_addr, to_addrs, message, timeout=None):
+        """
+        Send one message, reconnecting once if a pooled session has gone stale.
+        `timeout` (capped at the pool's) bounds the wait for a free connection
+        and every socket operation of this send.
+        """
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No free SMTP connection to {self.name} within {timeout:.1f}s")
+        try:
+            server, reused = self._checkout(timeout)
+
+            try:
+                server.sendmail(from_addr, to_addrs, message)
+            except Exception as e:
+                if not (reused and connection_lost(e)):
+                    self._discard_or_checkin(server, e)
+                    raise
+                # Server dropped the session (idle timeout, restart) - reconnect once
+                self._close(server)
+                server = self._connect(timeout)
+                try:
+                    server.sendmail(from_addr, to_addrs, message)
+                except Exception as e:
+                    self._discard_or_checkin(server, e)
+                    raise
+
+            self._checkin(server)
+            self.messages_sent += 1
+            return True
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle session"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+    def stats(self):
+        with self._lock:
+            idle_count = len(self._idle)
+        return {
+            'provider': self.name,
+            'idle_connections': idle_count,
+            'connections_opened': self.connections_opened,
+            'messages_sent': self.messages_sent
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config):
+    """Get (or create) the shared pool for an SMTP config dict"""
+    key = (config['smtp_server'], config['port'], config.get('email'))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(
+                config['smtp_server'],
+                config['port'],
+                username=config.get('email'),
+                password=config.get('password'),
+                use_tls=config.get('use_tls', True),
+                max_connections=config.get('max_connections', 4)
+            )
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """Close every pooled SMTP session (e.g. on shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
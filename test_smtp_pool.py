@@ -0,0 +1,185 @@
+"""
+SMTP pool tests against a local aiosmtpd server (no real mail is sent)
+
+    pip install aiosmtpd
+    python test_smtp_pool.py        (or: python -m pytest test_smtp_pool.py)
+"""
+import smtplib
+import socket
+import time
+import unittest
+
+from smtp_pool import SMTPConnectionPool, connection_lost
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+MESSAGE = "Subject: BedsideBot test\r\n\r\nPatient request: Water"
+
+
+class RecordingHandler:
+    """Keeps every message the server accepts, and the sessions they came in on"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('refused@'):
+            return '550 No such user here'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content)
+        self.sessions.add(id(session))
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class SMTPConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.handler = RecordingHandler()
+        self.server = self.start_server()
+        self.pool = SMTPConnectionPool('127.0.0.1', self.port, use_tls=False, timeout=5)
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.server.stop()
+
+    def start_server(self):
+        controller = Controller(self.handler, hostname='127.0.0.1', port=self.port)
+        controller.start()
+        return controller
+
+    def send(self, to='nurse@example.com'):
+        return self.pool.send('bot@example.com', [to], MESSAGE)
+
+    def test_reuses_one_session_for_a_burst(self):
+        for _ in range(5):
+            self.assertTrue(self.send())
+
+        self.assertEqual(len(self.handler.messages), 5)
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertEqual(self.pool.connections_opened, 1)
+        self.assertEqual(self.pool.stats()['idle_connections'], 1)
+
+    def test_reconnects_when_server_dropped_the_session(self):
+        self.send()
+        # Server restart: the pooled session's socket is now dead
+        self.server.stop()
+        self.server = self.start_server()
+
+        self.assertTrue(self.send())
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertEqual(self.pool.connections_opened, 2)
+
+    def test_refused_recipient_keeps_the_session(self):
+        self.send()
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            self.send('refused@example.com')
+        self.assertTrue(self.send())
+
+        self.assertEqual(self.pool.connections_opened, 1)
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertEqual(len(self.handler.messages), 2)
+
+    def test_fresh_connection_failure_is_raised(self):
+        self.server.stop()
+        self.server = None
+        try:
+            with self.assertRaises(OSError):
+                self.send()
+        finally:
+            self.server = self.start_server()
+
+    def test_idle_sessions_are_replaced_and_closed_outside_the_lock(self):
+        self.pool.idle_timeout = 0.05
+        self.send()
+        time.sleep(0.1)
+
+        closed_under_lock = []
+        close = self.pool._close
+        self.pool._close = lambda server: (closed_under_lock.append(self.pool._lock.locked()), close(server))
+
+        self.send()
+        self.assertEqual(self.pool.connections_opened, 2)
+        self.assertEqual(closed_under_lock, [False])
+
+
+class FakeSession:
+    """Stands in for smtplib.SMTP: fails the next send with `error`, if set"""
+
+    def __init__(self):
+        self.error = None
+        self.sock = socket.socket()  # Only ever given timeouts
+        self.sent = 0
+
+    def sendmail(self, from_addr, to_addrs, message):
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        self.sent += 1
+
+    def quit(self):
+        self.sock.close()
+
+
+class ReconnectPolicyTest(unittest.TestCase):
+    """Which failures reconnect, without a real server (runs even without aiosmtpd)"""
+
+    def setUp(self):
+        self.pool = SMTPConnectionPool('127.0.0.1', 25, use_tls=False)
+        self.sessions = []
+
+        def connect(timeout=None):
+            session = FakeSession()
+            self.sessions.append(session)
+            self.pool.connections_opened += 1
+            return session
+        self.pool._connect = connect
+
+    def send(self):
+        return self.pool.send('bot@example.com', ['nurse@example.com'], MESSAGE)
+
+    def test_connection_lost(self):
+        self.assertTrue(connection_lost(smtplib.SMTPServerDisconnected()))
+        self.assertTrue(connection_lost(ConnectionResetError()))
+        self.assertTrue(connection_lost(socket.timeout()))
+        self.assertFalse(connection_lost(smtplib.SMTPRecipientsRefused({})))
+        self.assertFalse(connection_lost(smtplib.SMTPSenderRefused(553, b'no', 'bot@example.com')))
+        self.assertFalse(connection_lost(smtplib.SMTPDataError(554, b'rejected')))
+
+    def test_message_rejections_reuse_the_session(self):
+        self.send()
+        for error in (smtplib.SMTPRecipientsRefused({}), smtplib.SMTPSenderRefused(553, b'no', 'bot@example.com'),
+                      smtplib.SMTPDataError(554, b'rejected')):
+            self.sessions[0].error = error
+            with self.assertRaises(type(error)):
+                self.send()
+        self.send()
+
+        self.assertEqual(self.pool.connections_opened, 1)
+        self.assertEqual(self.sessions[0].sent, 2)
+
+    def test_dropped_session_reconnects_once(self):
+        self.send()
+        self.sessions[0].error = smtplib.SMTPServerDisconnected('gone')
+        self.assertTrue(self.send())
+
+        self.assertEqual(self.pool.connections_opened, 2)
+        self.assertEqual(self.sessions[1].sent, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Time windows for analytics queries
+Timestamps are stored as naive UTC. These helpers turn local calendar days and
+nursing shifts into half-open [start, end) UTC ranges, so queries can filter
+with plain timestamp comparisons that use the timestamp indexes.
+"""
+import os
+from datetime import datetime, time, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+# Hospital-local timezone used when a request does not pass ?tz=
+DEFAULT_TIMEZONE = os.environ.get('HOSPITAL_TIMEZONE', 'UTC')
+
+# Nursing shifts as (start hour, end hour) in local time; night wraps past midnight
+SHIFTS = {
+    'morning': (6, 14),
+    'afternoon': (14, 22),
+    'night': (22, 6)
+}
+
+
+def get_timezone(name=None):
+    """tzinfo for an IANA name (or a tzinfo), falling back to UTC if unknown"""
+    if hasattr(name, 'utcoffset'):
+        return name
+    name = name or DEFAULT_TIMEZONE
+    if name.upper() == 'UTC' or ZoneInfo is None:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def to_utc(local_dt):
+    """Aware local datetime -> naive UTC (the storage format)"""
+    return local_dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_local(utc_dt, tz=None):
+    """Naive UTC datetime -> aware local datetime"""
+    return utc_dt.replace(tzinfo=timezone.utc).astimezone(get_timezone(tz))
+
+
+def local_today(tz=None):
+    tz = get_timezone(tz)
+    return datetime.now(tz).date()
+
+
+def day_window(day=None, tz=None):
+    """[start, end) in UTC for one local calendar day (today by default)"""
+    tz = get_timezone(tz)
+    day = day or local_today(tz)
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+    return to_utc(start), to_utc(end)
+
+
+def days_window(days, tz=None):
+    """[start, end) in UTC covering the last `days` local days, including today"""
+    tz = get_timezone(tz)
+    today = local_today(tz)
+    start, _ = day_window(today - timedelta(days=days - 1), tz)
+    _, end = day_window(today, tz)
+    return start, end
+
+
+def daily_windows(days, tz=None):
+    """(local date, start, end) for each of the last `days` local days, oldest first"""
+    tz = get_timezone(tz)
+    today = local_today(tz)
+    windows = []
+    for offset in range(days - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        start, end = day_window(day, tz)
+        windows.append((day, start, end))
+    return windows
+
+
+def shift_for(utc_dt, tz=None):
+    """Name of the shift a stored (naive UTC) timestamp falls in"""
+    hour = to_local(utc_dt, tz).hour
+    for name, (start_hour, end_hour) in SHIFTS.items():
+        if start_hour < end_hour:
+            if start_hour <= hour < end_hour:
+                return name
+        elif hour >= start_hour or hour < end_hour:
+            return name
+    return None
+
+
+def shift_window(shift=None, day=None, tz=None):
+    """
+    [start, end) in UTC for a shift. `shift` defaults to the current one;
+    `day` is the local date the shift starts on (night shifts run into the next day).
+    Without `day`, a night shift asked for between midnight and its end hour is
+    the one in progress, which started yesterday, whether it is named or current.
+    """
+    tz = get_timezone(tz)
+    now = datetime.now(tz)
+
+    if shift is None or shift == 'current':
+        shift = shift_for(to_utc(now), tz)
+
+    if shift not in SHIFTS:
+        raise ValueError(f"Unknown shift: {shift}")
+
+    start_hour, end_hour = SHIFTS[shift]
+    if day is None and end_hour < start_hour and now.hour < end_hour:
+        # Early-morning part of a night shift that started yesterday
+        day = now.date() - timedelta(days=1)
+    day = day or now.date()
+    start = datetime.combine(day, time(start_hour), tzinfo=tz)
+    end_day = day if end_hour > start_hour else day + timedelta(days=1)
+    end = datetime.combine(end_day, time(end_hour), tzinfo=tz)
+    return to_utc(start), to_utc(end)
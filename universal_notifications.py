@@ -9,6 +9,101 @@ from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import json
 import urllib.parse
+from notification_fanout import delivery, fan_out, count_successes, send_timeout
+from smtp_pool import get_pool
+from provider_health import endpoint_name, provider_registry, response_ok, RecipientError
+
+TEXTBELT_URL = "https://textbelt.com/text"
+SMS_GATEWAY_API_URL = "https://api.smsgatewayapi.com/v1/message/send"
+EMAILJS_URL = "https://api.emailjs.com/api/v1.0/email/send"
+EMAILJS_SERVICE = 'default_service'
+EMAILJS_TEMPLATE = 'template_bedsidebot'
+
+# SMTP services to try, in order (each gets its own pooled connections)
+SMTP_CONFIGS = [
+    # Gmail (most reliable)
+    {
+        'smtp_server': 'smtp.gmail.com',
+        'port': 587,
+        'email': 'bedsidebot.alerts@gmail.com',
+        'password': 'bedsidebot2024'  # App password
+    },
+    # Outlook
+    {
+        'smtp_server': 'smtp-mail.outlook.com',
+        'port': 587,
+        'email': 'bedsidebot@outlook.com',
+        'password': 'BedsideBot2024'
+    },
+    # Yahoo
+    {
+        'smtp_server': 'smtp.mail.yahoo.com',
+        'port': 587,
+        'email': 'bedsidebot@yahoo.com',
+        'password': 'bedsidebot2024'
+    }
+]
+
+def _sms_textbelt(phone, clean_phone, message):
+    """TextBelt (Free - 1 SMS per day per number)"""
+    data = {
+        'phone': clean_phone,
+        'message': message[:160],  # SMS limit
+        'key': 'textbelt'
+    }
+    
+    response = requests.post(TEXTBELT_URL, data=data, timeout=send_timeout(10))
+    if not response_ok(response):
+        return False
+    result = response.json()
+    
+    if result.get('success'):
+        print(f"✅ SMS sent via TextBelt to {phone}")
+        return True
+    # Quota used up for this number, invalid number, ... - TextBelt itself is fine
+    raise RecipientError(result.get('error', 'Failed'))
+
+def _sms_gateway_api(phone, clean_phone, message):
+    """SMS Gateway API (Free tier)"""
+    data = {
+        'message': message[:160],
+        'phone_number': clean_phone,
+        'device_id': 'free_device'  # Free tier
+    }
+    
+    response = requests.post(SMS_GATEWAY_API_URL, json=data, timeout=send_timeout(10))
+    
+    if response_ok(response):
+        print(f"✅ SMS sent via Gateway API to {phone}")
+        return True
+    return False
+
+def _email_to_sms(carrier_email, message):
+    """Email-to-SMS carrier gateway"""
+    if send_universal_email(carrier_email, "Alert", message):
+        print(f"✅ SMS sent via {carrier_email}")
+        return True
+    return False
+
+def get_carrier_gateways(clean_phone):
+    """Email-to-SMS gateway addresses for a phone number (works for most carriers)"""
+    # Indian carriers
+    if clean_phone.startswith('91'):
+        return [
+            f"{clean_phone[2:]}@airtelap.com",      # Airtel
+            f"{clean_phone[2:]}@jionet.in",         # Jio
+            f"{clean_phone[2:]}@vtext.com",         # Vi/Vodafone
+            f"{clean_phone[2:]}@bplmobile.com",     # BSNL
+        ]
+    # US carriers
+    elif clean_phone.startswith('1'):
+        return [
+            f"{clean_phone[1:]}@txt.att.net",       # AT&T
+            f"{clean_phone[1:]}@tmomail.net",       # T-Mobile
+            f"{clean_phone[1:]}@vtext.com",         # Verizon
+            f"{clean_phone[1:]}@messaging.sprintpcs.com"  # Sprint
+        ]
+    return []
 
 def send_universal_sms(phone, message):
     """Send SMS using multiple free services - no user setup required"""
@@ -16,161 +111,80 @@ def send_universal_sms(phone, message):
     # Clean phone number
     clean_phone = phone.replace('+', '').replace('-', '').replace(' ', '')
     
-    success = False
-    
-    # Method 1: TextBelt (Free - 1 SMS per day per number)
-    try:
-        url = "https://textbelt.com/text"
-        data = {
-            'phone': clean_phone,
-            'message': message[:160],  # SMS limit
-            'key': 'textbelt'
-        }
-        
-        response = requests.post(url, data=data, timeout=10)
-        result = response.json()
-        
-        if result.get('success'):
-            print(f"✅ SMS sent via TextBelt to {phone}")
-            success = True
-        else:
-            print(f"TextBelt: {result.get('error', 'Failed')}")
-    except Exception as e:
-        print(f"TextBelt error: {e}")
-    
-    # Method 2: SMS Gateway API (Free tier)
-    try:
-        url = "https://api.smsgatewayapi.com/v1/message/send"
-        data = {
-            'message': message[:160],
-            'phone_number': clean_phone,
-            'device_id': 'free_device'  # Free tier
-        }
-        
-        response = requests.post(url, json=data, timeout=10)
-        
-        if response.status_code == 200:
-            print(f"✅ SMS sent via Gateway API to {phone}")
-            success = True
-    except Exception as e:
-        print(f"Gateway API error: {e}")
-    
-    # Method 3: Email-to-SMS (Works for most carriers)
-    try:
-        # Indian carriers
-        if clean_phone.startswith('91'):
-            carriers = [
-                f"{clean_phone[2:]}@airtelap.com",      # Airtel
-                f"{clean_phone[2:]}@jionet.in",         # Jio
-                f"{clean_phone[2:]}@vtext.com",         # Vi/Vodafone
-                f"{clean_phone[2:]}@bplmobile.com",     # BSNL
-            ]
-        # US carriers
-        elif clean_phone.startswith('1'):
-            carriers = [
-                f"{clean_phone[1:]}@txt.att.net",       # AT&T
-                f"{clean_phone[1:]}@tmomail.net",       # T-Mobile
-                f"{clean_phone[1:]}@vtext.com",         # Verizon
-                f"{clean_phone[1:]}@messaging.sprintpcs.com"  # Sprint
-            ]
-        else:
-            carriers = []
-        
-        for carrier_email in carriers:
-            try:
-                if send_universal_email(carrier_email, "Alert", message):
-                    print(f"✅ SMS sent via {carrier_email}")
-                    success = True
-                    break
-            except:
-                continue
-                
-    except Exception as e:
-        print(f"Email-to-SMS error: {e}")
+    # Each carrier gateway is tracked as its own provider
+    providers = [
+        (endpoint_name(TEXTBELT_URL), lambda: _sms_textbelt(phone, clean_phone, message)),
+        (endpoint_name(SMS_GATEWAY_API_URL), lambda: _sms_gateway_api(phone, clean_phone, message))
+    ]
+    for carrier_email in get_carrier_gateways(clean_phone):
+        gateway = carrier_email.split('@', 1)[1]
+        providers.append((f"email_sms:{gateway}", lambda address=carrier_email: _email_to_sms(address, message)))
     
-    return success
+    # Healthiest provider first; providers with an open circuit are skipped
+    return provider_registry.first_success(providers) is not None
 
 def send_universal_email(to_email, subject, message):
     """Send email using multiple free SMTP services"""
     
-    # Multiple SMTP services to try
-    smtp_configs = [
-        # Gmail (most reliable)
-        {
-            'smtp_server': 'smtp.gmail.com',
-            'port': 587,
-            'email': 'bedsidebot.alerts@gmail.com',
-            'password': 'bedsidebot2024'  # App password
-        },
-        # Outlook
-        {
-            'smtp_server': 'smtp-mail.outlook.com',
-            'port': 587,
-            'email': 'bedsidebot@outlook.com',
-            'password': 'BedsideBot2024'
-        },
-        # Yahoo
-        {
-            'smtp_server': 'smtp.mail.yahoo.com',
-            'port': 587,
-            'email': 'bedsidebot@yahoo.com',
-            'password': 'bedsidebot2024'
-        }
-    ]
+    configs = {f"smtp:{config['email']}": config for config in SMTP_CONFIGS}
     
-    for config in smtp_configs:
-        try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = f"BedsideBot <{config['email']}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            # Add body
-            msg.attach(MIMEText(message, 'plain'))
-            
-            # Send via SMTP
-            server = smtplib.SMTP(config['smtp_server'], config['port'])
-            server.starttls()
-            server.login(config['email'], config['password'])
-            
-            text = msg.as_string()
-            server.sendmail(config['email'], to_email, text)
-            server.quit()
-            
-            print(f"✅ Email sent via {config['email']} to {to_email}")
+    # Healthiest SMTP provider first; providers with an open circuit are skipped
+    for name in provider_registry.ordered(list(configs)):
+        if provider_registry.call(name, _send_smtp, configs[name], to_email, subject, message):
             return True
-            
-        except Exception as e:
-            print(f"SMTP {config['email']} failed: {e}")
-            continue
     
     # Fallback: Use web-based email service
+    if provider_registry.call(endpoint_name(EMAILJS_URL, EMAILJS_SERVICE), _send_emailjs, to_email, subject, message):
+        return True
+    
+    print(f"❌ All email methods failed for {to_email}")
+    return False
+
+def _send_smtp(config, to_email, subject, message):
+    """Send one email over a pooled, already authenticated SMTP session"""
     try:
-        # EmailJS or similar service
-        url = "https://api.emailjs.com/api/v1.0/email/send"
-        data = {
-            'service_id': 'default_service',
-            'template_id': 'template_bedsidebot',
-            'user_id': 'public_user',
-            'template_params': {
-                'to_email': to_email,
-                'subject': subject,
-                'message': message,
-                'from_name': 'BedsideBot System'
-            }
-        }
+        # Create message
+        msg = MIMEMultipart()
+        msg['From'] = f"BedsideBot <{config['email']}>"
+        msg['To'] = to_email
+        msg['Subject'] = subject
         
-        response = requests.post(url, json=data, timeout=10)
+        # Add body
+        msg.attach(MIMEText(message, 'plain'))
         
-        if response.status_code == 200:
-            print(f"✅ Email sent via EmailJS to {to_email}")
-            return True
-            
+        pool = get_pool(config)
+        pool.send(config['email'], to_email, msg.as_string(), timeout=send_timeout(pool.timeout))
+        
+        print(f"✅ Email sent via {config['email']} to {to_email}")
+        return True
+        
+    except smtplib.SMTPRecipientsRefused as e:
+        # The server is up and talking; it just won't take this address
+        raise RecipientError(str(e))
     except Exception as e:
-        print(f"EmailJS error: {e}")
+        print(f"SMTP {config['email']} failed: {e}")
+        return False
+
+def _send_emailjs(to_email, subject, message):
+    """Web-based email fallback (EmailJS)"""
+    data = {
+        'service_id': EMAILJS_SERVICE,
+        'template_id': EMAILJS_TEMPLATE,
+        'user_id': 'public_user',
+        'template_params': {
+            'to_email': to_email,
+            'subject': subject,
+            'message': message,
+            'from_name': 'BedsideBot System'
+        }
+    }
     
-    print(f"❌ All email methods failed for {to_email}")
+    # Transport errors propagate to the provider registry, which logs them as failures
+    response = requests.post(EMAILJS_URL, json=data, timeout=send_timeout(10))
+    
+    if response_ok(response):
+        print(f"✅ Email sent via EmailJS to {to_email}")
+        return True
     return False
 
 def send_push_notification(phone, message):
@@ -186,7 +200,7 @@ def send_push_notification(phone, message):
             'title': 'BedsideBot Alert'
         }
         
-        response = requests.post(url, data=data, timeout=10)
+        response = requests.post(url, data=data, timeout=send_timeout(10))
         
         if response.status_code == 200:
             print(f"✅ Push notification sent")
@@ -197,7 +211,7 @@ def send_push_notification(phone, message):
     
     return False
 
-def notify_caregivers_universal(caregivers, patient_name, request_type, patient_room, patient_bed):
+def notify_caregivers_universal(caregivers, patient_name, request_type, patient_room, patient_bed, deadline=None):
     """Universal notification system - works for any user"""
     
     request_types = {
@@ -235,13 +249,13 @@ BedsideBot Healthcare System
 Automated Patient Care Monitoring
     """
     
-    total_sent = 0
-    
     print(f"\n{'='*60}")
     print(f"🚨 SENDING UNIVERSAL NOTIFICATIONS")
     print(f"Patient: {patient_name} | Request: {request_name}")
     print(f"{'='*60}")
     
+    # Build every caregiver/channel send, then deliver them all at once
+    deliveries = []
     for caregiver in caregivers:
         caregiver_name = caregiver.get('fullName', 'Unknown')
         caregiver_phone = caregiver.get('primaryPhone', '')
@@ -255,31 +269,29 @@ Automated Patient Care Monitoring
         
         # Send SMS
         if contact_method in ['sms', 'both'] and caregiver_phone:
-            print(f"\n📱 Sending SMS...")
-            if send_universal_sms(caregiver_phone, sms_message):
-                total_sent += 1
+            deliveries.append(delivery(caregiver_name, 'sms', send_universal_sms, caregiver_phone, sms_message))
         
         # Send Email
         if contact_method in ['email', 'both'] and caregiver_email:
-            print(f"\n📧 Sending Email...")
-            if send_universal_email(caregiver_email, email_subject, email_body):
-                total_sent += 1
+            deliveries.append(delivery(caregiver_name, 'email', send_universal_email, caregiver_email, email_subject, email_body))
         
-        # Send Push Notification (bonus)
+        # Send Push Notification (bonus - not counted)
         if caregiver_phone:
-            print(f"\n🔔 Sending Push Notification...")
-            send_push_notification(caregiver_phone, sms_message)
+            deliveries.append(delivery(caregiver_name, 'push', send_push_notification, caregiver_phone, sms_message))
+    
+    results = fan_out(deliveries, deadline)
+    total_sent = count_successes([r for r in results if r['channel'] != 'push'])
     
     print(f"\n✅ Notifications sent: {total_sent}")
     print(f"📊 Caregivers notified: {len(caregivers)}")
     print(f"{'='*60}\n")
     
     # Log notification
-    log_notification(caregivers, patient_name, request_name, total_sent)
+    log_notification(caregivers, patient_name, request_name, total_sent, results)
     
     return total_sent > 0
 
-def log_notification(caregivers, patient_name, request_name, sent_count):
+def log_notification(caregivers, patient_name, request_name, sent_count, results=None):
     """Log notification attempts"""
     
     log_entry = {
@@ -296,7 +308,8 @@ def log_notification(caregivers, patient_name, request_name, sent_count):
                 'method': cg.get('contactMethod')
             }
             for cg in caregivers
-        ]
+        ],
+        'deliveries': results or []
     }
     
     try:
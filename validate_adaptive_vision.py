@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Adaptive Vision Validation
+Replays recorded clips through BedVision twice - full-frame detection on every
+frame, then adaptive scheduling with ROI tracking - and compares CPU time per
+frame, per-frame finger counts / gaze readings and the buttons selected.
+
+A clip can carry ground truth in a CSV next to it (clips/bed12_fingers.mp4 ->
+clips/bed12_fingers.csv, clips/bed14_hand/ -> clips/bed14_hand.csv) with one
+row per stretch of video where a hand is held up:
+
+    start,end,fingers
+    2.0,4.5,3
+    6.0,8.0,5
+
+Both runs are then scored against it: how often a hand was found on labelled
+frames the run looked at, and how often the finger count was right. Record
+such clips with the hand moving about and reaching the frame edges - that is
+where the hand crop (ROI) differs most from full-frame detection.
+
+Usage:
+    python validate_adaptive_vision.py clips/bed12_fingers.mp4 clips/bed14_gaze/
+    python validate_adaptive_vision.py clips/*.mp4 --features hand,gaze --tolerance 1.5
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bed_vision import BedVision, HAND_FEATURE, GAZE_FEATURE
+from frame_sources import open_source
+
+FEATURES = {'hand': HAND_FEATURE, 'gaze': GAZE_FEATURE}
+
+
+def load_clip(path):
+    """(frames, fps) from a video file, a directory of images (played at 30 fps) or a synthetic spec"""
+    with open_source(path) as source:
+        return list(source), source.fps
+
+
+def labels_path(path):
+    return os.path.splitext(path.rstrip('/\\'))[0] + '.csv'
+
+
+def load_labels(path):
+    """[(start, end, fingers)] from the clip's label CSV, or None if it has none"""
+    try:
+        with open(labels_path(path), newline='') as f:
+            return [(float(row['start']), float(row['end']), int(row['fingers'])) for row in csv.DictReader(f)]
+    except FileNotFoundError:
+        return None
+
+
+def score_labels(readings, fps, labels):
+    """
+    (labelled frames looked at, share with a hand found, share with the right
+    finger count) over labelled frames the run ran detection on
+    """
+    checked = found = correct = 0
+    for i, (fingers, _, detected) in enumerate(readings):
+        now = i / fps
+        expected = next((count for start, end, count in labels if start <= now < end), None)
+        if expected is None or not detected:
+            continue
+        checked += 1
+        found += fingers is not None
+        correct += fingers == expected
+    if not checked:
+        return 0, None, None
+    return checked, found / checked, correct / checked
+
+
+def replay(frames, fps, features, adaptive):
+    vision = BedVision(adaptive=adaptive)
+    last_selection_time = float('-inf')
+    readings, selections = [], []
+    cpu = 0.0
+
+    for i, frame in enumerate(frames):
+        now = i / fps
+        started = time.process_time()
+        _, button = vision.process(frame, features, last_selection_time, now=now)
+        cpu += time.process_time() - started
+
+        readings.append((vision.fingers, vision.gaze, vision.detected))
+        if button is not None:
+            selections.append((now, button))
+            last_selection_time = now
+
+    counters = dict(vision.counters)
+    vision.close()
+    return {'cpu_ms': cpu * 1000 / max(len(frames), 1), 'readings': readings,
+            'selections': selections, 'counters': counters}
+
+
+def match_selections(expected, actual, tolerance):
+    """Selections in `expected` with a same-button selection in `actual` within `tolerance` seconds"""
+    unmatched = list(actual)
+    matched = 0
+    for when, button in expected:
+        for candidate in unmatched:
+            if candidate[1] == button and abs(candidate[0] - when) <= tolerance:
+                unmatched.remove(candidate)
+                matched += 1
+                break
+    return matched, len(unmatched)
+
+
+def compare(full, adaptive):
+    """
+    Share of full-rate readings the adaptive run reproduced: over every frame,
+    and over the frames it ran hand detection on (the rest were skipped on purpose)
+    """
+    pairs = [(f[:2], a) for f, a in zip(full['readings'], adaptive['readings']) if f[:2] != (None, None)]
+    if not pairs:
+        return None, None
+    detected = [(f, a[:2]) for f, a in pairs if a[2]]
+    overall = sum(1 for f, a in pairs if f == a[:2]) / len(pairs)
+    return overall, (sum(1 for f, a in detected if f == a) / len(detected)) if detected else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate adaptive detection against full-frame detection')
+    parser.add_argument('clips', nargs='+', help='video files, image directories or synthetic[:WxH][@FPS]')
+    parser.add_argument('--features', default='hand,gaze', help='comma separated: hand, gaze')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='seconds a selection may move')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02,
+                        help='how much lower adaptive finger-count accuracy on labelled clips may be than full-frame')
+    args = parser.parse_args()
+
+    features = {FEATURES[name.strip()] for name in args.features.split(',') if name.strip()}
+    failed = False
+
+    for path in args.clips:
+        frames, fps = load_clip(path)
+        if not frames:
+            print(f"{path}: no frames")
+            failed = True
+            continue
+
+        full = replay(frames, fps, features, adaptive=False)
+        adaptive = replay(frames, fps, features, adaptive=True)
+        matched, extra = match_selections(full['selections'], adaptive['selections'], args.tolerance)
+        missed = len(full['selections']) - matched
+        overall, on_detected = compare(full, adaptive)
+        failed = failed or missed > 0 or extra > 0
+
+        print(f"{path}: {len(frames)} frames at {fps:.0f} fps")
+        print(f"  CPU per frame     full {full['cpu_ms']:7.2f} ms   adaptive {adaptive['cpu_ms']:7.2f} ms"
+              f"   ({full['cpu_ms'] / max(adaptive['cpu_ms'], 1e-6):.1f}x)")
+        print(f"  Detections        {adaptive['counters']}")
+        if overall is not None:
+            print(f"  Readings matched  {overall:.1%} of full-rate readings"
+                  + (f", {on_detected:.1%} on frames not skipped" if on_detected is not None else ''))
+        print(f"  Selections        full {len(full['selections'])}   matched {matched}"
+              f"   missed {missed}   extra {extra}")
+
+        labels = load_labels(path)
+        if labels is not None:
+            scores = {name: score_labels(run['readings'], fps, labels)
+                      for name, run in (('full', full), ('adaptive', adaptive))}
+            for name, (checked, found, correct) in scores.items():
+                if checked:
+                    print(f"  Labels ({name:8s}) {checked} frames checked   hand found {found:.1%}"
+                          f"   fingers correct {correct:.1%}")
+                else:
+                    print(f"  Labels ({name:8s}) no labelled frames checked")
+            full_correct, adaptive_correct = scores['full'][2], scores['adaptive'][2]
+            if full_correct is not None and (adaptive_correct or 0) < full_correct - args.max_accuracy_drop:
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
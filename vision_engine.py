@@ -0,0 +1,374 @@
+"""
+Ward vision engine
+Runs one worker process per bed camera so a single ward server uses every core
+instead of one PC per bed. Each worker owns its camera, a BedVision and a
+capture/inference pipeline; annotated frames are handed back through shared
+memory (no pickling or copying through a pipe) and button selections come back
+as events on a queue. A supervisor thread restarts workers that crash, lose
+their camera or stop making progress, backing off exponentially while a camera
+keeps failing.
+
+Cameras are configured as bed=source pairs (any frame_sources.open_source
+spec), e.g.
+    WARD_CAMERAS=12A=0,12B=/dev/video2,14A=rtsp://10.0.4.14/stream
+    WARD_CAMERAS=load1=synthetic,load2=synthetic:1280x720@15,replay=clips/bed12.mp4
+"""
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from bed_vision import BedVision, FRAME_SIZE, button_text
+from camera_pipeline import CameraPipeline
+from frame_sources import open_source
+
+FRAME_SHAPE = (FRAME_SIZE[1], FRAME_SIZE[0], 3)
+
+# Shared frame layout: [seq, pending seq] uint64, [timestamp per slot] float64, then two frame slots
+HEADER_SIZE = 64
+READ_ATTEMPTS = 3
+SHARED_POLL_INTERVAL = 0.01
+
+# Supervisor timing, in seconds
+SUPERVISE_INTERVAL = 1.0
+BACKOFF_BASE = 1.0
+MAX_BACKOFF = 60.0
+STABLE_RUN = 60.0  # A worker that ran this long starts its backoff over
+STARTUP_GRACE = 30.0  # Time allowed to open the camera and load models
+HEARTBEAT_TIMEOUT = 15.0  # No processed frame for this long means the worker is stuck
+
+# Worker timing, in seconds
+CONTROL_POLL = 0.5
+CAMERA_TIMEOUT = 5.0  # No frame from the camera for this long: exit and let the supervisor reopen it
+
+EXIT_CAMERA_ERROR = 3
+EXIT_CAMERA_LOST = 4
+
+DEFAULT_FEATURES = ["Hand Sign Detection"]
+
+# Workers are spawned, not forked: the web app is multi-threaded and MediaPipe isn't fork-safe
+_context = multiprocessing.get_context('spawn')
+
+
+def cameras_from_env(value=None):
+    """{bed: source} from WARD_CAMERAS ("bed=source,bed=source")"""
+    value = os.environ.get('WARD_CAMERAS', '') if value is None else value
+    cameras = {}
+    for entry in value.split(','):
+        bed, sep, source = entry.partition('=')
+        if sep and bed.strip() and source.strip():
+            cameras[bed.strip()] = source.strip()
+    return cameras
+
+
+class SharedFrame:
+    """
+    Latest-frame slot in shared memory, written by one process and read by
+    others. Two slots are alternated so the reader copies a finished frame while
+    the next one is written; a reader that was lapped retries. Readers can wait
+    on it like a camera_pipeline.LatestFrame.
+    """
+
+    def __init__(self, shm, shape=FRAME_SHAPE):
+        self.shm = shm
+        self.shape = shape
+        frame_bytes = math.prod(shape)
+        self._header = np.ndarray(2, dtype=np.uint64, buffer=shm.buf)
+        self._timestamps = np.ndarray(2, dtype=np.float64, buffer=shm.buf, offset=16)
+        self._slots = [
+            np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=HEADER_SIZE + i * frame_bytes)
+            for i in range(2)
+        ]
+
+    @classmethod
+    def create(cls, shape=FRAME_SHAPE):
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + 2 * math.prod(shape))
+        shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        return cls(shm, shape)
+
+    @classmethod
+    def attach(cls, name, shape=FRAME_SHAPE):
+        return cls(shared_memory.SharedMemory(name=name), shape)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self):
+        return int(self._header[0])
+
+    def write(self, frame, timestamp=None):
+        seq = int(self._header[0]) + 1
+        slot = seq % 2
+        self._header[1] = seq  # Readers of the previous frame in this slot must retry
+        if frame.shape == self.shape:
+            np.copyto(self._slots[slot], frame)
+        else:
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=self._slots[slot])
+        self._timestamps[slot] = time.time() if timestamp is None else timestamp
+        self._header[0] = seq
+
+    def read(self):
+        """(seq, frame copy, timestamp) of the newest frame, or None if nothing was written yet"""
+        for _ in range(READ_ATTEMPTS):
+            seq = int(self._header[0])
+            if not seq:
+                return None
+            frame = self._slots[seq % 2].copy()
+            timestamp = float(self._timestamps[seq % 2])
+            if int(self._header[1]) < seq + 2:
+                return seq, frame, timestamp
+        return None
+
+    def get(self, after=0, timeout=None):
+        """Wait up to `timeout` seconds for a frame newer than `after` (LatestFrame.get)"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.seq <= after:
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(SHARED_POLL_INTERVAL)
+        return self.read()
+
+    def close(self):
+        # Views into the buffer have to go before the mapping can be closed
+        self._header = self._timestamps = self._slots = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def run_worker(bed, source, frame_name, events, control, heartbeat, settings):
+    """Worker process: camera -> BedVision -> shared frame + selection events"""
+    cv2.setNumThreads(1)  # One core per worker; the workers already fill the machine
+    frames = SharedFrame.attach(frame_name)
+    vision = BedVision()
+    state = {
+        'features': set(settings.get('features', DEFAULT_FEATURES)),
+        'patient_name': settings.get('patient_name', ''),
+        'last_selection_time': 0
+    }
+
+    def process(frame):
+        annotated, button = vision.process(frame, state['features'], state['last_selection_time'], state['patient_name'])
+        frames.write(annotated)
+        heartbeat.value = time.time()
+        if button is not None:
+            state['last_selection_time'] = time.time()
+            events.put({
+                'type': 'selection',
+                'bed': bed,
+                'button': button,
+                'text': button_text(button),
+                'patient_name': state['patient_name'],
+                'timestamp': state['last_selection_time']
+            })
+
+    pipeline = CameraPipeline(lambda: open_source(source, live=True), process)
+    if not pipeline.start():
+        events.put({'type': 'camera_error', 'bed': bed, 'source': source, 'timestamp': time.time()})
+        sys.exit(EXIT_CAMERA_ERROR)
+
+    exit_code = 0
+    try:
+        captured, last_frame_at = 0, time.time()
+        while True:
+            try:
+                message = control.get(timeout=CONTROL_POLL)
+            except queue.Empty:
+                message = {}
+            if message is None:
+                break
+            if 'features' in message:
+                state['features'] = set(message['features'])
+            if 'patient_name' in message:
+                state['patient_name'] = message['patient_name']
+
+            if pipeline.captured != captured:
+                captured, last_frame_at = pipeline.captured, time.time()
+            elif time.time() - last_frame_at > CAMERA_TIMEOUT:
+                events.put({'type': 'camera_lost', 'bed': bed, 'source': source, 'timestamp': time.time()})
+                exit_code = EXIT_CAMERA_LOST
+                break
+    finally:
+        pipeline.stop()
+        vision.close()
+        frames.close()
+    sys.exit(exit_code)
+
+
+class CameraWorker:
+    """Supervisor-side handle for one bed's worker process"""
+
+    def __init__(self, bed, source, settings):
+        self.bed = bed
+        self.source = source
+        self.settings = settings
+        self.frames = SharedFrame.create()
+        self.control = _context.Queue()
+        self.heartbeat = _context.Value('d', 0.0, lock=False)
+        self.process = None
+        self.started_at = None
+        self.next_start = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self.last_exit = None
+
+    def status(self):
+        now = time.time()
+        if self.process is not None:
+            state = 'running' if self.heartbeat.value >= self.started_at else 'starting'
+        else:
+            state = 'backoff'
+        return {
+            'bed': self.bed,
+            'source': self.source,
+            'state': state,
+            'pid': self.process.pid if self.process is not None else None,
+            'restarts': self.restarts,
+            'last_exit': self.last_exit,
+            'last_frame_age': round(now - self.heartbeat.value, 1) if self.heartbeat.value else None,
+            'retry_in': round(max(0.0, self.next_start - now), 1) if self.process is None else None,
+            'features': list(self.settings.get('features', [])),
+            'patient_name': self.settings.get('patient_name', '')
+        }
+
+
+class VisionEngine:
+    """
+    One supervised worker process per bed camera. `on_event(event)` is called on
+    a background thread for every event a worker sends back ('selection',
+    'camera_error', 'camera_lost').
+    """
+
+    def __init__(self, cameras, on_event, features=DEFAULT_FEATURES):
+        self.cameras = dict(cameras)
+        self.on_event = on_event
+        self.features = list(features)
+        self.events = _context.Queue()
+        self.workers = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for bed, source in self.cameras.items():
+                self.workers[bed] = CameraWorker(bed, source, {'features': self.features, 'patient_name': ''})
+            self._threads = [
+                threading.Thread(target=self._supervise, name='vision-supervisor', daemon=True),
+                threading.Thread(target=self._dispatch, name='vision-events', daemon=True)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join(timeout=5.0)
+            self._threads = []
+            for worker in self.workers.values():
+                self._stop_worker(worker)
+                worker.frames.close()
+                worker.frames.unlink()
+            self.workers = {}
+
+    def is_running(self):
+        return bool(self._threads)
+
+    def frames(self, bed):
+        """The bed's SharedFrame of annotated frames, or None for an unknown bed"""
+        worker = self.workers.get(bed)
+        return worker.frames if worker else None
+
+    def configure(self, bed, **settings):
+        """Change a bed's features/patient_name; kept across worker restarts"""
+        worker = self.workers.get(bed)
+        if worker is None:
+            return False
+        if 'features' in settings:
+            settings['features'] = list(settings['features'])
+        worker.settings.update(settings)
+        worker.control.put(settings)
+        return True
+
+    def status(self):
+        return [worker.status() for worker in self.workers.values()]
+
+    def _spawn(self, worker):
+        # A fresh control queue: a killed worker can leave the old one's lock held
+        worker.control = _context.Queue()
+        worker.heartbeat.value = 0.0
+        worker.started_at = time.time()
+        worker.process = _context.Process(
+            target=run_worker,
+            args=(worker.bed, worker.source, worker.frames.name, self.events, worker.control,
+                  worker.heartbeat, worker.settings),
+            name=f'vision-{worker.bed}',
+            daemon=True
+        )
+        worker.process.start()
+
+    def _stop_worker(self, worker):
+        if worker.process is None:
+            return
+        if worker.process.is_alive():
+            worker.control.put(None)
+            worker.process.join(timeout=3.0)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        worker.process = None
+
+    def _supervise(self):
+        while not self._stop.is_set():
+            now = time.time()
+            for worker in list(self.workers.values()):
+                if worker.process is None:
+                    if now >= worker.next_start:
+                        self._spawn(worker)
+                    continue
+
+                if worker.process.is_alive():
+                    if worker.heartbeat.value:
+                        stalled = now - worker.heartbeat.value > HEARTBEAT_TIMEOUT
+                    else:
+                        stalled = now - worker.started_at > STARTUP_GRACE
+                    if not stalled:
+                        continue
+                    print(f"⚠️ Vision worker for bed {worker.bed} stalled, restarting")
+                    worker.process.kill()
+                    worker.process.join()
+
+                worker.last_exit = worker.process.exitcode
+                worker.failures = 1 if now - worker.started_at >= STABLE_RUN else worker.failures + 1
+                backoff = min(MAX_BACKOFF, BACKOFF_BASE * 2 ** (worker.failures - 1))
+                worker.next_start = now + backoff
+                worker.restarts += 1
+                worker.process = None
+                print(f"⚠️ Vision worker for bed {worker.bed} exited ({worker.last_exit}), restarting in {backoff:.0f}s")
+
+            self._stop.wait(SUPERVISE_INTERVAL)
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            try:
+                event = self.events.get(timeout=CONTROL_POLL)
+            except queue.Empty:
+                continue
+            try:
+                self.on_event(event)
+            except Exception as e:
+                print(f"❌ Vision event error: {e}")
@@ -0,0 +1,158 @@
+"""
+Batch ward reports
+Generates the printable report for every active patient in a department in
+one pass: a single request query for the whole ward (partitioned by patient
+in Python), then rendering. Output is one paginated HTML document (a patient
+per printed page) or a zip of self-contained report files.
+
+Rendering is in-process unless the caller asks for workers. Pool workers are
+spawned, and a spawned worker re-imports the caller's main script: only
+lightweight scripts (print_ward_reports.py, bench_ward_reports.py) may ask,
+never the web app, whose import sets up the database, notification workers
+and broker.
+"""
+import html
+import io
+import multiprocessing
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import groupby
+
+import numpy as np
+
+from database import db, Patient, PatientRequest, summarize_requests
+from patient_reports import (
+    build_report, generated_on_now, get_environment, patient_snapshot, read_stylesheet,
+    render_report_body, render_standalone_report, report_window_start, REPORT_DAYS, RECENT_LIMIT, STYLESHEET_URL
+)
+
+# Smaller batches render in-process; starting workers would cost more than it saves
+MIN_PARALLEL_REPORTS = 16
+
+# Patient IDs per IN (...) clause
+PATIENT_ID_CHUNK = 500
+
+OUTPUT_FORMATS = ('html', 'zip')
+
+# Workers are spawned, not forked: forking a multi-threaded process can copy
+# locks (database pool, logging) in a held state into the child
+_context = multiprocessing.get_context('spawn')
+
+
+def ward_patients(department=None):
+    """Active patients (optionally in one department) in room/bed order"""
+    query = Patient.query.filter(Patient.is_active == True)
+    if department:
+        query = query.filter(Patient.department == department)
+    return query.order_by(Patient.room_number, Patient.bed_number).all()
+
+
+def ward_reports(patients, days=REPORT_DAYS):
+    """Report data for each patient, from one request query per chunk of patients"""
+    since = report_window_start(days)
+    columns_by_patient = {}
+
+    patient_ids = [patient.patient_id for patient in patients]
+    for offset in range(0, len(patient_ids), PATIENT_ID_CHUNK):
+        rows = db.session.query(
+            PatientRequest.patient_id,
+            PatientRequest.request_type,
+            PatientRequest.request_method,
+            PatientRequest.status,
+            db.cast(PatientRequest.timestamp, db.String),
+            db.cast(PatientRequest.response_time, db.String)
+        ).filter(
+            PatientRequest.patient_id.in_(patient_ids[offset:offset + PATIENT_ID_CHUNK]),
+            PatientRequest.timestamp >= since
+        ).order_by(PatientRequest.patient_id, PatientRequest.timestamp.desc()).yield_per(5000)
+
+        for patient_id, group in groupby(rows, key=lambda row: row[0]):
+            columns_by_patient[patient_id] = list(zip(*group))[1:]
+
+    reports = []
+    for patient in patients:
+        columns = columns_by_patient.get(patient.patient_id)
+        if columns is None:
+            request_types, methods, statuses, timestamps, responded = [], [], [], [], []
+        else:
+            request_types, methods, statuses, timestamps, responded = columns
+        patterns = summarize_requests(request_types, methods, timestamps, responded)
+
+        # Rows are newest first; only the recent activity table needs datetimes
+        recent_times = np.array(timestamps[:RECENT_LIMIT], dtype='datetime64[us]').astype(datetime)
+        recent = [{
+            'timestamp': timestamp,
+            'request_type': request_types[i],
+            'request_method': methods[i] or '',
+            'status': statuses[i] or ''
+        } for i, timestamp in enumerate(recent_times)]
+
+        reports.append(build_report(patient_snapshot(patient), recent, patterns, days))
+    return reports
+
+
+def render_all(render, reports, workers=1):
+    """Render reports in order, across `workers` processes when the batch is large enough"""
+    if workers <= 1 or len(reports) < MIN_PARALLEL_REPORTS:
+        return [render(report) for report in reports]
+    chunksize = max(1, len(reports) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_context) as executor:
+        return list(executor.map(render, reports, chunksize=chunksize))
+
+
+def safe_name(text, default):
+    """Text reduced to letters, digits and underscores, safe as a file or zip entry name"""
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(text or '')).strip('_') or default
+
+
+def report_filename(report):
+    patient = report['patient']
+    return f"{safe_name(patient['patient_id'], 'id')}_{safe_name(patient.get('full_name'), 'patient')}.html"
+
+
+def ward_report_filename(department=None, output='zip'):
+    return f"ward_reports_{safe_name(department, 'all')}_{datetime.now():%Y%m%d}.{output}"
+
+
+def generate_ward_report(department=None, output='html', days=REPORT_DAYS, workers=1,
+                         stylesheet_url=STYLESHEET_URL, inline_css=False):
+    """
+    Reports for every active patient in `department` (all departments when None).
+    Returns (body, patient count): HTML text for output='html', zip bytes for 'zip'.
+    workers > 1 renders in a process pool (scripts only, see the module docstring).
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output}")
+
+    reports = ward_reports(ward_patients(department), days)
+    title = department or 'All Departments'
+    generated_on = generated_on_now()
+
+    if output == 'html':
+        bodies = render_all(render_report_body, reports, workers)
+        page = get_environment().get_template('ward_report.html').render(
+            title=title,
+            generated_on=generated_on,
+            bodies=bodies,
+            stylesheet_url=stylesheet_url,
+            inline_css=read_stylesheet() if inline_css else None
+        )
+        return page, len(reports)
+
+    pages = render_all(render_standalone_report, reports, workers)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        index = [f'<h1>Ward Report - {html.escape(title)}</h1>', f'<p>Generated on: {generated_on}</p>', '<ul>']
+        used = {'index.html'}
+        for number, (report, page) in enumerate(zip(reports, pages), 1):
+            filename = report_filename(report)
+            if filename in used:  # IDs that only differed in punctuation
+                filename = f"{filename[:-len('.html')]}_{number}.html"
+            used.add(filename)
+            archive.writestr(filename, page)
+            index.append(f'<li><a href="{filename}">{html.escape(report["patient"]["full_name"] or filename)}</a></li>')
+        index.append('</ul>')
+        archive.writestr('index.html', '\n'.join(index))
+    return buffer.getvalue(), len(reports)